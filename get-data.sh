@@ -23,7 +23,8 @@ download_dataset () {
 download_dataset ${COUNT_DATASET_ID}
 download_dataset ${SENSOR_DATASET_ID}
 
-# prep data for use in Dashboard
-echo "Making parquet file..."
-python make_parquet.py
+# prep data for use in Dashboard, only rewriting the months that have changed
+# since the last download
+echo "Updating parquet dataset..."
+python update_parquet.py
 echo "Done."
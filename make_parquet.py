@@ -1,9 +1,59 @@
 #!/usr/bin/env python
+import argparse
 
+from melbviz.config import (
+    MELBVIZ_CLEANED_DATA_PATH,
+    MELBVIZ_COUNTS_CSV_PATH,
+    MELBVIZ_PARTITIONED_DATA_PATH,
+    MELBVIZ_SENSOR_CSV_PATH,
+)
 from melbviz.pedestrian import PedestrianDataset
-from melbviz.config import MELBVIZ_CLEANED_DATA_PATH, MELBVIZ_COUNTS_CSV_PATH, MELBVIZ_SENSOR_CSV_PATH
+from melbviz.utils import (
+    DEFAULT_CHUNKSIZE,
+    PARTITION_COLUMNS,
+    stream_pedestrian_data_to_parquet,
+)
 
 
-data = PedestrianDataset.load(MELBVIZ_COUNTS_CSV_PATH, sensor_csv_path=MELBVIZ_SENSOR_CSV_PATH)
+parser = argparse.ArgumentParser(
+    description=(
+        "Clean the pedestrian counts CSV and save it as Parquet, along with"
+        " tables of its counts summed by sensor and year, month and hour."
+    )
+)
+parser.add_argument(
+    "--chunksize",
+    type=int,
+    default=DEFAULT_CHUNKSIZE,
+    help="Number of CSV rows to read and clean at a time.",
+)
+parser.add_argument(
+    "--partitioned",
+    action="store_true",
+    help="Write a directory partitioned by year and month instead of one file.",
+)
+parser.add_argument(
+    "--arrow",
+    action="store_true",
+    help=(
+        "Also write the compact dataset as an Arrow file that the Dash app will"
+        " memory-map. Note this loads the whole dataset into memory."
+    ),
+)
+args = parser.parse_args()
 
-data.to_parquet(MELBVIZ_CLEANED_DATA_PATH)
+if args.partitioned:
+    path, partition_cols = MELBVIZ_PARTITIONED_DATA_PATH, PARTITION_COLUMNS
+else:
+    path, partition_cols = MELBVIZ_CLEANED_DATA_PATH, None
+
+stream_pedestrian_data_to_parquet(
+    MELBVIZ_COUNTS_CSV_PATH,
+    path,
+    sensor_csv_path=MELBVIZ_SENSOR_CSV_PATH,
+    chunksize=args.chunksize,
+    partition_cols=partition_cols,
+)
+
+if args.arrow:
+    PedestrianDataset.from_parquet(path, compact=True).to_arrow()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+import argparse
+from pathlib import Path
+
+from melbviz.config import MELBVIZ_DATA_PATH
+from melbviz.synthetic import write_synthetic_data
+
+
+parser = argparse.ArgumentParser(
+    description=(
+        "Write synthetic pedestrian counts and sensor locations CSVs, for working"
+        " without downloading the real data."
+    )
+)
+parser.add_argument(
+    "--directory",
+    type=Path,
+    default=MELBVIZ_DATA_PATH,
+    help="Directory to write the CSVs into.",
+)
+parser.add_argument("--sensors", type=int, default=10, help="Number of sensors.")
+parser.add_argument(
+    "--years",
+    type=int,
+    nargs="+",
+    default=[2021, 2022],
+    help="Years to make hourly counts for.",
+)
+parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+args = parser.parse_args()
+
+for path in write_synthetic_data(args.directory, args.sensors, args.years, args.seed):
+    print(f"Wrote {path}")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Measure how long the Dash app takes to import, load its data and serve.
+
+Each import is timed in a fresh interpreter so that earlier imports don't hide
+its cost. The app startup timings are then measured in this process.
+
+Some heavy modules, such as IPython, are imported by `import dash` itself, so
+they're part of Dash's import time and of every import of melbviz.app, however
+lazily melbviz imports them. These are reported separately, as Dash
+dependencies.
+"""
+import subprocess
+import sys
+import time
+
+IMPORTED_MODULES = ["pandas", "plotly.express", "dash", "melbviz.app"]
+
+# modules imported by Dash itself, rather than by melbviz
+DASH_DEPENDENCIES = ["IPython"]
+
+
+def time_import(module):
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def imports_module(module, dependency):
+    """Check whether importing `module` also imports `dependency`"""
+    code = f"import sys, {module}; print({dependency!r} in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    )
+    return result.stdout.strip().splitlines()[-1] == "True"
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {label:<30} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+print("Import time (fresh interpreter):")
+for module in IMPORTED_MODULES:
+    print(f"  {module:<30} {time_import(module):8.3f}s")
+
+print("Dash dependencies (included in the import time of dash):")
+for module in DASH_DEPENDENCIES:
+    imported_by = "dash" if imports_module("dash", module) else "not dash"
+    print(f"  {module:<30} {time_import(module):8.3f}s  imported by {imported_by}")
+
+print("Startup time:")
+app_module = timed("import melbviz.app", lambda: __import__("melbviz.app").app)
+client = app_module.app.server.test_client()
+response = timed("GET /ready (before load)", lambda: client.get("/ready"))
+print(f"  {'':<30} status {response.status_code}")
+timed("load dataset", app_module.get_data)
+timed("import Plotly Express", app_module.plots.express)
+timed("GET / (first request)", lambda: client.get("/"))
+timed("GET /_dash-layout", lambda: client.get("/_dash-layout"))
+response = timed("GET /ready (after load)", lambda: client.get("/ready"))
+print(f"  {'':<30} status {response.status_code}")
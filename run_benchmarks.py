@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+"""Benchmark data loading, filtering, plotting and the Dash app's callbacks.
+
+Synthetic pedestrian data (see `melbviz.synthetic`) is generated at each scale,
+so no download is needed. For each benchmark the best time of several runs is
+reported, along with the peak memory allocated during a separate traced run.
+Results can be saved as JSON and compared against a baseline, in which case
+the exit status is 1 if anything got slower (or hungrier) than the tolerance.
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from melbviz.pedestrian import PedestrianDataset
+from melbviz.synthetic import write_synthetic_data
+from melbviz.utils import (
+    compact_pedestrian_df,
+    filter_pedestrian_df,
+    stream_pedestrian_data_to_parquet,
+)
+
+
+def parse_scale(scale):
+    """Parse a scale like "25x2" into (number of sensors, number of years)"""
+    n_sensors, n_years = scale.lower().split("x")
+    return int(n_sensors), int(n_years)
+
+
+def measure(func, setup=None, repeat=3):
+    """Get the best time of `repeat` calls of `func`, and its peak memory
+
+    `setup` is called before each call of `func`, without being timed or traced.
+    """
+    def prepare():
+        if setup is not None:
+            setup()
+        gc.collect()
+
+    # an untimed run first, so one-off costs like imports aren't measured
+    prepare()
+    func()
+    prepare()
+    tracemalloc.start()
+    func()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times = []
+    for _ in range(repeat):
+        prepare()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "peak_bytes": peak}
+
+
+def callback_request(outputs, inputs, triggered):
+    """Make the body of a request Dash's front end sends to run a callback"""
+    return {
+        "output": "..{}..".format(
+            "...".join(f"{output_id}.{prop}" for output_id, prop in outputs)
+        ),
+        "outputs": [{"id": output_id, "property": prop} for output_id, prop in outputs],
+        "inputs": [
+            {"id": input_id, "property": prop, "value": value}
+            for (input_id, prop), value in inputs.items()
+        ],
+        "changedPropIds": [triggered],
+    }
+
+
+def data_benchmarks(dataset, tmp_dir, counts_csv_path, sensor_csv_path):
+    df = dataset.df
+    compact_df = compact_pedestrian_df(df)
+    parquet_path = tmp_dir / "melbviz.parquet"
+    dataset.to_parquet(parquet_path)
+    year = int(df["Year"].max())
+    sensors = sorted(df["Sensor_Name"].unique())[:3]
+    week = {"start": f"{year}-05-01", "end": f"{year}-05-08"}
+    weekend_days = {"weekday": ["Saturday", "Sunday"], "hour": list(range(8, 18))}
+    index = dataset.filter_index
+
+    return {
+        "ingest": lambda: PedestrianDataset.load(counts_csv_path, sensor_csv_path),
+        "ingest (streamed to Parquet)": lambda: stream_pedestrian_data_to_parquet(
+            counts_csv_path, tmp_dir / "streamed.parquet", sensor_csv_path
+        ),
+        "to_parquet": lambda: dataset.to_parquet(parquet_path),
+        "from_parquet": lambda: PedestrianDataset.from_parquet(parquet_path),
+        "from_parquet (compact)": lambda: PedestrianDataset.from_parquet(
+            parquet_path, compact=True
+        ),
+        "filter year": lambda: filter_pedestrian_df(df, year=year),
+        "filter year, month": lambda: filter_pedestrian_df(df, year=year, month="May"),
+        "filter sensors": lambda: filter_pedestrian_df(df, sensor=sensors),
+        "filter year (compact)": lambda: filter_pedestrian_df(compact_df, year=year),
+        "filter week": lambda: filter_pedestrian_df(df, **week),
+        "filter week (index)": lambda: filter_pedestrian_df(df, index=index, **week),
+        "filter weekend days": lambda: filter_pedestrian_df(df, **weekend_days),
+        "filter weekend days (index)": lambda: filter_pedestrian_df(
+            df, index=index, **weekend_days
+        ),
+    }
+
+
+def backend_benchmarks(dataset, tmp_dir):
+    """Compare the backends on the same Parquet file, if DuckDB is installed
+
+    The count cube is bypassed by filtering by weekday and hour, so counts are
+    aggregated from the rows by the backend.
+    """
+    if importlib.util.find_spec("duckdb") is None:
+        return {}
+    parquet_path = tmp_dir / "melbviz.parquet"
+    dataset.to_parquet(parquet_path)
+    weekend_days = {"weekday": ["Saturday", "Sunday"], "hour": list(range(8, 18))}
+    benchmarks = {}
+    for backend in ("pandas", "duckdb"):
+        backend_dataset = PedestrianDataset.from_parquet(
+            parquet_path, backend=backend, cache=False
+        )
+        benchmarks.update(
+            {
+                f"from_parquet ({backend})": (
+                    lambda backend=backend: PedestrianDataset.from_parquet(
+                        parquet_path, backend=backend
+                    )
+                ),
+                f"sensor totals, weekend days ({backend})": (
+                    lambda data=backend_dataset: data.filter(**weekend_days).counts(
+                        "Sensor_Name"
+                    )
+                ),
+                f"cube tables ({backend})": (
+                    lambda data=backend_dataset: data.backend.cube_tables(data)
+                ),
+            }
+        )
+    return benchmarks
+
+
+def plot_benchmarks(dataset):
+    df = dataset.df
+    year = int(df["Year"].max())
+    sensor = df["Sensor_Name"].iloc[0]
+    year_df = filter_pedestrian_df(df, year=year)
+    plot_dfs = {"year_traffic": filter_pedestrian_df(df, sensor=sensor)}
+    # the same arguments the Dash app uses
+    plot_kwargs = {
+        "sensor_traffic": {"max_points": 10_000},
+        "sensor_map": {"sensor_table": dataset.sensor_table},
+    }
+    plot_funcs = {
+        **{
+            f"plot {kind}": (kind, func)
+            for kind, func in PedestrianDataset.plot_func_map.items()
+        },
+        **{
+            f"plot {kind} (fast)": (kind, func)
+            for kind, func in PedestrianDataset.fast_plot_func_map.items()
+            if func is not PedestrianDataset.plot_func_map[kind]
+        },
+    }
+    return {
+        name: (
+            lambda func=func, kind=kind: func(
+                plot_dfs.get(kind, year_df), **plot_kwargs.get(kind, {})
+            )
+        )
+        for name, (kind, func) in plot_funcs.items()
+    }
+
+
+def app_benchmarks(dataset):
+    """Benchmark each callback through the app's Flask server
+
+    The callbacks run on a fresh dataset each time, so that they aren't just
+    served from its caches.
+    """
+    from melbviz import app as app_module
+
+    # don't let a figure cache hide the cost of making figures
+    app_module.figure_cache = None
+    client = app_module.app.server.test_client()
+    year = int(dataset.df["Year"].max())
+    sensors = dataset.sensors[:2]
+
+    def setup():
+        app_module._data = PedestrianDataset(
+            compact_pedestrian_df(dataset.df),
+            sensor_table=dataset.sensor_table,
+            figure_layout=app_module.figure_layout,
+            aggregate=True,
+            fast_figures=app_module.MELBVIZ_FAST_FIGURES,
+        )
+
+    def post(body):
+        response = client.post("/_dash-update-component", json=body)
+        assert response.status_code == 200, response.status_code
+
+    figures = [
+        ("month-counts", "figure"),
+        ("sensor-map", "figure"),
+        ("sensor-counts", "figure"),
+        ("sensor-traffic", "figure"),
+    ]
+    filters = {
+        ("year-input", "value"): year,
+        ("month-input", "value"): None,
+        ("sensor-input", "value"): None,
+        ("date-input", "start_date"): None,
+        ("date-input", "end_date"): None,
+        ("weekday-input", "value"): None,
+        ("hour-input", "value"): [0, 23],
+    }
+    requests = {
+        "callback update_years": callback_request(
+            [("year-input", "options"), ("year-input", "value")],
+            {("url", "pathname"): "/"},
+            "url.pathname",
+        ),
+        "callback update_inputs": callback_request(
+            [
+                ("month-input", "options"),
+                ("month-input", "value"),
+                ("sensor-input", "options"),
+                ("sensor-input", "value"),
+                ("date-input", "min_date_allowed"),
+                ("date-input", "max_date_allowed"),
+                ("date-input", "initial_visible_month"),
+                ("date-input", "start_date"),
+                ("date-input", "end_date"),
+            ],
+            {("year-input", "value"): year},
+            "year-input.value",
+        ),
+        "callback update_figures (year)": callback_request(
+            figures, filters, "year-input.value"
+        ),
+        "callback update_figures (month)": callback_request(
+            figures, {**filters, ("month-input", "value"): "May"}, "month-input.value"
+        ),
+        "callback update_figures (sensors)": callback_request(
+            figures,
+            {**filters, ("sensor-input", "value"): sensors},
+            "sensor-input.value",
+        ),
+        "callback update_figures (dates)": callback_request(
+            figures,
+            {
+                **filters,
+                ("date-input", "start_date"): f"{year}-05-01",
+                ("date-input", "end_date"): f"{year}-05-07",
+            },
+            "date-input.end_date",
+        ),
+        "callback update_figures (hours)": callback_request(
+            figures, {**filters, ("hour-input", "value"): [8, 17]}, "hour-input.value"
+        ),
+    }
+    # Dash finishes setting up the app on the first request
+    client.get("/")
+    return {
+        name: (lambda body=body: post(body), setup) for name, body in requests.items()
+    }
+
+
+def run_scale(n_sensors, n_years, repeat, seed):
+    years = tuple(range(2022 - n_years + 1, 2023))
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="melbviz-benchmark-") as tmp:
+        tmp_dir = Path(tmp)
+        counts_csv_path, sensor_csv_path = write_synthetic_data(
+            tmp_dir, n_sensors, years, seed=seed
+        )
+        dataset = PedestrianDataset.load(counts_csv_path, sensor_csv_path)
+        print(f"\n{n_sensors} sensors x {n_years} years ({len(dataset.df):,} rows)")
+        benchmarks = {
+            **data_benchmarks(dataset, tmp_dir, counts_csv_path, sensor_csv_path),
+            **backend_benchmarks(dataset, tmp_dir),
+            **plot_benchmarks(dataset),
+            **app_benchmarks(dataset),
+        }
+        for name, benchmark in benchmarks.items():
+            if not isinstance(benchmark, tuple):
+                benchmark = (benchmark, None)
+            result = measure(*benchmark, repeat=repeat)
+            results[name] = result
+            print(
+                f"  {name:<36} {result['seconds'] * 1000:10.1f} ms"
+                f" {result['peak_bytes'] / 2**20:10.1f} MiB"
+            )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print and count benchmarks that are worse than the baseline"""
+    regressions = 0
+    for scale, scale_results in results.items():
+        for name, result in scale_results.items():
+            base = baseline.get(scale, {}).get(name)
+            if base is None:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                if base[metric] > 0 and result[metric] / base[metric] > tolerance:
+                    regressions += 1
+                    print(
+                        f"REGRESSION {scale} {name}: {metric}"
+                        f" {base[metric]:.4g} -> {result[metric]:.4g}"
+                    )
+    return regressions
+
+
+parser = argparse.ArgumentParser(
+    description="Benchmark melbviz on synthetic data at several scales."
+)
+parser.add_argument(
+    "--scales",
+    default="10x1,25x2,50x4",
+    help="Comma separated scales, each given as SENSORSxYEARS.",
+)
+parser.add_argument(
+    "--repeat", type=int, default=3, help="Number of timed runs of each benchmark."
+)
+parser.add_argument(
+    "--seed", type=int, default=0, help="Seed for generating synthetic data."
+)
+parser.add_argument("--save", type=Path, help="Save the results to this JSON file.")
+parser.add_argument(
+    "--compare", type=Path, help="Compare the results with this saved JSON file."
+)
+parser.add_argument(
+    "--tolerance",
+    type=float,
+    default=1.25,
+    help="Ratio to the baseline above which a result counts as a regression.",
+)
+args = parser.parse_args()
+
+results = {}
+for scale in args.scales.split(","):
+    n_sensors, n_years = parse_scale(scale)
+    results[scale] = run_scale(n_sensors, n_years, args.repeat, args.seed)
+
+if args.save is not None:
+    args.save.write_text(json.dumps(results, indent=2))
+
+if args.compare is not None:
+    baseline = json.loads(args.compare.read_text())
+    if compare(results, baseline, args.tolerance) > 0:
+        sys.exit(1)
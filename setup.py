@@ -27,7 +27,14 @@ REQUIRED = [
 
 
 # Optional Packages
-EXTRAS = {}
+EXTRAS = {
+    # for memory-mapping the dataset as an Arrow file
+    "arrow": ["pyarrow"],
+    # for compressing the Dash app's responses
+    "compress": ["flask-compress", "brotli"],
+    # for querying the dataset's Parquet files in place, rather than loading them
+    "duckdb": ["duckdb"],
+}
 
 # get the absolute path to this file
 here = os.path.abspath(os.path.dirname(__file__))
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+
+# the dimensions each level of the summary cube is aggregated over, from
+# coarsest to finest. Queries are answered using the first level containing all
+# the requested columns.
+CUBE_LEVELS = {
+    "yearly": ["Year", "Sensor_Name"],
+    "monthly": ["Year", "Month", "Sensor_Name"],
+    "hourly": ["Year", "Month", "Sensor_Name", "Hour"],
+}
+
+# integer columns spanning fewer values than this are coded by offset from their
+# minimum, eg years
+MAX_RANGE_CODES = 100_000
+
+
+def column_codes(values):
+    """Get integer codes for a column, along with the value of each code
+
+    Codes index into the sorted unique values, the categories of a categorical
+    column (whose codes are used as they are), or the range of values of an
+    integer column with a small range (whose codes are offsets from the
+    minimum). Neither of the latter need any hashing. Missing values have a
+    code of -1. Not every value need be present in the column.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    if pd.api.types.is_integer_dtype(values.dtype) and len(values) > 0:
+        array = values.to_numpy()
+        low, high = int(array.min()), int(array.max())
+        if high - low < MAX_RANGE_CODES:
+            return array - low, np.arange(low, high + 1, dtype=array.dtype)
+    return pd.factorize(values, sort=True)
+
+
+def sum_counts(df, by, value="Hourly_Counts"):
+    """Sum a column of a DataFrame for each group of one or more columns
+
+    Equivalent to `df.groupby(by, observed=True)[value].sum().reset_index()`,
+    but rather than hashing each row's values, each grouping column is turned
+    into integer codes, which are combined into a single group code for each
+    row and summed with `np.bincount`. Groups are sorted as they would be by
+    `groupby`, and rows with a missing value in any grouping column are left out.
+    """
+    if isinstance(by, str):
+        by = [by]
+    by = list(by)
+    codes, uniques = zip(*(column_codes(df[col]) for col in by))
+    shape = tuple(len(col_uniques) for col_uniques in uniques)
+    values = df[value].to_numpy()
+    present = np.logical_and.reduce([col_codes >= 0 for col_codes in codes])
+    if not present.all():
+        codes = [col_codes[present] for col_codes in codes]
+        values = values[present]
+    group_codes = np.ravel_multi_index(codes, shape)
+    n_groups = int(np.prod(shape, dtype="int64"))
+    if n_groups > 4 * len(group_codes) + 1024:
+        # too sparse to count every possible group, so only count those present
+        groups, group_codes = np.unique(group_codes, return_inverse=True)
+        sums = np.bincount(group_codes, weights=values, minlength=len(groups))
+    else:
+        sizes = np.bincount(group_codes, minlength=n_groups)
+        sums = np.bincount(group_codes, weights=values, minlength=n_groups)
+        groups = np.flatnonzero(sizes)
+        sums = sums[groups]
+    if np.issubdtype(values.dtype, np.integer):
+        # the weighted counts are floats, which are exact for any realistic total
+        sums = sums.round().astype("int64")
+    group_values = np.unravel_index(groups, shape)
+    result = pd.DataFrame(
+        {
+            col: group_keys(df[col].dtype, col_uniques, col_group_codes)
+            for col, col_uniques, col_group_codes in zip(by, uniques, group_values)
+        }
+    )
+    result[value] = sums
+    return result
+
+
+def group_keys(dtype, uniques, codes):
+    """Values of a grouping column for the given codes, keeping categoricals"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(codes, dtype=dtype)
+    return uniques.take(codes)
+
+
+def build_cube_tables(df):
+    """Aggregate a cleaned pedestrian counts DataFrame into each cube level
+
+    Returns a dict mapping the name of each level in `CUBE_LEVELS` to a
+    DataFrame of summed "Hourly_Counts" over that level's dimensions. Each
+    level is summed from the next finest, so only the hourly level is computed
+    from the rows of `df`.
+    """
+    columns = {col: df[col] for col in CUBE_LEVELS["monthly"]}
+    hourly_df = pd.DataFrame(
+        {
+            **columns,
+            "Hour": df["Date_Time"].dt.hour,
+            "Hourly_Counts": df["Hourly_Counts"],
+        }
+    )
+    return summarise_cube_tables(sum_counts(hourly_df, CUBE_LEVELS["hourly"]))
+
+
+def summarise_cube_tables(hourly):
+    """Make every level of the cube from its hourly level"""
+    tables = {"hourly": hourly}
+    tables["monthly"] = sum_counts(hourly, CUBE_LEVELS["monthly"])
+    tables["yearly"] = sum_counts(tables["monthly"], CUBE_LEVELS["yearly"])
+    return {level: tables[level] for level in CUBE_LEVELS}
+
+
+def combine_cube_tables(tables):
+    """Combine the cube tables of several DataFrames into those of their union
+
+    `tables` is a sequence of dicts as returned by `build_cube_tables`, eg one
+    for each chunk of a dataset that's too big to aggregate at once.
+    """
+    hourly = pd.concat([chunk_tables["hourly"] for chunk_tables in tables])
+    return summarise_cube_tables(sum_counts(hourly, CUBE_LEVELS["hourly"]))
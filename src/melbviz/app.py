@@ -1,37 +1,366 @@
-from dash import Dash
-from dash.dependencies import Input, Output, State
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import json
+import calendar
+import logging
+import threading
+import time
+import weakref
+
+from dash import Dash, callback_context, no_update
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_core_components as dcc
 import dash_html_components as html
+from flask import Flask, g, request
 
+from .cache import FilterCache
 from .pedestrian import PedestrianDataset
-from .config import MELBVIZ_DATA_PATH
-from .utils import make_options
+from .config import (
+    MELBVIZ_ARROW_DATA_PATH,
+    MELBVIZ_ARROW_FILTER_CACHE_BYTES,
+    MELBVIZ_BACKEND,
+    MELBVIZ_CLEANED_DATA_PATH,
+    MELBVIZ_CLIENTSIDE,
+    MELBVIZ_COMPRESS,
+    MELBVIZ_COMPRESS_ALGORITHMS,
+    MELBVIZ_FAST_FIGURES,
+    MELBVIZ_FIGURE_CACHE_PATH,
+    MELBVIZ_MAX_PLOT_POINTS,
+    MELBVIZ_METRICS,
+    MELBVIZ_PARTITIONED_DATA_PATH,
+    MELBVIZ_SLOW_REQUEST_SECONDS,
+    MELBVIZ_TYPED_ARRAYS,
+    MELBVIZ_WARM_START,
+    MELBVIZ_WARM_VIEWS,
+    MELBVIZ_WARM_WORKERS,
+)
+from .figure_cache import DiskFigureCache, figure_cache_key
+from .utils import DAYS, MONTH_NUMBERS, make_options
+from . import clientside
 from . import figure_layouts as layouts
+from . import metrics
+from . import plots
+
 
+logger = logging.getLogger(__name__)
 
-app = Dash(__name__)
+server = Flask(__name__)
+# read by Flask-Compress when Dash sets it up, if compression is enabled
+server.config["COMPRESS_ALGORITHM"] = MELBVIZ_COMPRESS_ALGORITHMS.split(",")
+app = Dash(__name__, server=server, compress=MELBVIZ_COMPRESS)
 
 # this will be passed into the layout of each figure
 figure_layout = {"margin": {"t": 60}}
 
-data = PedestrianDataset.from_parquet(
-    MELBVIZ_DATA_PATH / "melbviz.parquet", figure_layout=figure_layout
-)
+# for each figure, a layout applied after it's made and the kwargs it's made with
+figure_specs = {
+    "month_counts": (layouts.clean_layout.to_plotly_json(), {}),
+    "sensor_map": ({"margin": {"b": 50}}, {"height": 600, "width": 800}),
+    "sensor_counts": (layouts.clean_layout.to_plotly_json(), {"width": 450}),
+    "sensor_traffic": (None, {"max_points": MELBVIZ_MAX_PLOT_POINTS}),
+}
+
+# figures made in the browser when MELBVIZ_CLIENTSIDE is set, by the functions
+# in assets/melbviz.js, with the inputs of the clientside callback for each
+clientside_figures = {
+    "month-counts": ("monthCounts", ["sensor-input"]),
+    "sensor-counts": ("sensorCounts", ["month-input", "sensor-input"]),
+    "sensor-map": ("sensorMap", ["month-input", "sensor-input"]),
+}
+
+# the dataset is loaded on first use (or by a warm-up thread) so that the server
+# can start accepting connections straight away
+_data = None
+_data_lock = threading.Lock()
+
+
+def parquet_data_path():
+    """Path of the Parquet data the app loads if there's no Arrow file to map
+
+    This is the partitioned dataset kept up to date by update_parquet.py, if
+    there is one, or else the single file written by make_parquet.py.
+    """
+    if MELBVIZ_PARTITIONED_DATA_PATH.exists():
+        return MELBVIZ_PARTITIONED_DATA_PATH
+    return MELBVIZ_CLEANED_DATA_PATH
+
+
+def load_data():
+    if MELBVIZ_BACKEND == "pandas" and MELBVIZ_ARROW_DATA_PATH.exists():
+        # memory-mapped, so all worker processes share the same copy of the data
+        # and its filter index. Only the filter cache is per process.
+        cache = False
+        if MELBVIZ_ARROW_FILTER_CACHE_BYTES > 0:
+            cache = FilterCache(max_bytes=MELBVIZ_ARROW_FILTER_CACHE_BYTES)
+        return PedestrianDataset.from_arrow(
+            MELBVIZ_ARROW_DATA_PATH,
+            figure_layout=figure_layout,
+            cache=cache,
+            aggregate=True,
+            fast_figures=MELBVIZ_FAST_FIGURES,
+        )
+    return PedestrianDataset.from_parquet(
+        parquet_data_path(),
+        figure_layout=figure_layout,
+        compact=True,
+        aggregate=True,
+        fast_figures=MELBVIZ_FAST_FIGURES,
+        backend=MELBVIZ_BACKEND,
+    )
+
+
+def get_data():
+    """Get the app's dataset, loading it if this is the first use"""
+    global _data
+    if _data is None:
+        with _data_lock:
+            if _data is None:
+                _data = load_data()
+    return _data
+
+
+def warm_up():
+    """Load the dataset and import Plotly Express ahead of the first request
+
+    Then the views given by MELBVIZ_WARM_VIEWS are precomputed, so that they're
+    cached before anyone asks for them.
+    """
+    get_data()
+    plots.express()
+    warm_caches()
+
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+
+def start_warm_up():
+    """Run `warm_up` in a background thread, unless one is running or has loaded
+
+    A thread that failed to load the dataset is replaced, so that loading is
+    retried. Returns whether a thread was started.
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        thread = _warm_up_thread
+        if thread is not None and (thread.is_alive() or _data is not None):
+            return False
+        _warm_up_thread = threading.Thread(
+            target=warm_up, name="melbviz-warm-up", daemon=True
+        )
+        _warm_up_thread.start()
+        return True
+
+
+# filter states that can be precomputed by `warm_caches`
+WARM_VIEWS = ("none", "years", "months")
+
+# progress of `warm_caches`, reported by the readiness endpoint
+warm_status = {"done": 0, "total": 0}
+_warm_status_lock = threading.Lock()
+
+
+def warm_views(dataset, views=MELBVIZ_WARM_VIEWS):
+    """List the (year, month) filter states to precompute, most likely first
+
+    `views` is "years" for the default view of each year, or "months" for each
+    month of each year as well. The latest year comes first, as it's selected
+    when the page loads, then the other years from the latest.
+    """
+    if views not in WARM_VIEWS:
+        options = ", ".join(f"'{name}'" for name in WARM_VIEWS)
+        raise ValueError(
+            f"'{views}' is not a valid set of views. Use one of: {options}"
+        )
+    if views == "none":
+        return []
+    years = [int(year) for year in reversed(dataset.years)]
+    year_views = [(year, None) for year in years]
+    if views == "years":
+        return year_views
+    month_views = [
+        (year, option["value"]) for year in years for option in input_options(year)[0]
+    ]
+    return year_views + month_views
+
+
+def warm_view(year, month=None):
+    """Compute the inputs and figures of a view, so that they're cached
+
+    In clientside mode, these are the year's cube and the sensor-traffic figure.
+    Figures are only kept if the figure cache is enabled, but making them also
+    caches the filtered data they need.
+    """
+    input_options(year)
+    if MELBVIZ_CLIENTSIDE:
+        # the year's cube doesn't depend on the month
+        if month is None:
+            update_year_cube(year, None, None, None, None)
+        update_sensor_traffic(year, month, None, None, None, None, None)
+    else:
+        # the month-counts figure doesn't depend on the month
+        view_figures(year, month, None, {}, month_counts=month is None)
+    with _warm_status_lock:
+        warm_status["done"] += 1
+
+
+def warm_caches(views=MELBVIZ_WARM_VIEWS, max_workers=MELBVIZ_WARM_WORKERS):
+    """Precompute the views of the dataset most likely to be asked for
+
+    Views are computed by a pool of threads, which leaves the server free to
+    handle requests. See `warm_views` for `views`.
+    """
+    view_list = warm_views(get_data(), views)
+    with _warm_status_lock:
+        warm_status["total"] += len(view_list)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers, thread_name_prefix="melbviz-warm") as pool:
+        futures = [pool.submit(warm_view, *view) for view in view_list]
+    for view, future in zip(view_list, futures):
+        if future.exception() is not None:
+            logger.error("Failed to warm view %s", view, exc_info=future.exception())
+    logger.info("Warmed %d views in %.1fs", len(view_list), time.perf_counter() - start)
+
+
+@app.server.route("/ready")
+def ready():
+    """Readiness endpoint, which succeeds once the dataset has been loaded
+
+    The first probe starts loading the dataset in the background if
+    MELBVIZ_WARM_START hasn't already, so a worker becomes ready without
+    waiting for a page request. The number of views precomputed so far is
+    reported as "warm".
+    """
+    if _data is None:
+        start_warm_up()
+        return {"status": "loading"}, 503
+    with _warm_status_lock:
+        warm = dict(warm_status)
+    return {"status": "ready", "version": _data.version, "warm": warm}, 200
+
+
+@app.server.route("/metrics")
+def serve_metrics():
+    """Metrics for this worker process, in the Prometheus text format"""
+    return metrics.render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+@app.server.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.start_trace()
+
+
+def request_labels():
+    """Metric labels for the current request, which take a bounded set of values
+
+    Requests are labelled by the route they matched rather than their path, and
+    callback requests by the component properties they update, if those are
+    the outputs of a registered callback.
+    """
+    path = request.url_rule.rule if request.url_rule is not None else "other"
+    body = request.get_json(silent=True) if request.is_json else None
+    output = body.get("output", "") if isinstance(body, dict) else ""
+    if output not in app.callback_map:
+        output = ""
+    return {"path": path, "output": output}
+
+
+@app.server.after_request
+def record_request(response):
+    seconds = time.perf_counter() - g.request_start
+    stages = metrics.end_trace()
+    labels = request_labels()
+    if MELBVIZ_METRICS:
+        metrics.request_duration.observe(seconds, **labels)
+        if response.content_length is not None:
+            metrics.response_size.observe(response.content_length, **labels)
+    if (
+        MELBVIZ_SLOW_REQUEST_SECONDS is not None
+        and seconds > MELBVIZ_SLOW_REQUEST_SECONDS
+    ):
+        breakdown = ", ".join(
+            f"{metrics.format_stage(stage, stage_labels)}={stage_seconds:.3f}s"
+            for stage, stage_labels, stage_seconds in stages
+        )
+        logger.warning(
+            "Slow request %s %s %s took %.3fs, %s bytes (%s)",
+            request.method,
+            request.path,
+            labels["output"],
+            seconds,
+            response.content_length,
+            breakdown,
+        )
+    return response
+
+
+figure_cache = None
+if MELBVIZ_FIGURE_CACHE_PATH is not None:
+    figure_cache = DiskFigureCache(MELBVIZ_FIGURE_CACHE_PATH)
+
+
+def figure_format(dataset):
+    """Settings that change how figures are encoded, which cache keys include
+
+    A cache directory can outlive these settings, and figures encoded one way
+    can't stand in for the other, eg typed arrays for an older plotly.js.
+    """
+    return {
+        "fast_figures": dataset.params["fast_figures"],
+        "typed_arrays": MELBVIZ_TYPED_ARRAYS,
+    }
+
+
+def make_figure(dataset, plot_kind, layout=None, **plot_kwargs):
+    """Make a figure from a filtered dataset, using the figure cache if enabled
+
+    `layout` is applied to the figure after it's made.
+    """
+    return make_figures(dataset, [(plot_kind, layout, plot_kwargs)])[0]
+
+
+def make_figures(dataset, plot_specs):
+    """Make several figures from a filtered dataset, using any figure cache
+
+    `plot_specs` is a list of (plot kind, layout, plot kwargs) tuples, where
+    `layout` is applied to the figure after it's made. Figures that aren't cached are
+    made together, in parallel, by `PedestrianDataset.get_figs`.
+    """
+    figures = [None] * len(plot_specs)
+    keys = [None] * len(plot_specs)
+    missing = []
+    for i, (plot_kind, layout, plot_kwargs) in enumerate(plot_specs):
+        if figure_cache is not None:
+            keys[i] = figure_cache_key(
+                plot_kind,
+                dataset.active_filters,
+                dict(plot_kwargs, layout=layout),
+                version=dataset.version,
+                figure_format=figure_format(dataset),
+            )
+            figure_json = figure_cache.get(keys[i])
+            if figure_json is not None:
+                # Dash accepts dictionaries wherever a figure is expected
+                figures[i] = json.loads(figure_json)
+                continue
+        missing.append(i)
+    made = dataset.get_figs([(plot_specs[i][0], plot_specs[i][2]) for i in missing])
+    for i, figure in zip(missing, made):
+        layout = plot_specs[i][1]
+        if figure is not None and layout is not None:
+            figure.update_layout(layout)
+        if figure is not None and figure_cache is not None:
+            figure_cache.set(keys[i], figure.to_json())
+        figures[i] = figure
+    return figures
 
 
 controls = html.Div(
     id="controls",
     children=[
         html.Div(
-            [
-                html.Label("Year"),
-                dcc.Dropdown(
-                    id="year-input",
-                    className="input",
-                    options=make_options(data.years),
-                    value=data.years[-1],
-                ),
-            ]
+            [html.Label("Year"), dcc.Dropdown(id="year-input", className="input")]
         ),
         html.Div(
             [html.Label("Month"), dcc.Dropdown(id="month-input", className="input")]
@@ -42,6 +371,40 @@ controls = html.Div(
                 dcc.Dropdown(id="sensor-input", multi=True, className="input"),
             ]
         ),
+        html.Div(
+            [
+                html.Label("Dates"),
+                dcc.DatePickerRange(id="date-input", clearable=True, className="input"),
+            ]
+        ),
+        html.Div(
+            [
+                html.Label("Weekday"),
+                dcc.Dropdown(
+                    id="weekday-input",
+                    options=make_options(DAYS),
+                    multi=True,
+                    className="input",
+                ),
+            ]
+        ),
+        html.Div(
+            [
+                html.Label("Hours"),
+                html.Div(
+                    dcc.RangeSlider(
+                        id="hour-input",
+                        min=0,
+                        max=23,
+                        step=1,
+                        value=[0, 23],
+                        marks={hour: str(hour) for hour in range(0, 24, 3)},
+                    ),
+                    className="input",
+                    id="hour-input-container",
+                ),
+            ]
+        ),
     ],
 )
 
@@ -74,7 +437,35 @@ content = html.Div(
 )
 
 
-app.layout = html.Div([sidebar, content])
+# the layout doesn't depend on the dataset, as Dash builds it when handling the
+# first request (even one to /ready). The year options are filled in by the
+# update_years callback when the page loads.
+app.layout = html.Div([dcc.Location(id="url"), sidebar, content])
+
+if MELBVIZ_CLIENTSIDE:
+    clientside_layouts = clientside.figure_layouts(
+        figure_layout,
+        {
+            kind: {**figure_specs[kind][0], **figure_specs[kind][1]}
+            for kind in clientside.CLIENTSIDE_LAYOUTS
+        },
+    )
+    app.layout.children.extend(
+        [
+            dcc.Store(id="year-cube"),
+            dcc.Store(id="figure-layouts", data=clientside_layouts),
+        ]
+    )
+
+
+@app.callback(
+    [Output("year-input", "options"), Output("year-input", "value")],
+    [Input("url", "pathname")],
+)
+@metrics.timed("callback", callback="update_years")
+def update_years(_pathname):
+    years = get_data().years
+    return make_options(years), years[-1]
 
 
 @app.callback(
@@ -83,68 +474,209 @@ app.layout = html.Div([sidebar, content])
         Output("month-input", "value"),
         Output("sensor-input", "options"),
         Output("sensor-input", "value"),
+        Output("date-input", "min_date_allowed"),
+        Output("date-input", "max_date_allowed"),
+        Output("date-input", "initial_visible_month"),
+        Output("date-input", "start_date"),
+        Output("date-input", "end_date"),
     ],
     [Input("year-input", "value")],
 )
+@metrics.timed("callback", callback="update_inputs")
 def update_inputs(year):
-    new_data = data.filter(year)
-    return (make_options(new_data.months), None, make_options(new_data.sensors), None)
+    month_options, sensor_options = input_options(year)
+    first_day, last_day = date_bounds(year)
+    return (
+        month_options,
+        None,
+        sensor_options,
+        None,
+        first_day,
+        last_day,
+        first_day,
+        None,
+        None,
+    )
 
 
-@app.callback(
-    Output("month-counts", "figure"),
-    [
-        Input("year-input", "value"),
-        Input("sensor-input", "value"),
-    ],
-)
-def month_counts(year, sensor):
-    split_sensors = sensor is not None and len(sensor) > 1
-    figure = data.filter(year=year, sensor=sensor).get_fig(
-        "month_counts", split_sensors=split_sensors
+# options of the month and sensor inputs for each year, for each dataset
+_input_options = weakref.WeakKeyDictionary()
+
+
+def input_options(year):
+    """Options of the month and sensor inputs for a year
+
+    These are cached for each dataset, as they're the same for all users.
+    """
+    data = get_data()
+    options = _input_options.setdefault(data, {})
+    if year not in options:
+        year_data = data.filter(year=year)
+        options[year] = (
+            make_options(year_data.months),
+            make_options(year_data.sensors),
+        )
+    return options[year]
+
+
+def date_bounds(year):
+    """First and last days that can be picked for a year
+
+    If no year is selected, these are the first day of the earliest month in
+    the dataset and the last day of the latest.
+    """
+    if year is not None:
+        return date(year, 1, 1), date(year, 12, 31)
+    months = get_data().counts(["Year", "Month"])
+    month_numbers = months["Year"].astype("int64") * 12 + (
+        months["Month"].astype(str).map(MONTH_NUMBERS).astype("int64") - 1
+    )
+    first_year, first_month = divmod(int(month_numbers.min()), 12)
+    last_year, last_month = divmod(int(month_numbers.max()), 12)
+    last_day = calendar.monthrange(last_year, last_month + 1)[1]
+    return (
+        date(first_year, first_month + 1, 1),
+        date(last_year, last_month + 1, last_day),
     )
-    figure.update_layout(layouts.clean_layout)
-    return figure
 
 
-@app.callback(
-    Output("sensor-map", "figure"),
-    [
-        Input("year-input", "value"),
-        Input("month-input", "value"),
-        Input("sensor-input", "value"),
-    ],
-)
-def sensor_map(year, month, sensor):
-    figure = data.filter(year=year, month=month, sensor=sensor).get_fig(
-        "sensor_map", height=600, width=800
+def time_filters(start_date, end_date, weekday, hours):
+    """Convert the values of the date, weekday and hour inputs to filters
+
+    The date range includes the whole of its end date, and the full range of
+    hours doesn't filter anything.
+    """
+    end = None
+    if end_date is not None:
+        end = date.fromisoformat(end_date[:10]) + timedelta(days=1)
+    hour = None
+    if hours is not None and list(hours) != [0, 23]:
+        hour = list(range(hours[0], hours[1] + 1))
+    return {"start": start_date, "end": end, "weekday": weekday, "hour": hour}
+
+
+def update_figures(year, month, sensor, start_date, end_date, weekday, hours):
+    """Update all figures from a single filtering of the dataset
+
+    The month-counts figure isn't filtered by month, so is left alone when only
+    the month changed.
+    """
+    triggered = {trigger["prop_id"] for trigger in callback_context.triggered}
+    only_month = triggered == {"month-input.value"}
+    month_counts, *sensor_figures = view_figures(
+        year,
+        month,
+        sensor,
+        time_filters(start_date, end_date, weekday, hours),
+        month_counts=not only_month,
     )
-    figure.update_layout(margin=dict(b=50))
-    return figure
+    return (no_update if only_month else month_counts, *sensor_figures)
 
 
-@app.callback(
-    Output("sensor-counts", "figure"),
-    [
-        Input("year-input", "value"),
-        Input("month-input", "value"),
-        Input("sensor-input", "value"),
-    ],
-)
-def sensor_counts(year, month, sensor):
-    figure = data.filter(year, month, sensor).get_fig("sensor_counts", width=450)
-    figure.update_layout(layouts.clean_layout)
-    return figure
+def view_figures(year, month, sensor, filters, month_counts=True):
+    """Make all figures of a view, or get them from the figure cache
 
+    `filters` are any time filters, as made by `time_filters`. The sensor-map,
+    sensor-counts and sensor-traffic figures share the same filtered dataset,
+    and so its per-sensor totals, and are made in parallel. The month-counts
+    figure is only made if `month_counts` is True, and is otherwise None.
+    """
+    data = get_data()
+    if month_counts:
+        split_sensors = sensor is not None and len(sensor) > 1
+        layout, kwargs = figure_specs["month_counts"]
+        month_counts = make_figure(
+            data.filter(year=year, sensor=sensor, **filters),
+            "month_counts",
+            layout=layout,
+            split_sensors=split_sensors,
+            **kwargs,
+        )
+    else:
+        month_counts = None
+    filtered_data = data.filter(year=year, month=month, sensor=sensor, **filters)
+    sensor_map, sensor_counts, sensor_traffic = make_figures(
+        filtered_data,
+        [
+            (plot_kind, *figure_specs[plot_kind])
+            for plot_kind in ("sensor_map", "sensor_counts", "sensor_traffic")
+        ],
+    )
+    return month_counts, sensor_map, sensor_counts, sensor_traffic
 
-@app.callback(
-    Output("sensor-traffic", "figure"),
-    [
-        Input("year-input", "value"),
-        Input("month-input", "value"),
-        Input("sensor-input", "value"),
-    ],
-)
-def sensor_traffic(year, month, sensor):
-    figure = data.filter(year, month, sensor).get_fig("sensor_traffic")
-    return figure
+
+def update_sensor_traffic(year, month, sensor, start_date, end_date, weekday, hours):
+    """Update the only figure made on the server when MELBVIZ_CLIENTSIDE is set"""
+    layout, kwargs = figure_specs["sensor_traffic"]
+    filters = time_filters(start_date, end_date, weekday, hours)
+    filtered_data = get_data().filter(year=year, month=month, sensor=sensor, **filters)
+    return make_figure(filtered_data, "sensor_traffic", layout=layout, **kwargs)
+
+
+# the per-year cube of each whole year, for each dataset
+_year_cubes = weakref.WeakKeyDictionary()
+
+
+def update_year_cube(year, start_date, end_date, weekday, hours):
+    """Send the browser the monthly counts of each sensor in the selected year
+
+    The counts are only of the selected dates, weekdays and hours, which are
+    filtered on the server. Cubes of whole years, which are sent when the page
+    loads, are cached for each dataset.
+    """
+    filters = time_filters(start_date, end_date, weekday, hours)
+    data = get_data()
+    if any(filters.values()):
+        return clientside.year_cube(data, year, **filters)
+    cubes = _year_cubes.setdefault(data, {})
+    if year not in cubes:
+        cubes[year] = clientside.year_cube(data, year)
+    return cubes[year]
+
+
+time_inputs = [
+    Input("date-input", "start_date"),
+    Input("date-input", "end_date"),
+    Input("weekday-input", "value"),
+    Input("hour-input", "value"),
+]
+
+filter_inputs = [
+    Input("year-input", "value"),
+    Input("month-input", "value"),
+    Input("sensor-input", "value"),
+    *time_inputs,
+]
+
+if MELBVIZ_CLIENTSIDE:
+    app.callback(
+        Output("year-cube", "data"), [Input("year-input", "value"), *time_inputs]
+    )(metrics.timed("callback", callback="update_year_cube")(update_year_cube))
+    app.callback(Output("sensor-traffic", "figure"), filter_inputs)(
+        metrics.timed("callback", callback="update_sensor_traffic")(
+            update_sensor_traffic
+        )
+    )
+    for figure_id, (function_name, input_ids) in clientside_figures.items():
+        app.clientside_callback(
+            ClientsideFunction(namespace="melbviz", function_name=function_name),
+            Output(figure_id, "figure"),
+            [
+                Input("year-cube", "data"),
+                *(Input(input_id, "value") for input_id in input_ids),
+            ],
+            [State("figure-layouts", "data")],
+        )
+else:
+    app.callback(
+        [
+            Output("month-counts", "figure"),
+            Output("sensor-map", "figure"),
+            Output("sensor-counts", "figure"),
+            Output("sensor-traffic", "figure"),
+        ],
+        filter_inputs,
+    )(metrics.timed("callback", callback="update_figures")(update_figures))
+
+if MELBVIZ_WARM_START:
+    start_warm_up()
@@ -0,0 +1,210 @@
+// Clientside callbacks that make the month-counts, sensor-counts and
+// sensor-map figures in the browser, from the cube of monthly counts for the
+// selected year sent by the server (see melbviz/clientside.py). They're only
+// used when MELBVIZ_CLIENTSIDE is set, and mirror the functions in
+// melbviz/plots.py.
+
+(function () {
+    // a filter's values as an array, or null if it doesn't filter anything
+    function filterValues(value) {
+        if (value === null || value === undefined) {
+            return null;
+        }
+        const values = Array.isArray(value) ? value : [value];
+        return values.length === 0 ? null : values;
+    }
+
+    // indexes of the cube's rows that match the month and sensor filters
+    function filterRows(cube, month, sensor) {
+        const months = filterValues(month);
+        const sensors = filterValues(sensor);
+        const monthCodes =
+            months && new Set(months.map((m) => cube.months.indexOf(m)));
+        const sensorCodes =
+            sensors && new Set(sensors.map((s) => cube.sensors.indexOf(s)));
+        const rows = [];
+        for (let i = 0; i < cube.counts.length; i++) {
+            if (
+                (monthCodes === null || monthCodes.has(cube.month[i])) &&
+                (sensorCodes === null || sensorCodes.has(cube.sensor[i]))
+            ) {
+                rows.push(i);
+            }
+        }
+        return rows;
+    }
+
+    // total counts of the given rows for each code of a column of the cube
+    function sumCounts(cube, rows, column, nCodes) {
+        const totals = new Array(nCodes).fill(0);
+        const present = new Array(nCodes).fill(false);
+        for (const i of rows) {
+            totals[cube[column][i]] += cube.counts[i];
+            present[cube[column][i]] = true;
+        }
+        return {totals: totals, present: present};
+    }
+
+    // the same as utils.title_with_filters
+    function titleWithFilters(title, month, year) {
+        const values = [month, year].filter(
+            (value) => value !== null && value !== undefined && value !== ""
+        );
+        return values.length === 0 ? title : `${title} for ${values.join(", ")}`;
+    }
+
+    function makeLayout(layouts, plotKind, title) {
+        const layout = Object.assign({}, layouts[plotKind]);
+        layout.title = Object.assign({}, layout.title, {text: title});
+        return layout;
+    }
+
+    function monthCounts(cube, sensor, layouts) {
+        if (!cube || !layouts) {
+            return window.dash_clientside.no_update;
+        }
+        const layout = makeLayout(
+            layouts,
+            "month_counts",
+            titleWithFilters("Monthly Sensor Traffic", null, cube.year)
+        );
+        const rows = filterRows(cube, null, sensor);
+        const splitSensors =
+            sensor !== null && sensor !== undefined && sensor.length > 1;
+        const traces = [];
+        if (splitSensors) {
+            const colorway = layout.template.layout.colorway;
+            cube.sensors.forEach(function (name, sensorCode) {
+                const sensorRows = rows.filter(
+                    (i) => cube.sensor[i] === sensorCode
+                );
+                if (sensorRows.length === 0) {
+                    return;
+                }
+                const sums = sumCounts(
+                    cube, sensorRows, "month", cube.months.length
+                );
+                const months = cube.months.filter((_, code) => sums.present[code]);
+                traces.push({
+                    type: "bar",
+                    name: name,
+                    legendgroup: name,
+                    offsetgroup: name,
+                    alignmentgroup: "True",
+                    showlegend: true,
+                    orientation: "v",
+                    marker: {color: colorway[traces.length % colorway.length]},
+                    x: months,
+                    y: months.map((m) => sums.totals[cube.months.indexOf(m)]),
+                    hovertemplate:
+                        `Sensor_Name=${name}<br>Month=%{x}<br>` +
+                        "Hourly_Counts=%{y}<extra></extra>",
+                });
+            });
+        } else {
+            const sums = sumCounts(cube, rows, "month", cube.months.length);
+            const months = cube.months.filter((_, code) => sums.present[code]);
+            traces.push({
+                type: "bar",
+                name: "",
+                showlegend: false,
+                orientation: "v",
+                x: months,
+                y: months.map((m) => sums.totals[cube.months.indexOf(m)]),
+                hovertemplate: "Month=%{x}<br>Hourly_Counts=%{y}<extra></extra>",
+            });
+        }
+        return {data: traces, layout: layout};
+    }
+
+    // total counts of each sensor with any counts, in the cube's sensor order
+    function sensorTotals(cube, month, sensor) {
+        const rows = filterRows(cube, month, sensor);
+        const sums = sumCounts(cube, rows, "sensor", cube.sensors.length);
+        const codes = cube.sensors
+            .map((_, code) => code)
+            .filter((code) => sums.present[code]);
+        return codes.map((code) => ({code: code, total: sums.totals[code]}));
+    }
+
+    function sensorCounts(cube, month, sensor, layouts) {
+        if (!cube || !layouts) {
+            return window.dash_clientside.no_update;
+        }
+        const layout = makeLayout(
+            layouts,
+            "sensor_counts",
+            titleWithFilters("Ranked Sensor Traffic", month, cube.year)
+        );
+        // sorting is stable, so sensors with equal totals stay in name order
+        const totals = sensorTotals(cube, month, sensor).sort(
+            (a, b) => a.total - b.total
+        );
+        if (layout.height === undefined) {
+            layout.height = Math.max(18 * totals.length, 600);
+        }
+        const trace = {
+            type: "bar",
+            name: "",
+            showlegend: false,
+            orientation: "h",
+            x: totals.map((row) => row.total),
+            y: totals.map((row) => cube.sensors[row.code]),
+            hovertemplate: "Total Counts=%{x}<br>Sensor_Name=%{y}<extra></extra>",
+        };
+        return {data: [trace], layout: layout};
+    }
+
+    function mean(values) {
+        const present = values.filter((value) => value !== null);
+        return present.reduce((a, b) => a + b, 0) / present.length;
+    }
+
+    function sensorMap(cube, month, sensor, layouts) {
+        if (!cube || !layouts) {
+            return window.dash_clientside.no_update;
+        }
+        const layout = makeLayout(
+            layouts,
+            "sensor_map",
+            titleWithFilters("Sensor Traffic", month, cube.year)
+        );
+        const totals = sensorTotals(cube, month, sensor);
+        const counts = totals.map((row) => row.total);
+        const lat = totals.map((row) => cube.latitude[row.code]);
+        const lon = totals.map((row) => cube.longitude[row.code]);
+        layout.mapbox = Object.assign({}, layout.mapbox, {
+            center: {lat: mean(lat), lon: mean(lon)},
+        });
+        // as Plotly Express sizes markers, with a size_max of 50
+        const sizeref = Math.max(...counts, 0) / 50 ** 2 || 1;
+        const trace = {
+            type: "scattermapbox",
+            mode: "markers+text",
+            name: "",
+            showlegend: false,
+            lat: lat,
+            lon: lon,
+            text: totals.map((row) => cube.sensors[row.code]),
+            marker: {
+                color: counts,
+                coloraxis: "coloraxis",
+                size: counts,
+                sizemode: "area",
+                sizeref: sizeref,
+            },
+            hovertemplate:
+                "Total Counts=%{marker.color}<br>Sensor_Name=%{text}<br>" +
+                "Latitude=%{lat}<br>Longitude=%{lon}<extra></extra>",
+        };
+        return {data: [trace], layout: layout};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        melbviz: {
+            monthCounts: monthCounts,
+            sensorCounts: sensorCounts,
+            sensorMap: sensorMap,
+        },
+    });
+})();
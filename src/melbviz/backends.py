@@ -0,0 +1,233 @@
+from pathlib import Path
+
+from .aggregate import CUBE_LEVELS, build_cube_tables, summarise_cube_tables, sum_counts
+from .config import MELBVIZ_DUCKDB_THREADS
+from .utils import (
+    SENSOR_COLUMNS,
+    as_timestamp,
+    compact_pedestrian_df,
+    filter_pedestrian_df,
+    filter_values,
+    weekday_numbers,
+)
+
+
+# the column each of the year, month and sensor filters applies to
+FILTER_COLUMNS = {"year": "Year", "month": "Month", "sensor": "Sensor_Name"}
+
+# columns a Parquet file may have that aren't pedestrian counts, eg the index
+# written by fastparquet or pyarrow
+INDEX_COLUMNS = ["index", "__index_level_0__"]
+
+
+class PandasBackend:
+    """Filters and aggregates a dataset's DataFrame in memory
+
+    This is the default backend, which uses the dataset's `FilterIndex`, if it
+    has indexing enabled, and NumPy-based aggregation.
+    """
+
+    name = "pandas"
+
+    # whether datasets hold all their rows in memory
+    in_memory = True
+
+    def filter_rows(self, dataset, filters):
+        """The rows of a dataset matching the filters of `filter_pedestrian_df`"""
+        return filter_pedestrian_df(
+            dataset.df,
+            **filters,
+            index=dataset.filter_index if dataset.params["index"] else None,
+            debug=dataset.params["debug"],
+        )
+
+    def counts(self, dataset, by):
+        """Total counts of a dataset grouped by one or more columns"""
+        return sum_counts(dataset.df, by)
+
+    def cube_tables(self, dataset):
+        """Each level of a `CountCube` of a dataset"""
+        return build_cube_tables(dataset.df)
+
+
+class DuckDBBackend:
+    """Filters and aggregates a dataset with DuckDB, over its Parquet files
+
+    Datasets don't load any rows until their `df` is used. Filters, including
+    those of every dataset a dataset was filtered from, are turned into the
+    WHERE clause of a query, so that DuckDB can skip the partitions and row
+    groups that can't match. Counts are aggregated by DuckDB, using all cores
+    (or `threads` of them), so only their totals are loaded.
+
+    `path` is a Parquet file or a directory partitioned on `PARTITION_COLUMNS`.
+    If `compact` is True, rows are converted to the schema of
+    `compact_pedestrian_df`. `columns` restricts which columns rows have.
+    """
+
+    name = "duckdb"
+
+    in_memory = False
+
+    def __init__(
+        self, path, compact=False, columns=None, threads=MELBVIZ_DUCKDB_THREADS
+    ):
+        import duckdb
+
+        path = Path(path)
+        if path.is_dir():
+            pattern = quote_literal(str(path / "**" / "*.parquet"))
+            self.source = f"read_parquet({pattern}, hive_partitioning = true)"
+        else:
+            self.source = f"read_parquet({quote_literal(str(path))})"
+        self.compact = compact
+        config = {} if threads is None else {"threads": threads}
+        self._connection = duckdb.connect(config=config)
+        schema = self._query(f"DESCRIBE SELECT * FROM {self.source}")
+        self.columns = [
+            col
+            for col in schema["column_name"]
+            if col not in INDEX_COLUMNS
+            and col not in SENSOR_COLUMNS
+            and (columns is None or col in columns)
+        ]
+        # the sensor columns of data cleaned before sensor tables existed
+        self._sensor_columns = [
+            col for col in SENSOR_COLUMNS if col in set(schema["column_name"])
+        ]
+
+    def _query(self, sql, params=None):
+        # connections can't be shared between threads, but their cursors can
+        with self._connection.cursor() as cursor:
+            return cursor.execute(sql, params).df()
+
+    def filter_rows(self, dataset, filters):
+        """The rows of a dataset matching the filters of `filter_pedestrian_df`
+
+        Rows are sorted by Date_Time, then Sensor_Name.
+        """
+        where, params = where_clause([*dataset._filter_chain, filters])
+        columns = ", ".join(quote_name(col) for col in self.columns)
+        df = self._query(
+            f"SELECT {columns} FROM {self.source} {where}"
+            ' ORDER BY "Date_Time", "Sensor_Name"',
+            params,
+        )
+        if self.compact:
+            df = compact_pedestrian_df(df)
+        return df
+
+    def counts(self, dataset, by, hours=False):
+        """Total counts of a dataset grouped by one or more columns
+
+        Groups are sorted, as they are by `sum_counts`. If `hours` is True, an
+        "Hour" column of the hour of each row's Date_Time can be grouped by.
+        """
+        if isinstance(by, str):
+            by = [by]
+        where, params = where_clause(dataset._filter_chain)
+        hour = ', hour("Date_Time")::INTEGER AS "Hour"' if hours else ""
+        groups = ", ".join(quote_name(col) for col in by)
+        counts = self._query(
+            f'SELECT {groups}, sum("Hourly_Counts")::BIGINT AS "Hourly_Counts"'
+            f" FROM (SELECT *{hour} FROM {self.source} {where})"
+            f" GROUP BY {groups} ORDER BY {groups}",
+            params,
+        )
+        if self.compact:
+            # summed counts are left as they are, and months sorted by the calendar
+            counts = compact_pedestrian_df(counts).astype({"Hourly_Counts": "int64"})
+            counts = counts.sort_values(by, ignore_index=True)
+        return counts
+
+    def cube_tables(self, dataset):
+        """Each level of a `CountCube` of a dataset
+
+        Only the hourly level is aggregated by DuckDB, and the other levels are
+        summed from it.
+        """
+        hourly = self.counts(dataset, CUBE_LEVELS["hourly"], hours=True)
+        return summarise_cube_tables(hourly)
+
+    def sensor_table(self):
+        """The sensor table of data with sensor columns on every row, or None"""
+        if not self._sensor_columns:
+            return None
+        columns = ", ".join(
+            quote_name(col)
+            for col in ["Sensor_ID", "Sensor_Name", *self._sensor_columns]
+        )
+        table = self._query(
+            f'SELECT DISTINCT ON ("Sensor_ID", "Sensor_Name") {columns}'
+            f' FROM {self.source} ORDER BY "Sensor_ID", "Sensor_Name"'
+        )
+        if self.compact:
+            table = compact_pedestrian_df(table)
+        return table
+
+
+BACKENDS = {"pandas": PandasBackend, "duckdb": DuckDBBackend}
+
+
+def make_backend(backend, path=None, **kwargs):
+    """Make the backend with the name `backend` for the data at `path`
+
+    `backend` is either "pandas" or "duckdb". Any `kwargs` are passed to the
+    DuckDB backend.
+    """
+    if backend not in BACKENDS:
+        backends = ", ".join(f"'{name}'" for name in BACKENDS)
+        raise ValueError(f"'{backend}' is not a valid backend. Use one of: {backends}")
+    if backend == "pandas":
+        return PandasBackend()
+    return DuckDBBackend(path, **kwargs)
+
+
+def where_clause(filter_chain):
+    """Make a WHERE clause, and its parameters, matching every set of filters
+
+    `filter_chain` is a sequence of dicts of the filters of
+    `filter_pedestrian_df`, such as those a dataset was filtered by.
+    """
+    conditions, params = [], []
+    for filters in filter_chain:
+        for name, col in FILTER_COLUMNS.items():
+            values = filter_values(filters.get(name))
+            if values is not None:
+                conditions.append(f"{quote_name(col)} IN ({placeholders(values)})")
+                params.extend(python_value(value) for value in values)
+        for name, op in (("start", ">="), ("end", "<")):
+            timestamp = as_timestamp(filters.get(name))
+            if timestamp is not None:
+                conditions.append(f'"Date_Time" {op} ?')
+                params.append(timestamp.to_pydatetime())
+        weekday = weekday_numbers(filters.get("weekday"))
+        if weekday is not None:
+            # ISO weekdays are numbered from 1, for Monday
+            conditions.append(f'isodow("Date_Time") - 1 IN ({placeholders(weekday)})')
+            params.extend(python_value(value) for value in weekday)
+        hour = filter_values(filters.get("hour"))
+        if hour is not None:
+            conditions.append(f'hour("Date_Time") IN ({placeholders(hour)})')
+            params.extend(python_value(value) for value in hour)
+    if not conditions:
+        return "", params
+    return "WHERE " + " AND ".join(conditions), params
+
+
+def placeholders(values):
+    return ", ".join("?" for _ in values)
+
+
+def python_value(value):
+    """Convert a NumPy scalar to the Python value DuckDB expects"""
+    return value.item() if hasattr(value, "item") else value
+
+
+def quote_name(name):
+    """Quote a column name for SQL"""
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def quote_literal(value):
+    """Quote a string as an SQL literal"""
+    return "'{}'".format(value.replace("'", "''"))
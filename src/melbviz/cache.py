@@ -0,0 +1,141 @@
+from collections import OrderedDict
+import threading
+
+from .config import MELBVIZ_FILTER_CACHE_BYTES
+from .utils import as_timestamp, filter_values, weekday_numbers
+
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+def dataframe_nbytes(df):
+    """Estimate the memory held by a DataFrame stored in a cache
+
+    This deliberately doesn't inspect the contents of object columns, as the
+    Python objects in a filtered DataFrame are shared with the DataFrame it was
+    filtered from, so only the references count towards its cost.
+    """
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+def normalise_filters(
+    year=None, month=None, sensor=None, start=None, end=None, weekday=None, hour=None
+):
+    """Make a hashable cache key from a set of filters
+
+    The key doesn't depend on the order of values within each filter, and
+    filters with no values (None or an empty sequence) are equivalent. Start
+    and end datetimes are keyed as Timestamps, and weekdays by their number.
+    """
+    filters = {
+        "year": filter_values(year),
+        "month": filter_values(month),
+        "sensor": filter_values(sensor),
+        "weekday": weekday_numbers(weekday),
+        "hour": filter_values(hour),
+    }
+    key = [
+        (param, as_timestamp(value))
+        for param, value in (("end", end), ("start", start))
+    ]
+    for param, values in filters.items():
+        key.append((param, None if values is None else frozenset(values)))
+    return tuple(sorted(key))
+
+
+class FilterCache:
+    """Cache of filtered DataFrames bounded by their total size in bytes
+
+    When adding an entry would take the cache over `max_bytes`, entries are
+    evicted according to `policy`, which is either "lru" (least recently used)
+    or "lfu" (least frequently used, with ties broken by least recent use).
+    Values larger than `max_bytes` are never stored.
+    """
+
+    def __init__(self, max_bytes=MELBVIZ_FILTER_CACHE_BYTES, policy="lru", sizeof=None):
+        if policy not in EVICTION_POLICIES:
+            policies = ", ".join(f"'{name}'" for name in EVICTION_POLICIES)
+            raise ValueError(
+                f"'{policy}' is not a valid eviction policy. Use one of: {policies}"
+            )
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sizeof = dataframe_nbytes if sizeof is None else sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        # maps keys to [value, size, use count], ordered by least recent use
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def stats(self):
+        """Dictionary of cache statistics"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+            }
+
+    def get(self, key, default=None):
+        """Get a value from the cache, recording a hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            entry[2] += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        """Add a value to the cache, evicting other entries to make room"""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                self._remove(self._eviction_candidate())
+                self.evictions += 1
+            self._entries[key] = [value, size, 1]
+            self.current_bytes += size
+
+    def get_or_set(self, key, func):
+        """Get a value from the cache, calling `func` to make it on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = func()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Remove all entries and reset statistics"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _eviction_candidate(self):
+        if self.policy == "lfu":
+            return min(self._entries, key=lambda key: self._entries[key][2])
+        return next(iter(self._entries))
+
+    def _remove(self, key):
+        _value, size, _uses = self._entries.pop(key)
+        self.current_bytes -= size
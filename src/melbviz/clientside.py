@@ -0,0 +1,74 @@
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from .config import MELBVIZ_MAPBOX_KEY
+from .fast_plots import PLOT_LAYOUTS
+from .utils import MONTHS
+
+
+# layouts of the figures made in the browser by assets/melbviz.js, the same as
+# those made by the corresponding functions in `fast_plots`. Titles, and any
+# sizes that depend on the data, are filled in by the browser.
+CLIENTSIDE_LAYOUTS = {
+    plot_kind: PLOT_LAYOUTS[plot_kind]
+    for plot_kind in ("month_counts", "sensor_counts", "sensor_map")
+}
+
+
+def figure_layouts(figure_layout=None, app_layouts=None):
+    """Layouts of each figure made in the browser, keyed by plot kind
+
+    As for figures made on the server, `figure_layout` is applied to every
+    figure and then the layout in `app_layouts` for each plot kind, if any.
+    The default Plotly template is included in each, as Plotly Express would.
+    """
+    if app_layouts is None:
+        app_layouts = {}
+    template = pio.templates[pio.templates.default].to_plotly_json()
+    layouts = {}
+    for plot_kind, plot_layout in CLIENTSIDE_LAYOUTS.items():
+        layout = go.Layout(plot_layout)
+        if plot_kind == "sensor_map" and MELBVIZ_MAPBOX_KEY is not None:
+            layout.update(mapbox_accesstoken=MELBVIZ_MAPBOX_KEY)
+        layout.update(figure_layout or {})
+        layout.update(app_layouts.get(plot_kind, {}))
+        layouts[plot_kind] = {**layout.to_plotly_json(), "template": template}
+    return layouts
+
+
+def year_cube(dataset, year, **filters):
+    """Monthly counts of each sensor in a year, to be filtered in the browser
+
+    Returns a dict, which can be serialised as JSON, of the year's months (in
+    calendar order), its sensors (sorted) and their coordinates, and a row for
+    each month and sensor with any counts. Rows are given as the columns
+    "month" and "sensor", which index into the months and sensors, and
+    "counts". Any other `filters` of `PedestrianDataset.filter`, such as
+    the time filters, are applied before counting.
+    """
+    counts = dataset.filter(year=year, **filters).counts(["Month", "Sensor_Name"])
+    month_names = counts["Month"].astype(str)
+    sensor_names = counts["Sensor_Name"].astype(str)
+    months = [month for month in MONTHS if month in set(month_names)]
+    sensors = sorted(set(sensor_names))
+    locations = pd.DataFrame(index=sensors, columns=["Latitude", "Longitude"])
+    if dataset.sensor_table is not None:
+        table = dataset.sensor_table.astype({"Sensor_Name": "object"})
+        locations = table.drop_duplicates("Sensor_Name").set_index("Sensor_Name")
+        locations = locations.reindex(sensors)
+    return {
+        "year": year,
+        "months": months,
+        "sensors": sensors,
+        "latitude": json_floats(locations["Latitude"]),
+        "longitude": json_floats(locations["Longitude"]),
+        "month": pd.Categorical(month_names, categories=months).codes.tolist(),
+        "sensor": pd.Categorical(sensor_names, categories=sensors).codes.tolist(),
+        "counts": counts["Hourly_Counts"].tolist(),
+    }
+
+
+def json_floats(values):
+    """Floats of a Series as a list, with missing values as None (ie null)"""
+    return [None if pd.isna(value) else float(value) for value in values]
@@ -16,3 +16,97 @@ MELBVIZ_SENSOR_CSV_PATH = (
 )
 
 MELBVIZ_CLEANED_DATA_PATH = MELBVIZ_DATA_PATH / "melbviz.parquet"
+
+# cleaned data in the compact schema, for memory-mapping by the Dash app
+MELBVIZ_ARROW_DATA_PATH = MELBVIZ_DATA_PATH / "melbviz.arrow"
+
+# directory of cleaned data partitioned by year and month
+MELBVIZ_PARTITIONED_DATA_PATH = MELBVIZ_DATA_PATH / "melbviz_partitioned"
+
+# maximum total size of filtered DataFrames held in each dataset's filter cache
+MELBVIZ_FILTER_CACHE_BYTES = int(os.getenv("MELBVIZ_FILTER_CACHE_BYTES", 256 * 2**20))
+
+# the same for the Dash app when it memory-maps MELBVIZ_ARROW_DATA_PATH. Each
+# worker process has its own filter cache, so this is kept small, and 0 disables
+# it. Filtering is fast without it, as the filter index is memory-mapped too.
+MELBVIZ_ARROW_FILTER_CACHE_BYTES = int(
+    os.getenv("MELBVIZ_ARROW_FILTER_CACHE_BYTES", 32 * 2**20)
+)
+
+# total number of points the Dash app's time series figures are reduced to
+MELBVIZ_MAX_PLOT_POINTS = int(os.getenv("MELBVIZ_MAX_PLOT_POINTS", 10_000))
+
+# directory of figures cached by the Dash app, shared by all worker processes.
+# Figure caching is disabled if this is not set.
+MELBVIZ_FIGURE_CACHE_PATH = os.getenv("MELBVIZ_FIGURE_CACHE_PATH")
+
+# seconds before a cached figure expires
+MELBVIZ_FIGURE_CACHE_TTL = int(os.getenv("MELBVIZ_FIGURE_CACHE_TTL", 24 * 60 * 60))
+
+# maximum total size of the figure cache directory
+MELBVIZ_FIGURE_CACHE_BYTES = int(os.getenv("MELBVIZ_FIGURE_CACHE_BYTES", 512 * 2**20))
+
+# whether the Dash app loads its dataset in a background thread at startup,
+# rather than when the first request needs it or /ready is first probed
+MELBVIZ_WARM_START = os.getenv("MELBVIZ_WARM_START", "").lower() in ("1", "true", "yes")
+
+# views of the data that the Dash app's warm start precomputes once the dataset
+# is loaded: "years" for the default view of each year, "months" for each month of
+# each year as well, or "none"
+MELBVIZ_WARM_VIEWS = os.getenv("MELBVIZ_WARM_VIEWS", "years")
+
+# number of threads that precompute views during a warm start
+MELBVIZ_WARM_WORKERS = int(os.getenv("MELBVIZ_WARM_WORKERS", 2))
+
+# whether per-stage timings and sizes are recorded for the /metrics endpoint
+MELBVIZ_METRICS = os.getenv("MELBVIZ_METRICS", "true").lower() in ("1", "true", "yes")
+
+# requests taking longer than this many seconds are logged with a breakdown of
+# their stages. Unset to not log slow requests.
+MELBVIZ_SLOW_REQUEST_SECONDS = os.getenv("MELBVIZ_SLOW_REQUEST_SECONDS")
+if MELBVIZ_SLOW_REQUEST_SECONDS is not None:
+    MELBVIZ_SLOW_REQUEST_SECONDS = float(MELBVIZ_SLOW_REQUEST_SECONDS)
+
+# number of threads (or processes) used to make figures in parallel
+MELBVIZ_FIGURE_WORKERS = int(os.getenv("MELBVIZ_FIGURE_WORKERS", 4))
+
+# whether figures are made in parallel by a pool of "thread"s or "process"es
+MELBVIZ_FIGURE_EXECUTOR = os.getenv("MELBVIZ_FIGURE_EXECUTOR", "thread")
+
+# engine that filters and aggregates the Dash app's dataset: "pandas", which loads
+# it into memory, or "duckdb", which queries the Parquet files where they are
+MELBVIZ_BACKEND = os.getenv("MELBVIZ_BACKEND", "pandas")
+
+# number of threads DuckDB queries use. Unset to use all cores.
+MELBVIZ_DUCKDB_THREADS = os.getenv("MELBVIZ_DUCKDB_THREADS")
+if MELBVIZ_DUCKDB_THREADS is not None:
+    MELBVIZ_DUCKDB_THREADS = int(MELBVIZ_DUCKDB_THREADS)
+
+# whether the Dash app makes figures directly as graph objects, skipping Plotly
+# Express and validation, rather than with Plotly Express
+MELBVIZ_FAST_FIGURES = os.getenv("MELBVIZ_FAST_FIGURES", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# whether figures made without Plotly Express encode numeric and datetime arrays
+# as base64 typed arrays, rather than lists of numbers and strings. These need
+# plotly.js 2.28 or later in the browser.
+MELBVIZ_TYPED_ARRAYS = os.getenv("MELBVIZ_TYPED_ARRAYS", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# line charts of more points than this are drawn with WebGL
+MELBVIZ_WEBGL_POINTS = int(os.getenv("MELBVIZ_WEBGL_POINTS", 1000))
+
+# whether the Dash app compresses its responses, which needs Flask-Compress, and
+# the encodings used, in order of preference (brotli needs the brotli package)
+MELBVIZ_COMPRESS = os.getenv("MELBVIZ_COMPRESS", "").lower() in ("1", "true", "yes")
+MELBVIZ_COMPRESS_ALGORITHMS = os.getenv("MELBVIZ_COMPRESS_ALGORITHMS", "br,gzip")
+
+# make the month-counts, sensor-counts and sensor-map figures in the browser,
+# from a cube of monthly counts for the selected year
+MELBVIZ_CLIENTSIDE = os.getenv("MELBVIZ_CLIENTSIDE", "").lower() in ("1", "true", "yes")
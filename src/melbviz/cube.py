@@ -0,0 +1,118 @@
+import pandas as pd
+
+from .aggregate import CUBE_LEVELS, build_cube_tables, sum_counts
+from .utils import (
+    compact_pedestrian_df,
+    cube_table_path,
+    filter_pedestrian_df,
+    filter_values,
+    write_cube_tables,
+)
+
+
+# the column each filter of a cube applies to
+FILTER_COLUMNS = {"year": "Year", "month": "Month", "sensor": "Sensor_Name"}
+
+
+class CountCube:
+    """Pedestrian counts pre-aggregated over Year, Month, Sensor and Hour
+
+    A cube is built once from the row-level data, or materialised alongside it
+    when it's saved, and can then be filtered and queried in time proportional
+    to the number of sensors and months, rather than the number of hourly rows.
+    Filtering is lazy: each level is only filtered when it's first used. Levels
+    that don't have a column a filter applies to, such as the yearly level
+    when filtering by month, can't be used by the filtered cube.
+    """
+
+    def __init__(self, tables, parent=None, filters=None, loader=None):
+        self._tables = dict(tables)
+        self._parent = parent
+        self._filters = filters
+        # reads levels that haven't been loaded yet
+        self._loader = loader
+
+    @classmethod
+    def from_df(cls, df):
+        """Build a cube from a cleaned pedestrian counts DataFrame"""
+        return cls(build_cube_tables(df))
+
+    @classmethod
+    def from_parquet(cls, path, compact=False):
+        """Load the cube saved alongside a data file, or None if there's none
+
+        Each level is only read when it's first used. If `compact` is True, the
+        levels are converted to the schema of `utils.compact_pedestrian_df`.
+        """
+        if not all(cube_table_path(path, level).exists() for level in CUBE_LEVELS):
+            return None
+
+        def load(level):
+            table = pd.read_parquet(cube_table_path(path, level), engine="fastparquet")
+            if compact:
+                # summed counts are left as they are, unlike hourly counts
+                table = compact_pedestrian_df(table).astype(
+                    {"Hourly_Counts": table["Hourly_Counts"].dtype}
+                )
+            return table
+
+        return cls({}, loader=load)
+
+    def to_parquet(self, path):
+        """Save each level of this cube alongside a data file or directory"""
+        write_cube_tables({level: self.table(level) for level in CUBE_LEVELS}, path)
+
+    @property
+    def levels(self):
+        if self._parent is None:
+            return list(CUBE_LEVELS.keys())
+        filtered_columns = {
+            FILTER_COLUMNS[name]
+            for name, value in self._filters.items()
+            if filter_values(value) is not None
+        }
+        return [
+            level
+            for level in self._parent.levels
+            if filtered_columns <= set(CUBE_LEVELS[level])
+        ]
+
+    def table(self, level="monthly"):
+        """The DataFrame of aggregated counts for a level of the cube"""
+        if level not in self._tables:
+            if level not in self.levels or (
+                self._parent is None and self._loader is None
+            ):
+                raise ValueError(f"'{level}' is not a level of this cube")
+            if self._parent is not None:
+                self._tables[level] = filter_pedestrian_df(
+                    self._parent.table(level), **self._filters
+                )
+            else:
+                self._tables[level] = self._loader(level)
+        return self._tables[level]
+
+    def level_for(self, columns):
+        """Get the coarsest level of the cube that contains all columns"""
+        for level in self.levels:
+            if set(columns) <= set(CUBE_LEVELS[level]):
+                return level
+        return None
+
+    def filter(self, year=None, month=None, sensor=None):
+        """Filter this cube, returning a new CountCube instance"""
+        filters = {"year": year, "month": month, "sensor": sensor}
+        return self.__class__({}, parent=self, filters=filters)
+
+    def counts(self, by):
+        """Total counts grouped by one or more columns
+
+        Returns a DataFrame with a column for each value in `by`, along with the
+        summed "Hourly_Counts".
+        """
+        if isinstance(by, str):
+            by = [by]
+        level = self.level_for(by)
+        if level is None:
+            raise ValueError(f"Cannot aggregate by {by} using this cube")
+        return sum_counts(self.table(level), by)
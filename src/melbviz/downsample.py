@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+
+DOWNSAMPLE_METHODS = ("minmax", "lttb")
+
+# frequencies tried, from finest to coarsest, when resampling automatically
+RESAMPLE_FREQUENCIES = ("D", "W")
+
+
+def minmax_indices(y, n_out):
+    """Indices of the minimum and maximum point in each of `n_out // 2` buckets
+
+    This preserves the peaks and troughs of a series, and is fully vectorised.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(n_out // 2, 1)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    sizes = np.diff(edges)
+    # lay the buckets out as rows of a NaN-padded 2D array
+    rows = np.repeat(np.arange(n_buckets), sizes)
+    cols = np.arange(n) - np.repeat(edges[:-1], sizes)
+    buckets = np.full((n_buckets, sizes.max()), np.nan)
+    buckets[rows, cols] = y
+    mins = np.nanargmin(buckets, axis=1) + edges[:-1]
+    maxs = np.nanargmax(buckets, axis=1) + edges[:-1]
+    return np.unique(np.concatenate([mins, maxs]))
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of points chosen by Largest-Triangle-Three-Buckets downsampling
+
+    The first and last points are always kept. From each of the `n_out - 2`
+    buckets in between, the point forming the largest triangle with the
+    previously chosen point and the mean of the next bucket is kept.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype="int64")
+    indices[0] = 0
+    indices[-1] = n - 1
+    chosen = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[chosen] - next_x) * (y[start:end] - y[chosen])
+            - (x[chosen] - x[start:end]) * (next_y - y[chosen])
+        )
+        chosen = start + int(np.argmax(areas))
+        indices[i + 1] = chosen
+    return indices
+
+
+def downsample_series(df, x, y, max_points, method="minmax"):
+    """Reduce a DataFrame sorted by column `x` to at most `max_points` rows"""
+    if method not in DOWNSAMPLE_METHODS:
+        methods = ", ".join(f"'{name}'" for name in DOWNSAMPLE_METHODS)
+        raise ValueError(f"'{method}' is not a valid method. Use one of: {methods}")
+    if len(df) <= max_points:
+        return df
+    if method == "lttb":
+        x_vals = df[x].to_numpy()
+        if np.issubdtype(x_vals.dtype, np.datetime64):
+            x_vals = x_vals.view("int64")
+        indices = lttb_indices(x_vals, df[y].to_numpy(), max_points)
+    else:
+        indices = minmax_indices(df[y].to_numpy(dtype="float64"), max_points)
+    return df.iloc[indices]
+
+
+def resample_series(df, x, y, group, freq):
+    """Resample the datetime column `x` to `freq`, averaging `y` for each group
+
+    Averaging means values stay in the same units (eg hourly counts) as before.
+    """
+    return (
+        df.groupby([group, pd.Grouper(key=x, freq=freq)], observed=True)[y]
+        .mean()
+        .dropna()
+        .reset_index()
+    )
+
+
+def downsample_traffic(df, x, y, group, max_points, method="minmax", resample=None):
+    """Reduce a long-format time series DataFrame to a budget of points
+
+    `max_points` is the budget for the whole figure, shared evenly between the
+    series identified by the `group` column. By default, series keep their
+    original frequency and are only reduced using `method`. If `resample` is a
+    pandas frequency string, they're first resampled to the mean of `y` at that
+    frequency, so callers must label the result as such. If it's "auto", the
+    finest frequency in `RESAMPLE_FREQUENCIES` that fits the budget is used, if
+    any is needed.
+    """
+    n_groups = max(df[group].nunique(), 1)
+    points_per_group = max(max_points // n_groups, 3)
+    df = df[[group, x, y]]
+    if resample == "auto":
+        resample = None
+        if df.groupby(group, observed=True).size().max() > points_per_group:
+            span = df[x].max() - df[x].min()
+            for freq in RESAMPLE_FREQUENCIES:
+                resample = freq
+                if span / pd.Timedelta(1, unit=freq) <= points_per_group:
+                    break
+    if resample is not None:
+        df = resample_series(df, x, y, group, resample)
+    downsampled = [
+        downsample_series(group_df, x, y, points_per_group, method=method)
+        for _name, group_df in df.groupby(group, observed=True, sort=False)
+    ]
+    if len(downsampled) == 0:
+        return df
+    return pd.concat(downsampled)
@@ -0,0 +1,448 @@
+import base64
+import copy
+import functools
+
+import numpy as np
+import plotly.colors
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from . import plots
+from .config import MELBVIZ_MAPBOX_KEY, MELBVIZ_TYPED_ARRAYS, MELBVIZ_WEBGL_POINTS
+from .metrics import timed
+from .plots import (
+    located_sensor_totals,
+    make_title,
+    month_totals,
+    ranked_sensor_totals,
+    top_sensor_traffic,
+    yearly_traffic,
+)
+
+
+# layouts of the figures made by the functions in `plots`, without the parts
+# that depend on the data, such as titles, sizes and facets
+PLOT_LAYOUTS = {
+    "month_counts": {
+        "title": {"x": 0.5},
+        "barmode": "group",
+        "yaxis": {
+            "title": {"text": "Total Counts"},
+            "showgrid": False,
+            "zeroline": False,
+        },
+        "legend": {
+            "title": {"text": ""},
+            "tracegroupgap": 0,
+            "orientation": "h",
+            "yanchor": "bottom",
+            "y": -0.6,
+            "xanchor": "right",
+            "x": 1,
+        },
+    },
+    "sensor_counts": {
+        "title": {"x": 0.5},
+        "barmode": "relative",
+        "xaxis": {"side": "top"},
+        "yaxis": {"showgrid": False},
+        "legend": {"tracegroupgap": 0},
+    },
+    "sensor_map": {
+        "title": {"x": 0.5},
+        "mapbox": {"zoom": 13},
+        "coloraxis": {
+            "colorbar": {"title": {"text": "Total Counts"}},
+            "colorscale": plotly.colors.make_colorscale(
+                plotly.colors.sequential.Plasma
+            ),
+        },
+        "legend": {"tracegroupgap": 0, "itemsizing": "constant"},
+    },
+    "sensor_traffic": {"title": {"x": 0.5}, "legend": {"tracegroupgap": 0}},
+    "year_traffic": {"title": {"x": 0.5}, "legend": {"tracegroupgap": 0}},
+}
+
+# keyword arguments of the Plotly Express functions that the functions in this
+# module also support. Figures made with any others fall back to `plots`.
+LAYOUT_KWARGS = ("height", "width")
+
+# dtypes of the typed arrays supported by plotly.js, which doesn't have 64-bit
+# integers
+TYPED_ARRAY_DTYPES = ("f8", "f4", "i4", "u4", "i2", "u2", "i1", "u1")
+
+# space between the rows of faceted figures, and the width of each row's
+# subplot, leaving room for its label on the right
+FACET_ROW_SPACING = 0.03
+FACET_WIDTH = 0.98
+
+
+@functools.lru_cache()
+def template(name=None):
+    """The Plotly template a figure is made with, as a dictionary"""
+    return pio.templates[name or pio.templates.default].to_plotly_json()
+
+
+def colorway():
+    """The colours given to each trace by the default template"""
+    return template()["layout"].get("colorway", plotly.colors.qualitative.Plotly)
+
+
+def make_layout(plot_kind, title, **kwargs):
+    """Make the layout of a figure, with its title and template"""
+    layout = copy.deepcopy(PLOT_LAYOUTS[plot_kind])
+    layout["title"]["text"] = title
+    layout["template"] = template()
+    layout.update(kwargs)
+    return layout
+
+
+def make_figure(data, layout):
+    """Make a Figure from lists of dictionaries, without validating them"""
+    return go.Figure({"data": data, "layout": layout}, _validate=False)
+
+
+def typed_array(values):
+    """Encode an array of numbers or datetimes as a Plotly typed array
+
+    Typed arrays are base64 encoded binary, which is smaller than JSON and
+    faster for the browser to decode. Datetimes are given as milliseconds since
+    the epoch, which plotly.js reads as dates on date axes. Arrays of other
+    types, or any array if MELBVIZ_TYPED_ARRAYS isn't set, are returned as is.
+    """
+    if not MELBVIZ_TYPED_ARRAYS:
+        return values
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        missing = np.isnat(values)
+        values = values.astype("datetime64[ms]").astype("int64").astype("float64")
+        values[missing] = np.nan
+    elif values.dtype.kind in "iu" and values.dtype.itemsize == 8:
+        info = np.iinfo("int32")
+        if len(values) and (values.min() < info.min or values.max() > info.max):
+            values = values.astype("float64")
+        else:
+            values = values.astype("int32")
+    dtype = values.dtype.newbyteorder("<")
+    if dtype.str[1:] not in TYPED_ARRAY_DTYPES:
+        return values
+    data = np.ascontiguousarray(values, dtype=dtype).tobytes()
+    return {"dtype": dtype.str[1:], "bdata": base64.b64encode(data).decode("ascii")}
+
+
+def supports(kwargs):
+    """Check if all Plotly Express kwargs are supported by this module"""
+    return set(kwargs) <= set(LAYOUT_KWARGS)
+
+
+def facet_layout(layout, labels, same_yscale=False):
+    """Add a row of subplots for each label to a layout, from the top down
+
+    Returns the x and y axis of each row, as used by its traces.
+    """
+    n_rows = len(labels)
+    row_height = (1 - FACET_ROW_SPACING * (n_rows - 1)) / n_rows
+    axes = []
+    annotations = []
+    for i, label in enumerate(labels):
+        # axes are numbered from the bottom row
+        number = n_rows - i
+        suffix = "" if number == 1 else str(number)
+        bottom = (number - 1) * (row_height + FACET_ROW_SPACING)
+        # faceted figures are all of time series, which may be typed arrays
+        xaxis = {
+            "anchor": f"y{suffix}",
+            "domain": [0.0, FACET_WIDTH],
+            "showgrid": True,
+            "type": "date",
+        }
+        if number > 1:
+            xaxis.update(matches="x", showticklabels=False)
+        yaxis = {
+            "anchor": f"x{suffix}",
+            "domain": [bottom, bottom + row_height],
+            "showgrid": False,
+            "zeroline": False,
+        }
+        if not same_yscale:
+            yaxis["matches"] = "y"
+        layout[f"xaxis{suffix}"] = xaxis
+        layout[f"yaxis{suffix}"] = yaxis
+        annotations.append(
+            {
+                "showarrow": False,
+                "text": str(label),
+                "textangle": 0,
+                "x": FACET_WIDTH,
+                "xanchor": "left",
+                "xref": "paper",
+                "y": bottom + row_height / 2,
+                "yanchor": "middle",
+                "yref": "paper",
+            }
+        )
+        axes.append((f"x{suffix}", f"y{suffix}"))
+    layout["annotations"] = annotations
+    return axes
+
+
+def facet_lines(df, x, y, facet, labels, axes):
+    """Make a line trace of `y` against `x` for each facet label's rows"""
+    trace_type = "scattergl" if len(df) > MELBVIZ_WEBGL_POINTS else "scatter"
+    codes = df[facet].to_numpy()
+    x_values = df[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        # counts are hourly, and datetimes with nanoseconds make longer JSON
+        x_values = x_values.astype("datetime64[s]")
+    y_values = df[y].to_numpy()
+    traces = []
+    for label, (xaxis, yaxis) in zip(labels, axes):
+        rows = np.flatnonzero(codes == label)
+        if len(rows) == 0:
+            continue
+        traces.append(
+            {
+                "type": trace_type,
+                "mode": "lines",
+                "name": "",
+                "showlegend": False,
+                "legendgroup": "",
+                "line": {"color": colorway()[0], "dash": "solid"},
+                "x": typed_array(x_values[rows]),
+                "y": typed_array(y_values[rows]),
+                "xaxis": xaxis,
+                "yaxis": yaxis,
+                "hovertemplate": (
+                    f"{facet}={label}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>"
+                ),
+            }
+        )
+    return traces
+
+
+def bar_trace(x, y, orientation, hovertemplate, name="", color=None):
+    """A bar trace in the style of Plotly Express"""
+    return {
+        "type": "bar",
+        "name": name,
+        "legendgroup": name,
+        "offsetgroup": name,
+        "alignmentgroup": "True",
+        "showlegend": name != "",
+        "orientation": orientation,
+        "marker": {"color": color or colorway()[0]},
+        "x": typed_array(x),
+        "y": typed_array(y),
+        "hovertemplate": hovertemplate,
+    }
+
+
+def plot_sensor_counts(df, title_func=None, **kwargs):
+    """Make a bar chart of total counts for each sensor
+
+    The same as `plots.plot_sensor_counts`, without using Plotly Express.
+    """
+    if not supports(kwargs):
+        return plots.plot_sensor_counts(df, title_func=title_func, **kwargs)
+    title = make_title("Ranked Sensor Traffic", title_func)
+    total_df = ranked_sensor_totals(df)
+    if "height" not in kwargs:
+        kwargs["height"] = max(18 * len(total_df), 600)
+
+    with timed("figure", plot="sensor_counts"):
+        trace = bar_trace(
+            total_df["Total Counts"].to_numpy(),
+            total_df["Sensor_Name"].to_numpy(dtype=object),
+            "h",
+            "Total Counts=%{x}<br>Sensor_Name=%{y}<extra></extra>",
+        )
+        figure = make_figure([trace], make_layout("sensor_counts", title, **kwargs))
+    return figure
+
+
+def plot_month_counts(df, split_sensors=False, title_func=None, **kwargs):
+    """Make a bar plot of monthly counts
+
+    The same as `plots.plot_month_counts`, without using Plotly Express.
+    """
+    if not supports(kwargs):
+        return plots.plot_month_counts(
+            df, split_sensors=split_sensors, title_func=title_func, **kwargs
+        )
+    title = make_title("Monthly Sensor Traffic", title_func)
+    month_df = month_totals(df, split_sensors)
+    with timed("figure", plot="month_counts"):
+        if split_sensors:
+            sensors = month_df["Sensor_Name"].to_numpy(dtype=object)
+            months = month_df["Month"].to_numpy(dtype=object)
+            counts = month_df["Hourly_Counts"].to_numpy()
+            colors = colorway()
+            traces = []
+            # in order of first appearance, as Plotly Express colours them
+            for i, sensor in enumerate(dict.fromkeys(sensors)):
+                rows = sensors == sensor
+                traces.append(
+                    bar_trace(
+                        months[rows],
+                        counts[rows],
+                        "v",
+                        f"Sensor_Name={sensor}<br>Month=%{{x}}<br>"
+                        "Hourly_Counts=%{y}<extra></extra>",
+                        name=sensor,
+                        color=colors[i % len(colors)],
+                    )
+                )
+        else:
+            traces = [
+                bar_trace(
+                    month_df["Month"].to_numpy(dtype=object),
+                    month_df["Hourly_Counts"].to_numpy(),
+                    "v",
+                    "Month=%{x}<br>Hourly_Counts=%{y}<extra></extra>",
+                )
+            ]
+        figure = make_figure(traces, make_layout("month_counts", title, **kwargs))
+    return figure
+
+
+def plot_sensor_traffic(
+    df,
+    same_yscale=False,
+    row_height=150,
+    limit=5,
+    max_points=None,
+    downsample="minmax",
+    resample=None,
+    sensor_totals=None,
+    title_func=None,
+    **kwargs,
+):
+    """Plot hourly traffic for one or more sensors
+
+    The same as `plots.plot_sensor_traffic`, without using Plotly Express.
+    """
+    if not supports(kwargs):
+        return plots.plot_sensor_traffic(
+            df,
+            same_yscale=same_yscale,
+            row_height=row_height,
+            limit=limit,
+            max_points=max_points,
+            downsample=downsample,
+            resample=resample,
+            sensor_totals=sensor_totals,
+            title_func=title_func,
+            **kwargs,
+        )
+    if len(df) == 0:
+        return None
+    title = make_title("Hourly Pedestrian Traffic by Sensor", title_func)
+    df, target_sensors = top_sensor_traffic(
+        df, limit, max_points, downsample, resample, sensor_totals
+    )
+    if "height" not in kwargs:
+        kwargs["height"] = max(len(target_sensors) * row_height, 400)
+
+    with timed("figure", plot="sensor_traffic"):
+        layout = make_layout("sensor_traffic", title, **kwargs)
+        labels = list(target_sensors.index)
+        axes = facet_layout(layout, labels, same_yscale)
+        traces = facet_lines(
+            df, "Date_Time", "Hourly_Counts", "Sensor_Name", labels, axes
+        )
+        figure = make_figure(traces, layout)
+    return figure
+
+
+def plot_year_traffic(
+    df,
+    same_yscale=False,
+    row_height=150,
+    max_points=None,
+    downsample="minmax",
+    resample=None,
+    title_func=None,
+    **kwargs,
+):
+    """Plot traffic for a single sensor
+
+    The same as `plots.plot_year_traffic`, without using Plotly Express.
+    """
+    if not supports(kwargs):
+        return plots.plot_year_traffic(
+            df,
+            same_yscale=same_yscale,
+            row_height=row_height,
+            max_points=max_points,
+            downsample=downsample,
+            resample=resample,
+            title_func=title_func,
+            **kwargs,
+        )
+    if len(df) == 0:
+        return None
+    sensor = df["Sensor_Name"].unique()[0]
+    title = make_title(f"{sensor} Hourly Footfall Counts by year", title_func)
+    df, year_counts = yearly_traffic(df, max_points, downsample, resample)
+    if "height" not in kwargs:
+        kwargs["height"] = max(len(year_counts) * row_height, 500)
+
+    with timed("figure", plot="year_traffic"):
+        layout = make_layout("year_traffic", title, **kwargs)
+        labels = list(year_counts.index)
+        axes = facet_layout(layout, labels, same_yscale)
+        traces = facet_lines(
+            df, "datetime_flat_year", "Hourly_Counts", "Year", labels, axes
+        )
+        figure = make_figure(traces, layout)
+    return figure
+
+
+def plot_sensor_map(df, sensor_table=None, title_func=None, **kwargs):
+    """Plot a spatial scatter plot of sensor traffic.
+
+    The same as `plots.plot_sensor_map`, without using Plotly Express.
+    """
+    if not supports(kwargs):
+        return plots.plot_sensor_map(
+            df, sensor_table=sensor_table, title_func=title_func, **kwargs
+        )
+    title = make_title("Sensor Traffic", title_func)
+    sensor_totals_df = located_sensor_totals(df, sensor_table)
+    counts = sensor_totals_df["Total Counts"].to_numpy()
+    latitudes = sensor_totals_df["Latitude"].to_numpy()
+    longitudes = sensor_totals_df["Longitude"].to_numpy()
+    with timed("figure", plot="sensor_map"):
+        layout = make_layout("sensor_map", title, **kwargs)
+        layout["mapbox"]["center"] = {
+            "lat": float(np.mean(latitudes)) if len(latitudes) else None,
+            "lon": float(np.mean(longitudes)) if len(longitudes) else None,
+        }
+        if MELBVIZ_MAPBOX_KEY is not None:
+            layout["mapbox"]["accesstoken"] = MELBVIZ_MAPBOX_KEY
+        trace = {
+            "type": "scattermapbox",
+            "mode": "markers+text",
+            "name": "",
+            "showlegend": False,
+            "legendgroup": "",
+            "subplot": "mapbox",
+            "lat": typed_array(latitudes),
+            "lon": typed_array(longitudes),
+            "text": sensor_totals_df["Sensor_Name"].to_numpy(dtype=object),
+            "marker": {
+                "color": typed_array(counts),
+                "coloraxis": "coloraxis",
+                "size": typed_array(counts),
+                "sizemode": "area",
+            },
+            "hovertemplate": (
+                "Total Counts=%{marker.color}<br>Sensor_Name=%{text}<br>"
+                "Latitude=%{lat}<br>Longitude=%{lon}<extra></extra>"
+            ),
+        }
+        if len(counts) > 0:
+            # as Plotly Express sizes markers, with a size_max of 50
+            trace["marker"]["sizeref"] = counts.max() / 50**2
+        figure = make_figure([trace], layout)
+    return figure
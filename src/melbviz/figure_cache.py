@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+
+from .cache import normalise_filters
+from .config import MELBVIZ_FIGURE_CACHE_BYTES, MELBVIZ_FIGURE_CACHE_TTL
+
+
+def figure_cache_key(
+    plot_kind, filters, plot_kwargs=None, version=None, figure_format=None
+):
+    """Make a cache key for a figure
+
+    The key is a hex digest of the plot kind, the normalised filters (see
+    `cache.normalise_filters`), the keyword arguments used to make the plot,
+    the version of the dataset it was made from and `figure_format`, a dict of
+    any settings that change how the same figure is encoded.
+    """
+    normalised = [
+        (param, sorted(values, key=str) if isinstance(values, frozenset) else values)
+        for param, values in normalise_filters(**filters)
+    ]
+    key_data = [plot_kind, normalised, plot_kwargs or {}, version, figure_format]
+    key_json = json.dumps(key_data, sort_keys=True, default=str)
+    return hashlib.sha256(key_json.encode()).hexdigest()
+
+
+class DiskFigureCache:
+    """Cache of serialised Plotly figures stored in a directory
+
+    As entries are plain files written atomically, a cache directory can be
+    shared by all worker processes of a WSGI server. Entries expire `ttl`
+    seconds after they were written, and once the directory holds more than
+    `max_bytes` of figures, the oldest entries are removed.
+
+    Evicting entries means scanning the whole directory, so it's only done once
+    this process's running total of the directory's size goes over
+    `max_bytes`, or after every `evict_every` writes, which catches entries
+    written by other processes and those that have expired.
+    """
+
+    suffix = ".json"
+
+    def __init__(
+        self,
+        directory,
+        ttl=MELBVIZ_FIGURE_CACHE_TTL,
+        max_bytes=MELBVIZ_FIGURE_CACHE_BYTES,
+        evict_every=100,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        # size of the directory when `evict` last scanned it, plus the size of
+        # entries this process has written since, or None before the first scan
+        self.estimated_bytes = None
+        self._writes_since_evict = 0
+        # statistics are for this process only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self):
+        """Dictionary of cache statistics for this process"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
+
+    def _path(self, key):
+        return self.directory / f"{key}{self.suffix}"
+
+    def _expired(self, mtime, now):
+        return self.ttl is not None and now - mtime > self.ttl
+
+    def get(self, key):
+        """Get the JSON of a cached figure, or None if there's no valid entry"""
+        path = self._path(key)
+        try:
+            if self._expired(path.stat().st_mtime, time.time()):
+                self.misses += 1
+                return None
+            figure_json = path.read_text()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return figure_json
+
+    def set(self, key, figure_json):
+        """Store the JSON of a figure, then evict entries if it may be over budget"""
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, suffix=".tmp", delete=False
+        ) as file:
+            file.write(figure_json)
+        size = os.stat(file.name).st_size
+        # renaming is atomic, so readers never see a partially written entry
+        os.replace(file.name, self._path(key))
+        self._writes_since_evict += 1
+        if self.estimated_bytes is not None:
+            self.estimated_bytes += size
+        if (
+            self.estimated_bytes is None
+            or self.estimated_bytes > self.max_bytes
+            or self._writes_since_evict >= self.evict_every
+        ):
+            self.evict()
+
+    def evict(self):
+        """Remove expired entries, then the oldest entries until under budget"""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self._expired(stat.st_mtime, now):
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+        self.estimated_bytes = total_bytes
+        self._writes_since_evict = 0
+
+    def clear(self):
+        """Remove all entries"""
+        for path in self.directory.glob(f"*{self.suffix}"):
+            path.unlink(missing_ok=True)
+        self.estimated_bytes = 0
+
+    def _remove(self, path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            # another process got there first
+            return
+        self.evictions += 1
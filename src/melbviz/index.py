@@ -0,0 +1,268 @@
+from functools import cached_property
+import json
+
+import numpy as np
+import pandas as pd
+
+from .utils import date_range_positions
+
+
+# maps the filter parameters of `filter_pedestrian_df` to the column they filter
+INDEXED_COLUMNS = {"year": "Year", "month": "Month", "sensor": "Sensor_Name"}
+
+
+class ColumnIndex:
+    """Inverted index from the values of one column to their row positions"""
+
+    def __init__(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # reuse the existing codes rather than making a copy
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values, sort=False)
+            codes = pd.to_numeric(codes, downcast="integer")
+        self.codes = codes
+        self.value_codes = {value: code for code, value in enumerate(uniques.tolist())}
+        # row positions for each code are contiguous runs of `order`, whose
+        # boundaries are given by `offsets`
+        order = np.argsort(codes, kind="stable")
+        if len(order) < np.iinfo("int32").max:
+            order = order.astype("int32")
+        # missing values have a code of -1 so are sorted to the start
+        self.order = order[np.count_nonzero(codes < 0) :]
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def from_arrays(cls, codes, values, order, offsets, n_missing):
+        """Make an index from the arrays of one that was saved
+
+        `values` are the values of each code, and `order` includes the rows
+        with missing values, as saved by `FilterIndex.to_arrow`.
+        """
+        index = cls.__new__(cls)
+        index.codes = codes
+        index.value_codes = {value: code for code, value in enumerate(values)}
+        index.order = order[n_missing:]
+        index.offsets = np.asarray(offsets)
+        return index
+
+    def lookup_codes(self, values):
+        """Get the codes of all values present in the index"""
+        codes = [self.value_codes[val] for val in values if val in self.value_codes]
+        return np.array(codes, dtype=self.codes.dtype)
+
+    def count(self, codes):
+        """Number of rows matching any of the codes"""
+        return int(sum(self.offsets[code + 1] - self.offsets[code] for code in codes))
+
+    def positions(self, codes):
+        """Sorted row positions of rows matching any of the codes"""
+        runs = [
+            self.order[self.offsets[code] : self.offsets[code + 1]] for code in codes
+        ]
+        if len(runs) == 0:
+            return np.array([], dtype=self.order.dtype)
+        if len(runs) == 1:
+            return runs[0]
+        return np.sort(np.concatenate(runs))
+
+
+class TimeIndex:
+    """Index over the Date_Time column of a pedestrian DataFrame
+
+    When the column is sorted, as it is for cleaned DataFrames, the rows in a
+    range of datetimes are found by binary search, as a contiguous slice. The
+    weekday and hour of each row are computed once, when first filtered on, as
+    small integer codes.
+    """
+
+    def __init__(self, date_times):
+        self.values = date_times.to_numpy()
+        self.is_sorted = bool(date_times.is_monotonic_increasing)
+
+    @cached_property
+    def days(self):
+        return self.values.astype("datetime64[D]")
+
+    @cached_property
+    def weekdays(self):
+        """Day of the week of each row, with Monday as 0"""
+        # 1 January 1970, day 0, was a Thursday
+        return ((self.days.view("int64") + 3) % 7).astype("int8")
+
+    @cached_property
+    def hours(self):
+        """Hour of the day of each row"""
+        return (self.values - self.days).astype("timedelta64[h]").astype("int8")
+
+    def date_range(self, start=None, end=None):
+        """Rows from `start` up to but not including `end`
+
+        Returns a slice of rows if the index is sorted, or else an array of
+        their positions.
+        """
+        return date_range_positions(self.values, start, end, is_sorted=self.is_sorted)
+
+    def restrict(self, positions, start=None, end=None, weekday=None, hour=None):
+        """Restrict sorted row positions to those matching all time filters
+
+        `positions` is None for all rows, a slice, or an array. `start` and
+        `end` are Timestamps, and `weekday` and `hour` lists of numbers, or
+        None for no filtering. Returns a slice of rows when only a date range
+        of a sorted index is selected.
+        """
+        if start is not None or end is not None:
+            rows = self.date_range(start, end)
+            if positions is None:
+                positions = rows
+            elif isinstance(rows, slice):
+                # both are sorted, so the positions in range are contiguous
+                positions = positions[
+                    np.searchsorted(positions, rows.start) : np.searchsorted(
+                        positions, rows.stop
+                    )
+                ]
+            else:
+                positions = np.intersect1d(positions, rows, assume_unique=True)
+        for codes, values, n_codes in (
+            (self.weekdays, weekday, 7),
+            (self.hours, hour, 24),
+        ):
+            if values is None:
+                continue
+            selected = np.zeros(n_codes, dtype=bool)
+            selected[values] = True
+            if positions is None:
+                positions = np.flatnonzero(selected[codes])
+            else:
+                if isinstance(positions, slice):
+                    positions = np.arange(positions.start, positions.stop)
+                positions = positions[selected[codes[positions]]]
+        return positions
+
+
+class FilterIndex:
+    """Inverted index over the filterable columns of a pedestrian DataFrame
+
+    Filtering using the index costs time proportional to the number of rows
+    matching the most selective filter, rather than the size of the DataFrame.
+    Filters on the time of each count use a `TimeIndex`, if the DataFrame has
+    a Date_Time column.
+    """
+
+    def __init__(self, df, columns=INDEXED_COLUMNS):
+        self.columns = dict(columns)
+        self.column_indexes = {
+            param: ColumnIndex(df[col]) for param, col in self.columns.items()
+        }
+        self.time_index = None
+        if "Date_Time" in df.columns:
+            self.time_index = TimeIndex(df["Date_Time"])
+
+    def to_arrow(self, path, version=None):
+        """Save the index's arrays to an Arrow IPC file, for `from_arrow`
+
+        The weekday and hour of each row are computed and saved too. `version`
+        identifies the data the index was built from.
+        """
+        import pyarrow as pa
+
+        arrays = {}
+        metadata = {"version": version, "columns": self.columns, "indexes": {}}
+        for param, column_index in self.column_indexes.items():
+            codes, order = column_index.codes, column_index.order
+            # the rows with missing values are put back at the start, so that
+            # all arrays are the same length
+            missing = np.flatnonzero(codes < 0).astype(order.dtype)
+            arrays[f"{param}.codes"] = codes
+            arrays[f"{param}.order"] = np.concatenate([missing, order])
+            metadata["indexes"][param] = {
+                "values": list(column_index.value_codes),
+                "offsets": column_index.offsets.tolist(),
+                "n_missing": len(missing),
+            }
+        if self.time_index is not None:
+            arrays["weekday"] = self.time_index.weekdays
+            arrays["hour"] = self.time_index.hours
+        table = pa.table(arrays).replace_schema_metadata(
+            {"melbviz_index": json.dumps(metadata)}
+        )
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    @classmethod
+    def from_arrow(cls, path, df, version=None):
+        """Load an index of `df` saved by `to_arrow`, memory-mapping its arrays
+
+        As with a memory-mapped DataFrame, every process loading the same file
+        shares one copy of the index. Returns None if the index was saved for a
+        different `version` of the data, or has a different number of rows.
+        """
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        metadata = json.loads(table.schema.metadata[b"melbviz_index"])
+        if metadata["version"] != version or table.num_rows != len(df):
+            return None
+
+        def array(name):
+            return table.column(name).chunk(0).to_numpy(zero_copy_only=True)
+
+        index = cls.__new__(cls)
+        index.columns = metadata["columns"]
+        index.column_indexes = {
+            param: ColumnIndex.from_arrays(
+                array(f"{param}.codes"),
+                saved["values"],
+                array(f"{param}.order"),
+                saved["offsets"],
+                saved["n_missing"],
+            )
+            for param, saved in metadata["indexes"].items()
+        }
+        index.time_index = None
+        if "Date_Time" in df.columns:
+            index.time_index = TimeIndex(df["Date_Time"])
+            # these are cached properties, so can be given their saved values
+            index.time_index.weekdays = array("weekday")
+            index.time_index.hours = array("hour")
+        return index
+
+    def lookup(self, start=None, end=None, weekday=None, hour=None, **filters):
+        """Get the sorted row positions matching all filters
+
+        Each filter of a column is either None (no filtering) or a list of
+        values, with rows matching *any* of the values being selected. Time
+        filters are as for `TimeIndex.restrict`. Returns None if no filters
+        were applied, or a slice if only a range of dates was selected.
+        """
+        positions = self._lookup_columns(**filters)
+        time_filters = {"start": start, "end": end, "weekday": weekday, "hour": hour}
+        if all(value is None for value in time_filters.values()):
+            return positions
+        if self.time_index is None:
+            raise ValueError("Cannot filter on time without a Date_Time column")
+        return self.time_index.restrict(positions, **time_filters)
+
+    def _lookup_columns(self, **filters):
+        selections = []
+        for param, values in filters.items():
+            if values is None:
+                continue
+            column_index = self.column_indexes[param]
+            codes = column_index.lookup_codes(values)
+            selections.append((column_index.count(codes), column_index, codes))
+        if len(selections) == 0:
+            return None
+        # start from the most selective filter and only check the remaining
+        # filters against those candidate rows
+        selections.sort(key=lambda selection: selection[0])
+        _count, column_index, codes = selections[0]
+        positions = column_index.positions(codes)
+        for _count, column_index, codes in selections[1:]:
+            mask = np.isin(column_index.codes[positions], codes)
+            positions = positions[mask]
+        return positions
@@ -0,0 +1,199 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import math
+import threading
+import time
+
+from .config import MELBVIZ_METRICS
+
+
+# upper bounds of histogram buckets, in the units of each histogram
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """Distribution of observed values, for each combination of label values
+
+    Follows the semantics of a Prometheus histogram: bucket counts are
+    cumulative, and each has an upper bound `le` (less than or equal to).
+    """
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # maps sorted tuples of label items to [bucket counts, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            bucket = bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Render this histogram in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self._series.items()
+            )
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(key + (("le", format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(key + (("le", "+Inf"),))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return "\n".join(lines)
+
+
+def format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(items):
+    if len(items) == 0:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in items
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+stage_duration = Histogram(
+    "melbviz_stage_duration_seconds",
+    "Time spent in each stage of handling a request.",
+    DURATION_BUCKETS,
+)
+stage_rows = Histogram(
+    "melbviz_stage_rows",
+    "Number of rows of data output by each stage.",
+    ROW_BUCKETS,
+)
+request_duration = Histogram(
+    "melbviz_request_duration_seconds",
+    "Time taken to handle each HTTP request, including serialisation.",
+    DURATION_BUCKETS,
+)
+response_size = Histogram(
+    "melbviz_response_size_bytes",
+    "Size of each HTTP response body.",
+    BYTE_BUCKETS,
+)
+
+HISTOGRAMS = [stage_duration, stage_rows, request_duration, response_size]
+
+# per-thread record of the stages timed while handling the current request
+_trace = threading.local()
+
+
+def start_trace():
+    """Start recording the stages timed by this thread, eg for a request"""
+    _trace.stages = []
+
+
+def end_trace():
+    """Stop recording stages, returning (stage, labels, seconds) for each"""
+    stages = getattr(_trace, "stages", None)
+    _trace.stages = None
+    return [] if stages is None else stages
+
+
+def run_traced(func, *args):
+    """Call a function, returning its result and the stages it timed
+
+    This is for work done for a request by a pool of threads or processes, which
+    don't share the request thread's trace. The stages can then be added to the
+    request's trace with `record_stages`.
+    """
+    previous = getattr(_trace, "stages", None)
+    _trace.stages = []
+    try:
+        result = func(*args)
+        return result, _trace.stages
+    finally:
+        _trace.stages = previous
+
+
+def record_stages(stages, observe=False):
+    """Add stages timed by `run_traced` to this thread's trace, if it has one
+
+    If `observe` is True, their durations are also recorded in this process's
+    metrics, which is needed when they were timed in another process.
+    """
+    if observe and MELBVIZ_METRICS:
+        for stage, labels, seconds in stages:
+            stage_duration.observe(seconds, stage=stage, **labels)
+    trace_stages = getattr(_trace, "stages", None)
+    if trace_stages is not None:
+        trace_stages.extend(stages)
+
+
+@contextmanager
+def timed(stage, **labels):
+    """Record the time taken by a block of code as a stage
+
+    Can also be used as a decorator, to time each call of a function.
+    """
+    if not MELBVIZ_METRICS:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stage_duration.observe(seconds, stage=stage, **labels)
+        stages = getattr(_trace, "stages", None)
+        if stages is not None:
+            stages.append((stage, labels, seconds))
+
+
+def format_stage(stage, labels):
+    """Format a stage and its labels for logging, eg plot[sensor_map]"""
+    if len(labels) == 0:
+        return stage
+    return f"{stage}[{','.join(str(value) for value in labels.values())}]"
+
+
+def observe_rows(stage, rows, **labels):
+    """Record the number of rows of data output by a stage"""
+    if MELBVIZ_METRICS:
+        stage_rows.observe(rows, stage=stage, **labels)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format
+
+    Metrics are for the current process only.
+    """
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+
+
+def clear_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
@@ -1,22 +1,91 @@
-from functools import cached_property, lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cached_property, partial
+import itertools
+import threading
 
-from IPython.display import display
 import pandas as pd
 
-from . import plots
+from . import fast_plots, plots
+from .aggregate import CUBE_LEVELS
+from .backends import PandasBackend, make_backend
+from .cache import FilterCache, normalise_filters
+from .cube import CountCube
+from .index import FilterIndex
+from .metrics import observe_rows, record_stages, run_traced, timed
 from .config import (
+    MELBVIZ_ARROW_DATA_PATH,
+    MELBVIZ_BACKEND,
     MELBVIZ_COUNTS_CSV_PATH,
     MELBVIZ_SENSOR_CSV_PATH,
     MELBVIZ_CLEANED_DATA_PATH,
+    MELBVIZ_FIGURE_EXECUTOR,
+    MELBVIZ_FIGURE_WORKERS,
 )
 from .utils import (
     sort_months,
-    filter_pedestrian_df,
+    compact_pedestrian_df,
+    filter_values,
     load_and_clean_pedestrian_data,
+    load_sensor_locations,
+    make_sensor_table,
+    memory_report,
+    data_version,
+    index_path,
+    read_arrow,
+    read_parquet,
+    read_sensor_table,
+    remove_path,
+    sensor_table_path,
+    split_sensor_table,
     title_with_filters,
+    write_arrow,
+    write_parquet,
 )
 
 
+# used to give each unfiltered dataset its own namespace in a shared cache
+_dataset_ids = itertools.count()
+
+FIGURE_EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+# pools used by `PedestrianDataset.get_figs`, keyed by executor and worker count
+_figure_executors = {}
+_figure_executors_lock = threading.Lock()
+
+
+def figure_executor(
+    executor=MELBVIZ_FIGURE_EXECUTOR, max_workers=MELBVIZ_FIGURE_WORKERS
+):
+    """Get a pool of workers for making figures, which is shared by all datasets
+
+    `executor` is either "thread" or "process".
+    """
+    if executor not in FIGURE_EXECUTORS:
+        executors = ", ".join(f"'{name}'" for name in FIGURE_EXECUTORS)
+        raise ValueError(
+            f"'{executor}' is not a valid executor. Use one of: {executors}"
+        )
+    with _figure_executors_lock:
+        pool = _figure_executors.get((executor, max_workers))
+        if pool is None:
+            pool = FIGURE_EXECUTORS[executor](max_workers=max_workers)
+            _figure_executors[(executor, max_workers)] = pool
+        return pool
+
+
+def render_figure(plot_kind, plot_func, plot_df, figure_layout, kwargs):
+    """Make a figure from the input prepared for it by a dataset
+
+    This is a module-level function so that it can be run in worker processes.
+    """
+    with timed("plot", plot=plot_kind):
+        figure = plot_func(plot_df, **kwargs)
+    if figure is not None:
+        # TODO: need better solution for when plotting empty DataFrame
+        figure.update_layout(**figure_layout)
+    return figure
+
+
 class PedestrianDataset:
     plot_func_map = {
         "sensor_counts": plots.plot_sensor_counts,
@@ -27,111 +96,372 @@ class PedestrianDataset:
         "stacked_sensors": plots.plot_stacked_sensors,
     }
 
-    def __init__(self, df, figure_layout=None, cache=True, debug=False):
+    # the same plots, made without Plotly Express or validation when the dataset
+    # has `fast_figures` set
+    fast_plot_func_map = {
+        **plot_func_map,
+        "sensor_counts": fast_plots.plot_sensor_counts,
+        "month_counts": fast_plots.plot_month_counts,
+        "sensor_traffic": fast_plots.plot_sensor_traffic,
+        "year_traffic": fast_plots.plot_year_traffic,
+        "sensor_map": fast_plots.plot_sensor_map,
+    }
+
+    # plots which only need monthly totals, and so can be made from the cube
+    aggregate_plots = ("sensor_counts", "month_counts", "sensor_map", "stacked_sensors")
+
+    # plots made from `sensor_totals`, which is shared by all plots of a dataset
+    sensor_total_plots = ("sensor_counts", "sensor_map")
+
+    def __init__(
+        self,
+        df,
+        figure_layout=None,
+        cache=True,
+        debug=False,
+        aggregate=False,
+        index=True,
+        cube=None,
+        sensor_table=None,
+        fast_figures=False,
+        backend=None,
+    ):
         self.params = {}
         self.active_filters = {}
+        self._df_loader = None
+        # the filters of each dataset this one was filtered from, and its own
+        self._filter_chain = ()
+        self._cache_scope = (next(_dataset_ids),)
+        # identifies the source data, eg for keying caches that outlive a process
+        self.version = None
+        if df is not None and sensor_table is None and "Latitude" in df.columns:
+            df, sensor_table = split_sensor_table(df)
         self.df = df
+        # one row for each sensor, with its coordinates if known
+        self.sensor_table = sensor_table
+        # an existing FilterCache can be passed in to share it between datasets
+        if cache is True:
+            cache = FilterCache()
+        elif cache is False:
+            cache = None
         self.params["cache"] = cache
         self.params["debug"] = debug
         if figure_layout is None:
             figure_layout = {}
         self.params["figure_layout"] = figure_layout
+        self.params["aggregate"] = aggregate
+        self.params["index"] = index
+        self.params["fast_figures"] = fast_figures
+        # filters and aggregates this dataset's rows. See `backends`.
+        if backend is None:
+            backend = PandasBackend()
+        self.params["backend"] = backend
+        if df is None and not backend.in_memory:
+            # rows are only queried once they're needed
+            self._df_loader = self._filter_df
+        if aggregate and cube is None:
+            cube = CountCube(backend.cube_tables(self))
+        self.cube = cube
 
     @property
     def df(self):
         """Pandas DataFrame containing data for this dataset."""
+        if self._dataframe is None and self._df_loader is not None:
+            # filtered datasets only compute their rows once they're needed
+            self._dataframe = self._df_loader()
+            self._df_loader = None
         return self._dataframe
 
     @df.setter
     def df(self, df):
         self._dataframe = df
 
+    @cached_property
+    def filter_index(self):
+        """Inverted index used to filter this dataset's DataFrame"""
+        return FilterIndex(self.df)
+
     @property
     def available_plots(self):
         return list(self.plot_func_map.keys())
 
+    @property
+    def backend(self):
+        return self.params["backend"]
+
+    @property
+    def _summary_df(self):
+        """The smallest DataFrame that has all years, months and sensors"""
+        if self.cube is not None:
+            return self.cube.table("monthly")
+        if not self.backend.in_memory:
+            return self.counts(CUBE_LEVELS["monthly"])
+        return self.df
+
+    @cached_property
+    def sensor_totals(self):
+        """DataFrame of total counts for each sensor
+
+        This is computed once per dataset and reused by all plots that need it.
+        """
+        return self.counts("Sensor_Name")
+
+    @property
+    def _shared_sensor_names(self):
+        """Whether any Sensor_Name in the sensor table has more than one ID"""
+        if self.sensor_table is None:
+            return False
+        return bool(self.sensor_table["Sensor_Name"].duplicated().any())
+
     @cached_property
     def years(self):
         """Sorted list of years present in this dataset"""
-        return sorted(self.df["Year"].unique())
+        return sorted(self._summary_df["Year"].unique())
 
     @cached_property
     def months(self):
         """Sorted list of months present in this dataset"""
-        return sort_months(self.df["Month"].unique())
+        return sort_months(self._summary_df["Month"].unique())
 
     @cached_property
     def sensors(self):
         """Alphabetically sorted list of months present in this dataset"""
-        return sorted(self.df["Sensor_Name"].unique())
+        return sorted(self._summary_df["Sensor_Name"].unique())
 
     @classmethod
     def load(
         cls,
         counts_csv_path=MELBVIZ_COUNTS_CSV_PATH,
         sensor_csv_path=MELBVIZ_SENSOR_CSV_PATH,
+        compact=False,
         **kwargs,
     ):
-        """Load and clean the pedestrian dataset into a DataFrame"""
-        df = load_and_clean_pedestrian_data(counts_csv_path, sensor_csv_path)
-        return cls(df, **kwargs)
+        """Load and clean the pedestrian dataset into a DataFrame
+
+        If `compact` is True, the DataFrame is converted to the compact schema
+        described in `utils.compact_pedestrian_df`. Sensor locations are loaded
+        into the dataset's sensor table.
+        """
+        df = load_and_clean_pedestrian_data(counts_csv_path, compact=compact)
+        geo_df = None
+        if sensor_csv_path is not None:
+            geo_df = load_sensor_locations(sensor_csv_path)
+        return cls(df, sensor_table=make_sensor_table(df, geo_df), **kwargs)
 
     @classmethod
-    def from_parquet(cls, path=MELBVIZ_CLEANED_DATA_PATH, **kwargs):
-        """Load a dataset from a saved Parquet file."""
-        df = pd.read_parquet(path)
-        return cls(df, **kwargs)
+    def from_parquet(
+        cls,
+        path=MELBVIZ_CLEANED_DATA_PATH,
+        compact=False,
+        year=None,
+        month=None,
+        sensor=None,
+        columns=None,
+        backend=MELBVIZ_BACKEND,
+        **kwargs,
+    ):
+        """Load a dataset from a saved Parquet file or partitioned directory.
+
+        The filters {year, month, sensor} are pushed down into the Parquet
+        reader, so for partitioned datasets only the matching partitions are
+        read. `columns` restricts which columns are loaded. The sensor table
+        and the count cube saved alongside the data are also loaded, if there
+        are any, with the cube filtered in the same way as the data.
+
+        `backend` is "pandas", which loads the data into memory, or "duckdb",
+        which leaves it in the Parquet files and queries them with DuckDB (see
+        `backends.DuckDBBackend`).
+        """
+        if backend != "pandas":
+            return cls._from_parquet_query(
+                path,
+                make_backend(backend, path, compact=compact, columns=columns),
+                filters={"year": year, "month": month, "sensor": sensor},
+                **kwargs,
+            )
+        df = read_parquet(path, year=year, month=month, sensor=sensor, columns=columns)
+        if "Date_Time" in df.columns and not df["Date_Time"].is_monotonic_increasing:
+            # files written in chunks are only sorted within each chunk
+            df = df.sort_values("Date_Time", ignore_index=True)
+        if compact:
+            df = compact_pedestrian_df(df)
+        kwargs.setdefault("sensor_table", read_sensor_table(path))
+        if "cube" not in kwargs:
+            cube = CountCube.from_parquet(path, compact=compact)
+            if cube is not None and (year, month, sensor) != (None, None, None):
+                cube = cube.filter(year=year, month=month, sensor=sensor)
+            kwargs["cube"] = cube
+        dataset = cls(df, **kwargs)
+        dataset.version = data_version(path)
+        return dataset
+
+    @classmethod
+    def _from_parquet_query(cls, path, backend, filters, **kwargs):
+        """Make a dataset whose rows are queried from Parquet by `backend`"""
+        sensor_table = read_sensor_table(path)
+        if sensor_table is None:
+            sensor_table = backend.sensor_table()
+        kwargs.setdefault("sensor_table", sensor_table)
+        kwargs.setdefault("cube", CountCube.from_parquet(path, compact=backend.compact))
+        dataset = cls(None, backend=backend, **kwargs)
+        dataset.version = data_version(path)
+        if any(filter_values(value) is not None for value in filters.values()):
+            dataset = dataset.filter(**filters)
+        return dataset
+
+    @classmethod
+    def from_arrow(cls, path=MELBVIZ_ARROW_DATA_PATH, memory_map=True, **kwargs):
+        """Load a dataset from a saved Arrow IPC file.
+
+        By default the file is memory-mapped rather than read, so processes
+        loading the same file share its memory. See `utils.read_arrow`. The
+        sensor table and count cube saved alongside the file are also loaded,
+        as is the filter index, which is memory-mapped in the same way.
+
+        Each process still has its own copy of anything computed from the
+        data, such as the sensor table, the count cube and DataFrames it
+        filters, which are kept in its filter cache (see the `cache` param).
+        """
+        df = read_arrow(path, memory_map=memory_map)
+        kwargs.setdefault("sensor_table", read_sensor_table(path))
+        kwargs.setdefault("cube", CountCube.from_parquet(path, compact=True))
+        dataset = cls(df, **kwargs)
+        dataset.version = data_version(path)
+        if memory_map and index_path(path).exists():
+            filter_index = FilterIndex.from_arrow(
+                index_path(path), dataset.df, version=dataset.version
+            )
+            # an index saved for other data is ignored, and built when needed
+            if filter_index is not None:
+                dataset.filter_index = filter_index
+        return dataset
 
     @classmethod
     def from_csv(cls, path, **kwargs):
         """Load a dataset from a cleaned and saved CSV file."""
-        df = pd.read_csv(path, parse_dates=["datetime", "datetime_flat_year"])
+        df = pd.read_csv(path, parse_dates=["Date_Time", "datetime_flat_year"])
         return cls(df, **kwargs)
 
-    def to_parquet(self, path=MELBVIZ_CLEANED_DATA_PATH):
-        """Write the DataFrame to disk as Parquet using standardised config."""
-        self.df.to_parquet(path, engine="fastparquet", compression="gzip")
+    def to_parquet(self, path=MELBVIZ_CLEANED_DATA_PATH, partition_cols=None):
+        """Write the DataFrame to disk as Parquet using standardised config.
+
+        If `partition_cols` is provided (eg `utils.PARTITION_COLUMNS`), `path`
+        is written as a directory of Parquet files, one for each partition. The
+        sensor table and each level of the count cube are written alongside.
+        """
+        if partition_cols is not None:
+            remove_path(path)
+        write_parquet(self.df, path, partition_cols=partition_cols)
+        self._write_sensor_table(path)
+        self._write_cube(path)
+
+    def to_arrow(self, path=MELBVIZ_ARROW_DATA_PATH):
+        """Write the DataFrame to disk as an Arrow IPC file for memory-mapping.
+
+        The sensor table and count cube are written alongside, as is the filter
+        index, so that it can be memory-mapped too.
+        """
+        write_arrow(self.df, path)
+        self._write_sensor_table(path)
+        self._write_cube(path)
+        self.filter_index.to_arrow(index_path(path), version=data_version(path))
+
+    def _write_sensor_table(self, path):
+        if self.sensor_table is not None:
+            write_parquet(self.sensor_table, sensor_table_path(path))
+
+    def _write_cube(self, path):
+        cube = self.cube
+        # a cube filtered by month has no yearly level to save
+        if cube is None or cube.levels != list(CUBE_LEVELS):
+            cube = CountCube.from_df(self.df)
+        cube.to_parquet(path)
 
     def to_csv(self, path, **kwargs):
         """Write the DataFrame to disk as CSV"""
         self.df.to_csv(path, **kwargs)
 
-    def filter(self, year=None, month=None, sensor=None):
-        """Filter this dataset dataset, returning new PedestrianDataset instance"""
-        if self.params["cache"]:
-            filter_func = self._filter_df_cached
-            # arguments to functions decorated by `lru_cache`` must be hashable
-            if isinstance(year, list):
-                year = tuple(year)
-            if isinstance(month, list):
-                month = tuple(month)
-            if isinstance(sensor, list):
-                sensor = tuple(sensor)
-        else:
-            filter_func = self._filter_df
+    def memory_report(self):
+        """Report the memory used by each column of this dataset's DataFrame"""
+        return memory_report(self.df)
+
+    def filter(
+        self,
+        year=None,
+        month=None,
+        sensor=None,
+        start=None,
+        end=None,
+        weekday=None,
+        hour=None,
+    ):
+        """Filter this dataset dataset, returning new PedestrianDataset instance
+
+        As well as by year, month and sensor, counts can be filtered to those
+        from `start` up to but not including `end`, and by weekday and hour of
+        the day (see `utils.filter_pedestrian_df`). The count cube can't be
+        filtered by time, so isn't used by datasets filtered that way.
+        """
         filters = {"year": year, "month": month, "sensor": sensor}
-        df = filter_func(**filters)
-        new_dataset = self.__class__(df, **self.params)
+        time_filters = {"start": start, "end": end, "weekday": weekday, "hour": hour}
+        cube = None
+        if self.cube is not None and all(
+            filter_values(value) is None for value in time_filters.values()
+        ):
+            cube = self.cube.filter(**filters)
+        filters.update(time_filters)
+        params = dict(self.params)
+        if cube is None:
+            params["aggregate"] = False
+        new_dataset = self.__class__(
+            None, cube=cube, sensor_table=self.sensor_table, **params
+        )
+        new_dataset._df_loader = partial(self._get_filtered_df, **filters)
+        new_dataset._filter_chain = self._filter_chain + (filters,)
+        new_dataset._cache_scope = self._cache_scope + (normalise_filters(**filters),)
         new_dataset.active_filters = filters
+        new_dataset.version = self.version
         return new_dataset
 
-    def _filter_df(self, year=None, month=None, sensor=None):
-        return filter_pedestrian_df(
-            self.df, year=year, month=month, sensor=sensor, debug=self.params["debug"]
-        )
+    def cache_info(self):
+        """Statistics for the filter cache shared by this family of datasets"""
+        if self.params["cache"] is None:
+            return None
+        return self.params["cache"].stats
 
-    @lru_cache()
-    def _filter_df_cached(self, year=None, month=None, sensor=None):
-        return filter_pedestrian_df(
-            self.df, year=year, month=month, sensor=sensor, debug=self.params["debug"]
-        )
+    def _get_filtered_df(self, **filters):
+        cache = self.params["cache"]
+        if cache is None:
+            return self._filter_df(**filters)
+        key = (self._cache_scope, normalise_filters(**filters))
+        return cache.get_or_set(key, partial(self._filter_df, **filters))
+
+    def counts(self, by="Sensor_Name"):
+        """Total counts for this dataset grouped by one or more columns
+
+        Uses the aggregate cube when available, only falling back to the
+        backend for columns the cube doesn't contain.
+        """
+        if isinstance(by, str):
+            by = [by]
+        if self.cube is not None and self.cube.level_for(by) is not None:
+            return self.cube.counts(by)
+        return self.backend.counts(self, by)
+
+    def _filter_df(self, **filters):
+        with timed("filter"):
+            df = self.backend.filter_rows(self, filters)
+        observe_rows("filter", len(df))
+        return df
 
     @classmethod
-    def get_plot_func(cls, kind):
+    def get_plot_func(cls, kind, fast=False):
         if kind not in cls.plot_func_map:
             kinds = ", ".join(f"'{plot}'" for plot in cls.plot_func_map.keys())
             msg = f"'{kind}' is not a valid plot type. Available plots are:\n\n{kinds}"
             raise ValueError()
+        if fast:
+            return cls.fast_plot_func_map[kind]
         return cls.plot_func_map[kind]
 
     def get_fig(self, plot_kind, title_filters=True, **kwargs):
@@ -142,18 +472,85 @@ class PedestrianDataset:
         **kwargs      Keyword arguments will be passed into the
                       keyword arguments of the underling Plotly Express call.
         """
+        return render_figure(*self._prepare_plot(plot_kind, title_filters, kwargs))
+
+    def get_figs(
+        self,
+        plots,
+        title_filters=True,
+        max_workers=MELBVIZ_FIGURE_WORKERS,
+        executor=MELBVIZ_FIGURE_EXECUTOR,
+    ):
+        """Make several Plotly Figures at once, returning a list of them
+
+        plots         Sequence of plot kinds, or of (plot kind, kwargs) pairs,
+                      where kwargs is a dict of keyword arguments for `get_fig`.
+        title_filters Boolean indicates whether to add active filters to title.
+        max_workers   Number of figures made in parallel.
+        executor      Whether figures are made in "thread"s or "process"es.
+
+        The inputs shared by the plots, such as the filtered DataFrame and the
+        totals for each sensor, are computed once before any figure is made.
+        """
+        plots = [(plot, {}) if isinstance(plot, str) else plot for plot in plots]
+        jobs = [
+            self._prepare_plot(plot_kind, title_filters, dict(kwargs))
+            for plot_kind, kwargs in plots
+        ]
+        if len(jobs) <= 1 or max_workers <= 1:
+            return [render_figure(*job) for job in jobs]
+        pool = figure_executor(executor, max_workers)
+        futures = [pool.submit(run_traced, render_figure, *job) for job in jobs]
+        figures = []
+        for future in futures:
+            figure, stages = future.result()
+            # so that the stages of each figure are part of the current request's
+            record_stages(stages, observe=executor == "process")
+            figures.append(figure)
+        return figures
+
+    def _prepare_plot(self, plot_kind, title_filters, kwargs):
+        """Get the arguments of `render_figure` for a plot of this dataset"""
         if title_filters:
-            title_func = partial(title_with_filters, filters=self.active_filters)
-        else:
-            title_func = None
-        plot_func = self.get_plot_func(plot_kind)
-        figure = plot_func(self.df, title_func=title_func, **kwargs)
-        if figure is not None:
-            # TODO: need better solution for when plotting empty DataFrame
-            figure.update_layout(**self.params["figure_layout"])
-        return figure
+            kwargs["title_func"] = partial(
+                title_with_filters, filters=self.active_filters
+            )
+        plot_func = self.get_plot_func(plot_kind, fast=self.params["fast_figures"])
+        # includes filtering the rows of a filtered dataset, if not done yet
+        with timed("aggregate", plot=plot_kind):
+            if plot_kind == "sensor_map" and self._shared_sensor_names:
+                # totals of a name can't be split between the IDs sharing it
+                plot_df = self.counts(["Sensor_ID", "Sensor_Name"])
+            elif plot_kind in self.sensor_total_plots:
+                plot_df = self.sensor_totals
+            elif self.cube is not None and plot_kind in self.aggregate_plots:
+                plot_df = self.cube.table("monthly")
+            elif not self.backend.in_memory and plot_kind in self.aggregate_plots:
+                plot_df = self.counts(CUBE_LEVELS["monthly"])
+            elif not self.backend.in_memory and plot_kind == "sensor_traffic":
+                plot_df = self._top_sensors_df(kwargs.get("limit", 5))
+            else:
+                plot_df = self.df
+            if plot_kind == "sensor_traffic":
+                kwargs.setdefault("sensor_totals", self.sensor_totals)
+            if plot_kind == "sensor_map":
+                kwargs.setdefault("sensor_table", self.sensor_table)
+        observe_rows("aggregate", len(plot_df), plot=plot_kind)
+        return plot_kind, plot_func, plot_df, self.params["figure_layout"], kwargs
+
+    def _top_sensors_df(self, limit):
+        """The rows of the `limit` sensors with the most traffic
+
+        This is all the sensor-traffic plot uses, so the backend only needs to
+        find these rows rather than all of them.
+        """
+        totals = self.sensor_totals.set_index("Sensor_Name")["Hourly_Counts"]
+        target_sensors = totals.sort_values(ascending=False)[:limit]
+        return self.filter(sensor=list(target_sensors.index)).df
 
     def plot(self, *args, **kwargs):
         """Make and display a Plotly Figure in a notebook"""
+        from IPython.display import display
+
         figure = self.get_fig(*args, **kwargs)
         return display(figure)
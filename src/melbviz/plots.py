@@ -1,34 +1,183 @@
-import pandas as pd
-import plotly.express as px
+import functools
+
 import plotly.graph_objects as go
 
-from .config import MELBVIZ_MAPBOX_KEY
+from .aggregate import sum_counts
+from .config import MELBVIZ_MAPBOX_KEY, MELBVIZ_WEBGL_POINTS
+from .downsample import downsample_traffic
+from .metrics import timed
+from .utils import MONTH_NUMBERS
 
-px.set_mapbox_access_token(MELBVIZ_MAPBOX_KEY)
 
+@functools.lru_cache()
+def express():
+    """Import and configure Plotly Express on first use, as it's slow to import"""
+    import plotly.express as px
 
-def plot_sensor_counts(df, title_func=None, **kwargs):
-    """Make a bar chart of total counts for each sensor"""
-    title = "Ranked Sensor Traffic"
+    px.set_mapbox_access_token(MELBVIZ_MAPBOX_KEY)
+    return px
+
+
+@functools.lru_cache()
+def template_props(name):
+    """The properties of a registered Plotly template, as a dict"""
+    import plotly.io as pio
+
+    return pio.templates[name].to_plotly_json()
+
+
+def express_template(template=None):
+    """A template for one Plotly Express figure, which no other figure shares
+
+    Plotly Express reads a template's properties as it makes a figure, and the
+    registered templates create them the first time they're read, so making
+    figures with the same template in several threads at once can fail. This
+    returns a copy of the template named `template`, or of the default template
+    if it's None. The copy isn't validated again, which makes it quick. Template
+    objects and dicts are returned as they are.
+    """
+    import plotly.io as pio
+
+    if template is None:
+        template = pio.templates.default or "plotly"
+    if not isinstance(template, str):
+        return template
+    return go.layout.Template(template_props(template), _validate=False)
+
+
+def make_title(title, title_func=None):
+    """Apply a figure's `title_func`, if it has one, to its title"""
     if callable(title_func):
-        title = title_func(title)
-    total_df = (
-        df.groupby("Sensor_Name")["Hourly_Counts"]
-        .sum()
-        .sort_values()
-        .reset_index(name="Total Counts")
+        return title_func(title)
+    return title
+
+
+def render_mode(df):
+    """The Plotly Express render mode for a line chart of a DataFrame's rows"""
+    return "webgl" if len(df) > MELBVIZ_WEBGL_POINTS else "svg"
+
+
+def ranked_sensor_totals(df):
+    """Total counts of each sensor, as "Total Counts", in ascending order"""
+    return (
+        sum_counts(df, "Sensor_Name")
+        .sort_values("Hourly_Counts", kind="stable", ignore_index=True)
+        .rename(columns={"Hourly_Counts": "Total Counts"})
     )
+
+
+def month_totals(df, split_sensors=False):
+    """Total counts of each month, and each sensor if `split_sensors`
+
+    Rows are in calendar order of month.
+    """
+    group_cols = ["Month", "Sensor_Name"] if split_sensors else ["Month"]
+    month_df = sum_counts(df, group_cols)
+    month_df["month_num"] = month_df["Month"].map(MONTH_NUMBERS).astype("int64")
+    return month_df.sort_values(by="month_num")
+
+
+def top_sensor_traffic(
+    df,
+    limit=5,
+    max_points=None,
+    downsample="minmax",
+    resample=None,
+    sensor_totals=None,
+):
+    """Hourly counts of the `limit` sensors with the most traffic
+
+    Returns the rows of those sensors, reduced to `max_points` if given, and a
+    Series of their total counts, in descending order. See
+    `plot_sensor_traffic` for the parameters.
+    """
+    if sensor_totals is None:
+        sensor_totals = sum_counts(df, "Sensor_Name")
+    totals = sensor_totals.set_index("Sensor_Name")["Hourly_Counts"]
+    target_sensors = totals.sort_values(ascending=False)[:limit]
+
+    df = df[df["Sensor_Name"].isin(set(target_sensors.index))]
+    if max_points is not None:
+        with timed("downsample", plot="sensor_traffic"):
+            df = downsample_traffic(
+                df,
+                "Date_Time",
+                "Hourly_Counts",
+                "Sensor_Name",
+                max_points,
+                method=downsample,
+                resample=resample,
+            )
+    return df, target_sensors
+
+
+def yearly_traffic(df, max_points=None, downsample="minmax", resample=None):
+    """Hourly counts of a single sensor, on the same flat year for each year
+
+    Returns the rows, reduced to `max_points` if given, and a Series of total
+    counts for each year, with the latest year first.
+    """
+    year_counts = (
+        sum_counts(df, "Year")
+        .set_index("Year")["Hourly_Counts"]
+        .sort_index(ascending=False)
+    )
+    if max_points is not None:
+        with timed("downsample", plot="year_traffic"):
+            df = downsample_traffic(
+                df,
+                "datetime_flat_year",
+                "Hourly_Counts",
+                "Year",
+                max_points,
+                method=downsample,
+                resample=resample,
+            )
+    return df, year_counts
+
+
+def located_sensor_totals(df, sensor_table=None):
+    """Total counts of each sensor, as "Total Counts", with its coordinates
+
+    The coordinates of each sensor are joined on Sensor_ID from `sensor_table`,
+    or `df` if it isn't provided, as sensors can be named differently in the
+    sensor locations CSV. If `df` has no Sensor_ID column, as for the totals of
+    the count cube, each Sensor_Name is given its ID from `sensor_table`. Sensors
+    without coordinates are left out.
+    """
+    if sensor_table is None:
+        sensor_table = df
+    if "Sensor_ID" in df.columns:
+        sensor_totals_df = sum_counts(df, ["Sensor_ID", "Sensor_Name"])
+    else:
+        sensor_ids = sensor_table[["Sensor_ID", "Sensor_Name"]].drop_duplicates()
+        sensor_totals_df = sum_counts(df, "Sensor_Name").merge(
+            sensor_ids.astype({"Sensor_Name": "object"}), on="Sensor_Name"
+        )
+    locations = sensor_table[["Sensor_ID", "Latitude", "Longitude"]]
+    return sensor_totals_df.rename(columns={"Hourly_Counts": "Total Counts"}).merge(
+        locations.drop_duplicates("Sensor_ID"), on="Sensor_ID"
+    )
+
+
+def plot_sensor_counts(df, title_func=None, **kwargs):
+    """Make a bar chart of total counts for each sensor"""
+    px = express()
+    title = make_title("Ranked Sensor Traffic", title_func)
+    total_df = ranked_sensor_totals(df)
     if "height" not in kwargs:
         kwargs["height"] = max(18 * len(total_df), 600)
 
-    figure = px.bar(
-        total_df,
-        x="Total Counts",
-        y="Sensor_Name",
-        orientation="h",
-        title=title,
-        **kwargs,
-    )
+    kwargs["template"] = express_template(kwargs.get("template"))
+    with timed("figure", plot="sensor_counts"):
+        figure = px.bar(
+            total_df,
+            x="Total Counts",
+            y="Sensor_Name",
+            orientation="h",
+            title=title,
+            **kwargs,
+        )
     figure.update_layout(
         title_x=0.5,
         yaxis_title=None,
@@ -41,26 +190,21 @@ def plot_sensor_counts(df, title_func=None, **kwargs):
 
 def plot_month_counts(df, split_sensors=False, title_func=None, **kwargs):
     """Make a bar plot of monthly counts"""
-    title = "Monthly Sensor Traffic"
-    if callable(title_func):
-        title = title_func(title)
-    if split_sensors:
-        group_cols = ["Month", "Sensor_Name"]
-        color = "Sensor_Name"
-    else:
-        group_cols = ["Month"]
-        color = None
-    month_df = df.groupby(group_cols)["Hourly_Counts"].sum().reset_index()
-    month_df["month_num"] = pd.to_datetime(month_df.Month, format="%B").dt.month
-    figure = px.bar(
-        month_df.sort_values(by="month_num"),
-        x="Month",
-        y="Hourly_Counts",
-        barmode="group",
-        color=color,
-        title=title,
-        **kwargs,
-    )
+    px = express()
+    title = make_title("Monthly Sensor Traffic", title_func)
+    month_df = month_totals(df, split_sensors)
+    color = "Sensor_Name" if split_sensors else None
+    kwargs["template"] = express_template(kwargs.get("template"))
+    with timed("figure", plot="month_counts"):
+        figure = px.bar(
+            month_df,
+            x="Month",
+            y="Hourly_Counts",
+            barmode="group",
+            color=color,
+            title=title,
+            **kwargs,
+        )
     figure.update_layout(
         title_x=0.5,
         yaxis_title="Total Counts",
@@ -84,34 +228,47 @@ def plot_sensor_traffic(
     same_yscale=False,
     row_height=150,
     limit=5,
+    max_points=None,
+    downsample="minmax",
+    resample=None,
+    sensor_totals=None,
     title_func=None,
     **kwargs,
 ):
-    """Plot hourly traffic for one or more sensors"""
+    """Plot hourly traffic for one or more sensors
+
+    If `max_points` is provided, the plotted series are downsampled to fit
+    within that many points in total, keeping their hourly counts. They're only
+    resampled, to the mean hourly count of each day or week, if `resample` is
+    given. See `downsample.downsample_traffic` for `downsample` and `resample`.
+
+    The sensors plotted are the `limit` sensors with the most traffic. If a
+    DataFrame of "Sensor_Name" and "Hourly_Counts" totals for `df` is provided
+    as `sensor_totals`, it's used to pick them rather than recomputing totals.
+    """
+    px = express()
     if len(df) == 0:
         # TODO: need better solution for when plotting empty DataFrame
         return None
-    title = "Hourly Pedestrian Traffic by Sensor"
-    if callable(title_func):
-        title = title_func(title)
-    target_sensors = (
-        df.groupby("Sensor_Name")["Hourly_Counts"].sum().sort_values(ascending=False)
-    )[:limit]
-
-    df = df[df["Sensor_Name"].isin(set(target_sensors.index))]
-
+    title = make_title("Hourly Pedestrian Traffic by Sensor", title_func)
+    df, target_sensors = top_sensor_traffic(
+        df, limit, max_points, downsample, resample, sensor_totals
+    )
     if "height" not in kwargs:
         kwargs["height"] = max(len(target_sensors) * row_height, 400)
+    kwargs.setdefault("render_mode", render_mode(df))
 
-    figure = px.line(
-        df,
-        y="Hourly_Counts",
-        x="Date_Time",
-        facet_row="Sensor_Name",
-        title=title,
-        category_orders={"Sensor_Name": list(target_sensors.index)},
-        **kwargs,
-    )
+    kwargs["template"] = express_template(kwargs.get("template"))
+    with timed("figure", plot="sensor_traffic"):
+        figure = px.line(
+            df,
+            y="Hourly_Counts",
+            x="Date_Time",
+            facet_row="Sensor_Name",
+            title=title,
+            category_orders={"Sensor_Name": list(target_sensors.index)},
+            **kwargs,
+        )
     figure.update_layout(title_x=0.5)
     figure.update_yaxes(
         matches=None if same_yscale else "y",
@@ -126,31 +283,44 @@ def plot_sensor_traffic(
     return figure
 
 
-def plot_year_traffic(df, same_yscale=False, row_height=150, title_func=None, **kwargs):
+def plot_year_traffic(
+    df,
+    same_yscale=False,
+    row_height=150,
+    max_points=None,
+    downsample="minmax",
+    resample=None,
+    title_func=None,
+    **kwargs,
+):
     """Plot traffic for a single sensor
     Note: assumes the DataFrame has been filtered to a single sensor already.
+
+    `max_points`, `downsample` and `resample` are as for `plot_sensor_traffic`.
     """
+    px = express()
     if len(df) == 0:
         return None
     sensor = df["Sensor_Name"].unique()[0]
-    title = f"{sensor} Hourly Footfall Counts by year"
-    if callable(title_func):
-        title = title_func(title)
-    year_counts = df.groupby("Year")["Hourly_Counts"].sum().sort_index(ascending=False)
+    title = make_title(f"{sensor} Hourly Footfall Counts by year", title_func)
+    df, year_counts = yearly_traffic(df, max_points, downsample, resample)
 
     if "height" not in kwargs:
         kwargs["height"] = max(len(year_counts) * row_height, 500)
+    kwargs.setdefault("render_mode", render_mode(df))
 
     # make the figure with Plotly Express
-    figure = px.line(
-        df,
-        y="Hourly_Counts",
-        x="datetime_flat_year",
-        facet_row="Year",
-        title=title,
-        category_orders={"Year": list(year_counts.index)},
-        **kwargs,
-    )
+    kwargs["template"] = express_template(kwargs.get("template"))
+    with timed("figure", plot="year_traffic"):
+        figure = px.line(
+            df,
+            y="Hourly_Counts",
+            x="datetime_flat_year",
+            facet_row="Year",
+            title=title,
+            category_orders={"Year": list(year_counts.index)},
+            **kwargs,
+        )
 
     # update figure produced by Plotly Express with fine-tuning
     figure.update_yaxes(
@@ -167,62 +337,59 @@ def plot_year_traffic(df, same_yscale=False, row_height=150, title_func=None, **
     return figure
 
 
-def plot_sensor_map(df, title_func=None, **kwargs):
-    """Plot a spatial scatter plot of sensor traffic."""
-    title = "Sensor Traffic"
-    if callable(title_func):
-        title = title_func(title)
-    sensor_totals_df = (
-        df.groupby("Sensor_Name")
-        .agg(
-            {
-                "Hourly_Counts": sum,
-                "Latitude": lambda x: x.iloc[0],
-                "Longitude": lambda x: x.iloc[0],
-            }
+def plot_sensor_map(df, sensor_table=None, title_func=None, **kwargs):
+    """Plot a spatial scatter plot of sensor traffic.
+
+    The coordinates of each sensor are looked up in `sensor_table`, a DataFrame
+    with "Sensor_ID", "Sensor_Name", "Latitude" and "Longitude" columns. If it
+    isn't provided, they're taken from the same columns of `df`. See
+    `located_sensor_totals`.
+    """
+    px = express()
+    title = make_title("Sensor Traffic", title_func)
+    sensor_totals_df = located_sensor_totals(df, sensor_table)
+    kwargs["template"] = express_template(kwargs.get("template"))
+    with timed("figure", plot="sensor_map"):
+        figure = px.scatter_mapbox(
+            sensor_totals_df,
+            lat="Latitude",
+            lon="Longitude",
+            color="Total Counts",
+            size="Total Counts",
+            text="Sensor_Name",
+            color_continuous_scale=px.colors.sequential.Plasma,
+            size_max=50,
+            zoom=13,
+            title=title,
+            **kwargs,
         )
-        .reset_index()
-        .rename(columns={"Hourly_Counts": "Total Counts"})
-    )
-    figure = px.scatter_mapbox(
-        sensor_totals_df,
-        lat="Latitude",
-        lon="Longitude",
-        color="Total Counts",
-        size="Total Counts",
-        text="Sensor_Name",
-        color_continuous_scale=px.colors.sequential.Plasma,
-        size_max=50,
-        zoom=13,
-        title=title,
-        **kwargs,
-    )
     figure.update_layout(title_x=0.5)
     return figure
 
 
 def plot_stacked_sensors(df, year=None, sensor=None, normalised=True, title_func=None):
-    title = "Proportion of footfalls for each sensor by year"
-    if callable(title_func):
-        title = title_func(title)
-    sensor_years_s = df.groupby(["Sensor_Name", "Year"])["Hourly_Counts"].sum()
+    title = make_title("Proportion of footfalls for each sensor by year", title_func)
+    sensor_years_df = sum_counts(df, ["Sensor_Name", "Year"])
     sensor_dfs = [
-        (sensor, dfx.reset_index("Sensor_Name"))
-        for sensor, dfx in sensor_years_s.groupby(level=0)
+        (sensor, dfx.set_index("Year"))
+        for sensor, dfx in sensor_years_df.groupby(
+            "Sensor_Name", observed=True, sort=False
+        )
     ]
 
-    figure = go.Figure()
-    for sensor, df in sensor_dfs:
-        figure.add_trace(
-            go.Scatter(
-                x=df.index,
-                y=df["Hourly_Counts"],
-                # mode='lines',
-                name=sensor,
-                stackgroup="one",
-                groupnorm="percent" if normalised else "",
+    with timed("figure", plot="stacked_sensors"):
+        figure = go.Figure()
+        for sensor, df in sensor_dfs:
+            figure.add_trace(
+                go.Scatter(
+                    x=df.index,
+                    y=df["Hourly_Counts"],
+                    # mode='lines',
+                    name=sensor,
+                    stackgroup="one",
+                    groupnorm="percent" if normalised else "",
+                )
             )
-        )
 
     figure.update_layout(width=1500, height=1200, title=title)
     return figure
@@ -1,5 +1,6 @@
 from functools import partial
 
+from IPython.display import display
 from ipywidgets import (
     VBox,
     HBox,
@@ -35,6 +36,28 @@ class PedestrianDemo(PedestrianDataset):
 
         return callback
 
+    def make_batch_callback(self, outputs, plots):
+        """Make callback function that makes several filtered plots together
+
+        `plots` is a list of (plot kind, plot params) pairs, and each figure is
+        displayed in the corresponding Output widget of `outputs`.
+        """
+        for plot_kind, _params in plots:
+            # get the func just to do validation
+            _func = self.get_plot_func(plot_kind)
+
+        def callback(**filters):
+            if self.params["debug"]:
+                print(f"Callback for plots {[plot_kind for plot_kind, _ in plots]}")
+                print(f"Callback params: {filters}")
+            figures = self.filter(**filters).get_figs(plots)
+            for output, figure in zip(outputs, figures):
+                output.clear_output(wait=True)
+                with output:
+                    display(figure)
+
+        return callback
+
     def prototype(self, title=None, start_year=None):
         """Create a prototype Dashboard"""
         if title is None:
@@ -72,16 +95,19 @@ class PedestrianDemo(PedestrianDataset):
             self.make_callback("month_counts", height=350, width=550),
             {"sensor": sensor_input, "year": year_input},
         )
-        sensor_counts_output = interactive_output(
-            self.make_callback("sensor_counts", width=550),
-            {"sensor": sensor_input, "year": year_input, "month": month_input},
-        )
-        sensors_map_output = interactive_output(
-            self.make_callback("sensor_map", height=650, width=600),
-            {"sensor": sensor_input, "year": year_input, "month": month_input},
-        )
-        sensors_traffic_output = interactive_output(
-            self.make_callback("sensor_traffic", same_yscale=True, width=1200),
+        # these share a filtered dataset, so are made together
+        sensor_counts_output = Output()
+        sensors_map_output = Output()
+        sensors_traffic_output = Output()
+        filtered_plots_output = interactive_output(
+            self.make_batch_callback(
+                [sensor_counts_output, sensors_map_output, sensors_traffic_output],
+                [
+                    ("sensor_counts", {"width": 550}),
+                    ("sensor_map", {"height": 650, "width": 600}),
+                    ("sensor_traffic", {"same_yscale": True, "width": 1200}),
+                ],
+            ),
             {"sensor": sensor_input, "year": year_input, "month": month_input},
         )
 
@@ -94,7 +120,7 @@ class PedestrianDemo(PedestrianDataset):
         col1_row2 = sensors_traffic_output
         col1 = VBox([col1_row1, col1_row2])
         col2 = sensor_counts_output
-        rows = [HBox([title]), HBox([col1, col2])]
+        rows = [HBox([title]), HBox([col1, col2]), filtered_plots_output]
         for row in rows:
             row.layout.justify_content = "center"
         return VBox(rows)
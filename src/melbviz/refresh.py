@@ -0,0 +1,269 @@
+import hashlib
+import json
+from pathlib import Path
+import tempfile
+
+from fastparquet import writer
+import pandas as pd
+
+from .aggregate import (
+    CUBE_LEVELS,
+    build_cube_tables,
+    sum_counts,
+    summarise_cube_tables,
+)
+from .config import MELBVIZ_PARTITIONED_DATA_PATH
+from .utils import (
+    COUNTS_CSV_DTYPES,
+    DEFAULT_CHUNKSIZE,
+    PARTITION_COLUMNS,
+    clean_pedestrian_df,
+    cube_table_path,
+    load_sensor_locations,
+    make_sensor_table,
+    read_sensor_table,
+    remove_path,
+    sensor_table_path,
+    write_cube_tables,
+    write_parquet,
+    write_pedestrian_chunks,
+)
+
+
+# records the signature of each partition of the CSV a dataset was built from
+MANIFEST_FILENAME = "_melbviz_manifest.json"
+
+# changes to the counts CSV are detected at this granularity
+SIGNATURE_KEYS = ["Year", "Month", "Sensor_ID"]
+
+# the columns of the counts CSV whose contents are hashed
+HASHED_COLUMNS = [
+    "Year",
+    "Month",
+    "Mdate",
+    "Time",
+    "Sensor_ID",
+    "Sensor_Name",
+    "Hourly_Counts",
+]
+
+# columns of the counts CSV that are made categoricals while its rows are spilled
+SPILLED_CATEGORIES = ["Month", "Day", "Sensor_Name"]
+
+
+def scan_counts_csv(counts_csv_path, spill_dir, chunksize=DEFAULT_CHUNKSIZE):
+    """Read the counts CSV once, getting its signatures and spilling its rows
+
+    The CSV is read in chunks, and the row count and content hash of each Year,
+    Month and Sensor_ID are summed over them. The hash of each group is the sum
+    (modulo 2**64) of the hashes of its rows, so it doesn't depend on the order
+    of rows in the CSV. Each chunk is also saved to a file in `spill_dir`, so
+    that the rows of changed partitions can be read back by
+    `iter_spilled_chunks` without parsing the CSV again.
+
+    Returns a DataFrame of the signatures, indexed by `SIGNATURE_KEYS` with
+    "rows" and "hash" columns, the list of spill files, and the CSV's columns.
+    """
+    columns = list(pd.read_csv(counts_csv_path, nrows=0).columns)
+    signatures = []
+    spill_paths = []
+    reader = pd.read_csv(
+        counts_csv_path,
+        dtype=COUNTS_CSV_DTYPES,
+        # cleaning rebuilds Date_Time, so its strings needn't be parsed
+        usecols=[col for col in columns if col != "Date_Time"],
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            row_hashes = pd.util.hash_pandas_object(chunk[HASHED_COLUMNS], index=False)
+            chunk_signatures = (
+                chunk[SIGNATURE_KEYS]
+                .assign(rows=1, hash=row_hashes.values)
+                .groupby(SIGNATURE_KEYS)
+                .sum()
+            )
+            signatures.append(chunk_signatures)
+            # categoricals are much quicker to save and load than strings
+            chunk = chunk.astype({col: "category" for col in SPILLED_CATEGORIES})
+            spill_path = Path(spill_dir) / f"chunk-{len(spill_paths)}.pkl"
+            chunk.to_pickle(spill_path)
+            spill_paths.append(spill_path)
+    signatures = pd.concat(signatures).groupby(level=SIGNATURE_KEYS).sum()
+    return signatures, spill_paths, columns
+
+
+def iter_spilled_chunks(spill_paths, columns, partitions=None):
+    """Read back spilled chunks of the counts CSV and clean them
+
+    Only rows in the given (Year, Month) `partitions` are kept, unless
+    `partitions` is None. `columns` are those of the CSV, which the chunks are
+    given again, including the Date_Time column that cleaning rebuilds, so that
+    they're written with the same schema as chunks read from it. Yields a cleaned DataFrame for each chunk with any rows left,
+    sorted by Date_Time within that chunk only.
+    """
+    for spill_path in spill_paths:
+        chunk = pd.read_pickle(spill_path)
+        if partitions is not None:
+            in_partitions = pd.MultiIndex.from_frame(chunk[PARTITION_COLUMNS]).isin(
+                partitions
+            )
+            chunk = chunk[in_partitions]
+        if len(chunk) == 0:
+            continue
+        chunk = chunk.astype(
+            {col: COUNTS_CSV_DTYPES[col] for col in SPILLED_CATEGORIES}
+        )
+        df = clean_pedestrian_df(chunk.reindex(columns=columns).set_index("ID"))
+        yield df.sort_values("Date_Time")
+
+
+def changed_partitions(old_signatures, new_signatures):
+    """Get the sorted (Year, Month) partitions whose signatures differ
+
+    A partition has changed if any of its sensors were added, removed, or have
+    a different row count or hash.
+    """
+    joined = old_signatures.join(
+        new_signatures, how="outer", lsuffix="_old", rsuffix="_new"
+    )
+    changed = (joined["rows_old"] != joined["rows_new"]) | (
+        joined["hash_old"] != joined["hash_new"]
+    )
+    keys = joined[changed].reset_index()[PARTITION_COLUMNS].drop_duplicates()
+    return sorted(keys.itertuples(index=False, name=None))
+
+
+def file_hash(path):
+    """SHA-256 hex digest of a file's contents, or None if there's no file"""
+    if path is None:
+        return None
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def load_manifest(path):
+    """Load the manifest of a partitioned dataset, or None if it has none"""
+    manifest_path = Path(path) / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text())
+    signatures = pd.DataFrame(
+        manifest["partitions"], columns=[*SIGNATURE_KEYS, "rows", "hash"]
+    )
+    signatures["hash"] = signatures["hash"].map(int).astype("uint64")
+    manifest["partitions"] = signatures.set_index(SIGNATURE_KEYS)
+    return manifest
+
+
+def save_manifest(path, signatures, sensor_hash=None):
+    """Save the signatures of a partitioned dataset's source into its directory"""
+    partitions = [
+        [int(year), month, int(sensor_id), int(rows), str(hash_val)]
+        for (year, month, sensor_id), rows, hash_val in zip(
+            signatures.index, signatures["rows"], signatures["hash"]
+        )
+    ]
+    manifest = {"sensor_locations": sensor_hash, "partitions": partitions}
+    Path(path).mkdir(parents=True, exist_ok=True)
+    (Path(path) / MANIFEST_FILENAME).write_text(json.dumps(manifest))
+
+
+def refresh_partitioned_parquet(
+    counts_csv_path,
+    path=MELBVIZ_PARTITIONED_DATA_PATH,
+    sensor_csv_path=None,
+    chunksize=DEFAULT_CHUNKSIZE,
+):
+    """Bring a Year/Month partitioned Parquet dataset up to date with the CSV
+
+    Only partitions of the counts CSV whose signatures differ from those
+    recorded when the dataset was last written are cleaned and rewritten. The
+    whole dataset is rebuilt if it has no manifest, or if the sensor locations
+    CSV has changed. The CSV is only parsed once, with its rows spilled to a
+    temporary directory next to `path` until the changed partitions are known
+    (see `scan_counts_csv`). Returns the list of (Year, Month) partitions
+    written.
+    """
+    path = Path(path)
+    sensor_hash = file_hash(sensor_csv_path)
+    manifest = load_manifest(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(
+        prefix=f"{path.name}_spill_", dir=path.parent
+    ) as spill_dir:
+        signatures, spill_paths, columns = scan_counts_csv(
+            counts_csv_path, spill_dir, chunksize=chunksize
+        )
+        if manifest is None or manifest["sensor_locations"] != sensor_hash:
+            write_pedestrian_chunks(
+                iter_spilled_chunks(spill_paths, columns),
+                path,
+                sensor_csv_path=sensor_csv_path,
+                partition_cols=PARTITION_COLUMNS,
+            )
+            partitions = changed_partitions(signatures.iloc[:0], signatures)
+        else:
+            partitions = changed_partitions(manifest["partitions"], signatures)
+            if len(partitions) > 0:
+                rewrite_partitions(
+                    iter_spilled_chunks(spill_paths, columns, partitions),
+                    path,
+                    partitions,
+                    sensor_csv_path,
+                )
+    save_manifest(path, signatures, sensor_hash)
+    return partitions
+
+
+def rewrite_partitions(chunks, path, partitions, sensor_csv_path=None):
+    """Replace (Year, Month) partitions of a dataset with new rows
+
+    `chunks` are cleaned DataFrames of all the rows in the given partitions,
+    which are written one at a time, as by `iter_spilled_chunks`. Any sensors
+    in them that are new are added to the sensor table, and the saved count
+    cube is updated to match.
+    """
+    path = Path(path)
+    for year, month in partitions:
+        remove_path(path / f"Year={year}" / f"Month={month}")
+    # the dataset's metadata must only refer to the partitions that remain
+    remaining_files = sorted(str(file) for file in path.glob("*=*/*=*/*.parquet"))
+    if len(remaining_files) > 0:
+        writer.merge(remaining_files, root=str(path))
+    else:
+        remove_path(path)
+    sensor_tables = []
+    hourly_tables = []
+    for df in chunks:
+        write_parquet(df, path, partition_cols=PARTITION_COLUMNS, append=path.exists())
+        sensor_tables.append(make_sensor_table(df))
+        hourly_tables.append(build_cube_tables(df)["hourly"])
+    if len(sensor_tables) > 0:
+        old_sensor_table = read_sensor_table(path)
+        if old_sensor_table is not None:
+            sensor_tables.append(old_sensor_table[["Sensor_ID", "Sensor_Name"]])
+        geo_df = None
+        if sensor_csv_path is not None:
+            geo_df = load_sensor_locations(sensor_csv_path)
+        sensor_table = make_sensor_table(pd.concat(sensor_tables), geo_df)
+        write_parquet(sensor_table, sensor_table_path(path))
+    update_cube_tables(path, partitions, hourly_tables)
+
+
+def update_cube_tables(path, partitions, hourly_tables=()):
+    """Replace (Year, Month) partitions of the count cube saved alongside a dataset
+
+    Rows of the cube's hourly level in the partitions are replaced with those of
+    `hourly_tables`, the hourly cube tables of the cleaned rows of the
+    partitions, then the coarser levels are summarised from it again. Does
+    nothing if there's no saved cube.
+    """
+    hourly_path = cube_table_path(path, "hourly")
+    if not hourly_path.exists():
+        return
+    hourly = pd.read_parquet(hourly_path, engine="fastparquet")
+    in_partitions = pd.MultiIndex.from_frame(hourly[PARTITION_COLUMNS]).isin(partitions)
+    hourly = sum_counts(
+        pd.concat([hourly[~in_partitions], *hourly_tables]), CUBE_LEVELS["hourly"]
+    )
+    write_cube_tables(summarise_cube_tables(hourly), path)
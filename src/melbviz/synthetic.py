@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .config import MELBVIZ_COUNTS_CSV_PATH, MELBVIZ_SENSOR_CSV_PATH
+
+
+# relative traffic in each hour of the day, with morning, lunch and evening peaks
+HOURLY_PROFILE = np.array(
+    [0.10, 0.06, 0.04, 0.03, 0.03, 0.06, 0.20, 0.55, 0.95, 0.70, 0.60, 0.70]
+    + [0.95, 0.90, 0.70, 0.70, 0.80, 1.00, 0.75, 0.55, 0.45, 0.35, 0.25, 0.15]
+)
+
+# relative traffic on each day of the week, starting from Monday
+DAILY_PROFILE = np.array([1.0, 1.0, 1.0, 1.05, 1.15, 0.85, 0.7])
+
+# coordinates that synthetic sensors are scattered around (Melbourne's CBD)
+CENTRE_LATITUDE = -37.8136
+CENTRE_LONGITUDE = 144.9631
+
+# format of the Date_Time column in the counts CSV
+DATE_TIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+def sensor_names(n_sensors):
+    return [
+        f"Synthetic Sensor {sensor_id:03d}" for sensor_id in range(1, n_sensors + 1)
+    ]
+
+
+def make_sensor_locations(n_sensors=10, seed=0):
+    """Make a DataFrame in the schema of the sensor locations CSV"""
+    rng = np.random.default_rng(seed)
+    sensor_ids = np.arange(1, n_sensors + 1)
+    return pd.DataFrame(
+        {
+            "Location_ID": sensor_ids,
+            "Sensor_Description": sensor_names(n_sensors),
+            "Sensor_Name": [f"SYN{sensor_id:03d}_T" for sensor_id in sensor_ids],
+            "Installation_Date": "2009/05/01",
+            "Status": "A",
+            "Latitude": CENTRE_LATITUDE + rng.normal(0, 0.005, n_sensors),
+            "Longitude": CENTRE_LONGITUDE + rng.normal(0, 0.005, n_sensors),
+        }
+    )
+
+
+def make_pedestrian_counts(n_sensors=10, years=(2021, 2022), seed=0, shuffle=True):
+    """Make a DataFrame in the schema of the pedestrian counts CSV
+
+    There's a row for every hour of every year in `years` for each sensor.
+    Counts follow daily and weekly cycles, scaled by a random level of traffic
+    for each sensor, with Poisson noise. Rows are shuffled unless `shuffle` is
+    False, as the rows of the real CSV aren't in date order.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(f"{min(years)}-01-01", f"{max(years)}-12-31 23:00", freq="h")
+    times = times[times.year.isin(years)]
+    sensor_ids = np.arange(1, n_sensors + 1)
+    sensor_levels = rng.lognormal(mean=6, sigma=0.8, size=n_sensors)
+    shape = HOURLY_PROFILE[times.hour] * DAILY_PROFILE[times.dayofweek]
+    counts = rng.poisson(np.outer(sensor_levels, shape)).ravel()
+    df = pd.DataFrame(
+        {
+            "ID": np.arange(len(counts)),
+            "Date_Time": np.tile(times.strftime(DATE_TIME_FORMAT), n_sensors),
+            "Year": np.tile(times.year, n_sensors),
+            "Month": np.tile(times.month_name(), n_sensors),
+            "Mdate": np.tile(times.day, n_sensors),
+            "Day": np.tile(times.day_name(), n_sensors),
+            "Time": np.tile(times.hour, n_sensors),
+            "Sensor_ID": np.repeat(sensor_ids, len(times)),
+            "Sensor_Name": np.repeat(sensor_names(n_sensors), len(times)),
+            "Hourly_Counts": counts,
+        }
+    )
+    if shuffle:
+        df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+    return df
+
+
+def write_synthetic_data(directory, n_sensors=10, years=(2021, 2022), seed=0):
+    """Write synthetic counts and sensor locations CSVs into a directory
+
+    The CSVs have the same file names as the real data, so `directory` can be
+    used as `MELBVIZ_DATA_PATH`. Returns the paths of the counts and sensor
+    locations CSVs.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    counts_csv_path = directory / MELBVIZ_COUNTS_CSV_PATH.name
+    sensor_csv_path = directory / MELBVIZ_SENSOR_CSV_PATH.name
+    make_pedestrian_counts(n_sensors, years, seed=seed).to_csv(
+        counts_csv_path, index=False
+    )
+    make_sensor_locations(n_sensors, seed=seed).to_csv(sensor_csv_path, index=False)
+    return counts_csv_path, sensor_csv_path
@@ -1,61 +1,528 @@
 import calendar
 import collections
 import functools
+import hashlib
 import numbers
+from pathlib import Path
+import shutil
 
+import numpy as np
 import pandas as pd
 
+from .aggregate import build_cube_tables, combine_cube_tables
 
-def load_and_clean_pedestrian_data(counts_csv_path, sensor_csv_path=None):
-    df = pd.read_csv(counts_csv_path).set_index("ID")
+
+MONTHS = list(calendar.month_name)[1:]
+
+MONTH_NUMBERS = {month: num for num, month in enumerate(MONTHS, start=1)}
+
+DAYS = list(calendar.day_name)
+
+# the same numbering as `Series.dt.weekday`, with Monday as 0
+DAY_NUMBERS = {day: num for num, day in enumerate(DAYS)}
+
+# leap year that `datetime_flat_year` puts every date in, so 29 February fits
+FLAT_YEAR = 2000
+
+# columns whose information is already captured by Date_Time or Sensor_ID
+REDUNDANT_COLUMNS = ["Mdate", "Time", "Location_ID"]
+
+# columns of the sensor locations CSV kept in the sensor table, if present
+SENSOR_LOCATION_COLUMNS = ["Location_ID", "Status", "Latitude", "Longitude"]
+
+# columns describing a sensor, which are kept in the sensor table rather than
+# repeated on every row of counts
+SENSOR_COLUMNS = ["Status", "Latitude", "Longitude"]
+
+
+# number of rows of the counts CSV read at a time when streaming it
+DEFAULT_CHUNKSIZE = 500_000
+
+# columns a partitioned Parquet dataset is split on, from outermost directory
+PARTITION_COLUMNS = ["Year", "Month"]
+
+# dtypes for the counts CSV, so that every chunk of it is read with the same
+# schema
+COUNTS_CSV_DTYPES = {
+    "ID": "int64",
+    "Year": "int64",
+    "Month": "object",
+    "Mdate": "int64",
+    "Day": "object",
+    "Time": "int64",
+    "Sensor_ID": "int64",
+    "Sensor_Name": "object",
+    "Hourly_Counts": "int64",
+}
+
+
+def load_and_clean_pedestrian_data(counts_csv_path, compact=False):
+    df = pd.read_csv(counts_csv_path, dtype=COUNTS_CSV_DTYPES).set_index("ID")
+    df = clean_pedestrian_df(df)
+    df = df.sort_values("Date_Time")
+    if compact:
+        df = compact_pedestrian_df(df)
+    return df
+
+
+def load_sensor_locations(sensor_csv_path):
+    """Load the coordinates and status of each sensor, keyed by Sensor_ID"""
+    geo_df = pd.read_csv(
+        sensor_csv_path, usecols=lambda col: col in SENSOR_LOCATION_COLUMNS
+    )
+    return geo_df.rename(columns={"Location_ID": "Sensor_ID"})
+
+
+def make_sensor_table(df, geo_df=None):
+    """Make the sensor table for a DataFrame of pedestrian counts
+
+    The table has a row for each Sensor_ID and Sensor_Name pair in `df`. If a
+    DataFrame of sensor locations is provided (see `load_sensor_locations`),
+    its columns are joined on Sensor_ID.
+    """
+    sensor_table = df[["Sensor_ID", "Sensor_Name"]].drop_duplicates()
+    if geo_df is not None:
+        sensor_table = sensor_table.merge(geo_df, on="Sensor_ID", how="left")
+    return sensor_table.sort_values("Sensor_ID", ignore_index=True)
+
+
+def split_sensor_table(df):
+    """Move the sensor columns of a DataFrame of counts into a sensor table
+
+    For data cleaned before sensor tables existed, which has the coordinates
+    of each sensor on every row. Returns the DataFrame without those columns
+    and the sensor table.
+    """
+    sensor_cols = [col for col in SENSOR_COLUMNS if col in df.columns]
+    sensor_table = (
+        df[["Sensor_ID", "Sensor_Name", *sensor_cols]]
+        .drop_duplicates(["Sensor_ID", "Sensor_Name"])
+        .sort_values("Sensor_ID", ignore_index=True)
+    )
+    return df.drop(columns=sensor_cols), sensor_table
+
+
+def sensor_table_path(path):
+    """Path of the sensor table saved alongside a data file or directory
+
+    This is named after the whole file name, including its extension, so that
+    Parquet and Arrow files of the same name each have their own.
+    """
+    path = Path(path)
+    return path.with_name(f"{path.name}_sensors.parquet")
+
+
+def cube_table_path(path, level):
+    """Path of a level of the count cube saved alongside a data file or directory
+
+    As for `sensor_table_path`, this is named after the whole file name.
+    """
+    path = Path(path)
+    return path.with_name(f"{path.name}_{level}_counts.parquet")
+
+
+def index_path(path):
+    """Path of the filter index saved alongside an Arrow file
+
+    As for `sensor_table_path`, this is named after the whole file name.
+    """
+    path = Path(path)
+    return path.with_name(f"{path.name}_index.arrow")
+
+
+def write_cube_tables(tables, path):
+    """Save the levels of a count cube alongside a data file or directory"""
+    for level, table in tables.items():
+        write_parquet(table, cube_table_path(path, level))
+
+
+def read_sensor_table(path):
+    """Read the sensor table saved alongside a data file, or None if there's none"""
+    table_path = sensor_table_path(path)
+    if not table_path.exists():
+        return None
+    return pd.read_parquet(table_path, engine="fastparquet")
+
+
+def clean_pedestrian_df(df):
+    """Clean a DataFrame of raw pedestrian counts
+
+    Rows are not sorted.
+    """
     # Date_Time field previously had incorrect time so we reconstruct it from
     # other fields.
-    # TODO: switch to loading as datetime by providing a parsing template
-    df["Date_Time"] = pd.to_datetime(
-        {
-            "day": df["Mdate"],
-            "year": df["Year"],
-            "hour": df["Time"],
-            "month": pd.to_datetime(df["Month"], format="%B").dt.month,
-        }
+    month_codes, month_names = pd.factorize(df["Month"])
+    months = np.array([MONTH_NUMBERS[name] for name in month_names])[month_codes]
+    df["Date_Time"] = make_datetimes(df["Year"], months, df["Mdate"], df["Time"])
+    # all dates moved into the same year, for overlaying traffic across years
+    df["datetime_flat_year"] = make_datetimes(
+        FLAT_YEAR, months, df["Mdate"], df["Time"]
+    )
+    return df
+
+
+def make_datetimes(year, month, day, hour):
+    """Build an array of datetime64 values from integer date components
+
+    This uses integer arithmetic on NumPy datetime units rather than parsing,
+    with `month` and `day` counting from 1. Each component can be a scalar or
+    an array.
+    """
+    year = np.asarray(year, dtype="int64")
+    month = np.asarray(month, dtype="int64")
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + (np.asarray(day, dtype="int64") - 1)
+    hours = days.astype("datetime64[h]") + np.asarray(hour, dtype="int64")
+    return hours.astype("datetime64[ns]")
+
+
+def iter_clean_pedestrian_chunks(counts_csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Read and clean the pedestrian counts CSV in chunks of `chunksize` rows
+
+    Yields a cleaned DataFrame for each chunk, sorted by Date_Time within that
+    chunk only.
+    """
+    reader = pd.read_csv(counts_csv_path, dtype=COUNTS_CSV_DTYPES, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            df = clean_pedestrian_df(chunk.set_index("ID"))
+            yield df.sort_values("Date_Time")
+
+
+def stream_pedestrian_data_to_parquet(
+    counts_csv_path,
+    path,
+    sensor_csv_path=None,
+    chunksize=DEFAULT_CHUNKSIZE,
+    partition_cols=None,
+):
+    """Clean the pedestrian counts CSV and write it to Parquet chunk by chunk
+
+    Each chunk is written as one or more row groups appended to the Parquet
+    file, so peak memory depends on `chunksize` rather than the size of the
+    CSV. If `partition_cols` is provided, a directory of Parquet files
+    partitioned on those columns is written instead. Any existing data at `path`
+    is replaced. The sensor table, with the sensor locations if a CSV of them
+    is provided, is written to `sensor_table_path(path)`, and each level of the
+    count cube to `cube_table_path(path, level)`. Returns the number of rows
+    written.
+    """
+    return write_pedestrian_chunks(
+        iter_clean_pedestrian_chunks(counts_csv_path, chunksize),
+        path,
+        sensor_csv_path=sensor_csv_path,
+        partition_cols=partition_cols,
     )
+
+
+def write_pedestrian_chunks(chunks, path, sensor_csv_path=None, partition_cols=None):
+    """Write cleaned chunks of pedestrian counts to Parquet, one at a time
+
+    The data, sensor table and count cube are written as for
+    `stream_pedestrian_data_to_parquet`, which reads the chunks from the counts
+    CSV. Returns the number of rows written.
+    """
+    path = Path(path)
+    remove_path(path)
+    n_rows = 0
+    sensor_tables = []
+    cube_tables = []
+    for df in chunks:
+        write_parquet(df, path, partition_cols=partition_cols, append=path.exists())
+        sensor_tables.append(make_sensor_table(df))
+        cube_tables.append(build_cube_tables(df))
+        n_rows += len(df)
+    geo_df = None
     if sensor_csv_path is not None:
-        geo_df = pd.read_csv(
-            sensor_csv_path, usecols=["Location_ID", "Latitude", "Longitude"]
-        )
-        df = df.merge(geo_df, left_on="Sensor_ID", right_on="Location_ID")
-    df = df.sort_values("Date_Time")
+        geo_df = load_sensor_locations(sensor_csv_path)
+    if len(sensor_tables) > 0:
+        sensor_table = make_sensor_table(pd.concat(sensor_tables), geo_df)
+        write_parquet(sensor_table, sensor_table_path(path))
+        write_cube_tables(combine_cube_tables(cube_tables), path)
+    return n_rows
+
+
+def write_parquet(df, path, partition_cols=None, append=False):
+    """Write a DataFrame to Parquet using standardised config"""
+    df.to_parquet(
+        path,
+        engine="fastparquet",
+        compression="gzip",
+        partition_cols=partition_cols,
+        append=append,
+    )
+
+
+def read_parquet(path, year=None, month=None, sensor=None, columns=None):
+    """Read a cleaned pedestrian counts DataFrame from Parquet
+
+    The filters {year, month, sensor} have the same meaning as in
+    `filter_pedestrian_df`. For a dataset partitioned on the filtered columns,
+    only matching partitions are read. Otherwise, row groups whose statistics
+    rule out any matches are skipped. If `columns` is provided, only those
+    columns (along with any filtered on) are read.
+    """
+    params = {"Year": year, "Month": month, "Sensor_Name": sensor}
+    filters = [
+        (col, "in", filter_values(val))
+        for col, val in params.items()
+        if filter_values(val) is not None
+    ]
+    if columns is not None:
+        columns = list(columns)
+        columns += [col for col, _op, _vals in filters if col not in columns]
+    df = pd.read_parquet(
+        path, engine="fastparquet", columns=columns, filters=filters or None
+    )
+    # partition columns are read back as categoricals of the directory names
+    if "Year" in df.columns and isinstance(df["Year"].dtype, pd.CategoricalDtype):
+        df["Year"] = df["Year"].astype(df["Year"].cat.categories.dtype)
+    if "Month" in df.columns and isinstance(df["Month"].dtype, pd.CategoricalDtype):
+        if not df["Month"].cat.ordered:
+            df["Month"] = df["Month"].astype("object")
+    # filters only skip whole partitions and row groups, so rows still need to be
+    # filtered
+    if filters:
+        df = filter_pedestrian_df(df, year=year, month=month, sensor=sensor)
     return df
 
 
-def filter_pedestrian_df(df, year=None, month=None, sensor=None, debug=False):
+def write_arrow(df, path):
+    """Write a DataFrame to disk as an uncompressed Arrow IPC (Feather v2) file
+
+    The file is left uncompressed so that it can be memory-mapped by
+    `read_arrow`.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_arrow(path, memory_map=True):
+    """Read a DataFrame from an Arrow IPC file, memory-mapping it by default
+
+    When memory-mapped, numeric, datetime and categorical code columns are
+    views onto the operating system's page cache rather than copies, so any
+    number of processes can share one copy of the data. These columns are
+    read-only. String columns can't be shared this way, so should be converted
+    to categoricals (see `compact_pedestrian_df`) before writing.
+    """
+    import pyarrow as pa
+
+    # the mapping stays open for as long as the DataFrame references it
+    source = pa.memory_map(str(path)) if memory_map else pa.OSFile(str(path))
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def data_version(path):
+    """Get a string identifying the version of a data file or directory
+
+    This is based on the size and modification time of the file, or of all the
+    files in a directory, so changes whenever the data is rewritten.
+    """
+    path = Path(path)
+    files = sorted(path.rglob("*")) if path.is_dir() else [path]
+    stats = [(file.stat().st_size, file.stat().st_mtime_ns) for file in files]
+    return hashlib.sha256(repr(stats).encode()).hexdigest()[:16]
+
+
+def remove_path(path):
+    """Remove a file or directory tree if it exists"""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+
+def compact_pedestrian_df(df):
+    """Convert a cleaned pedestrian counts DataFrame to a compact schema
+
+    Sensor names, months and days become categoricals (with months and days
+    ordered by the calendar), integer columns are downcast to the smallest
+    type that fits their values, coordinates become 32-bit floats, and columns
+    that are redundant with Date_Time or Sensor_ID are dropped.
+    """
+    df = df.drop(columns=[col for col in REDUNDANT_COLUMNS if col in df.columns])
+    df = df.reset_index(drop=True)
+    if "Sensor_Name" in df.columns:
+        df["Sensor_Name"] = df["Sensor_Name"].astype("category")
+    if "Month" in df.columns:
+        df["Month"] = pd.Categorical(df["Month"], categories=MONTHS, ordered=True)
+    if "Day" in df.columns:
+        df["Day"] = pd.Categorical(df["Day"], categories=DAYS, ordered=True)
+    for col in ("Year", "Sensor_ID", "Hourly_Counts"):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    for col in ("Latitude", "Longitude"):
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def memory_report(df):
+    """Get a DataFrame reporting the memory used by each column of a DataFrame
+
+    The report has the dtype, total bytes and bytes per row of each column,
+    along with a final "Total" row for the whole DataFrame (including index).
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame(
+        {
+            "dtype": [str(df.index.dtype), *(str(dt) for dt in df.dtypes)],
+            "bytes": usage.values,
+        },
+        index=usage.index,
+    )
+    report.loc["Total"] = ["", usage.sum()]
+    report["bytes_per_row"] = report["bytes"] / max(len(df), 1)
+    return report
+
+
+def filter_pedestrian_df(
+    df,
+    year=None,
+    month=None,
+    sensor=None,
+    start=None,
+    end=None,
+    weekday=None,
+    hour=None,
+    index=None,
+    debug=False,
+):
     """Filter a pedestrian counts DataFrame
 
-    All params {year, month, sensor} take a value or sequence of values
-    filtering the input DataFrame to only rows that matches those values. (A
-    sequence filters to rows with fields matching *any* value in the sequence)
+    All params {year, month, sensor, weekday, hour} take a value or sequence of
+    values filtering the input DataFrame to only rows that matches those
+    values. (A sequence filters to rows with fields matching *any* value in the
+    sequence) Weekdays are given by name or number, with Monday as 0, and hours
+    of the day from 0 to 23.
+
+    `start` and `end` are datetimes (or strings) which select rows with a
+    Date_Time from `start` up to but not including `end`. If the DataFrame is
+    sorted by Date_Time, as cleaned DataFrames are, these rows are found by
+    binary search. Weekdays and hours are matched against the Day and Time
+    columns if the DataFrame has them (the compact schema only keeps Day), or
+    else worked out from Date_Time as small integer codes (see `TimeIndex`).
+
+    If a `FilterIndex` built from `df` is supplied as `index`, it's used to find
+    the matching rows, which are then taken from `df` in a single copy. If only
+    `start` and `end` are given, they're a slice of `df` and aren't copied.
     """
     params = {"Year": year, "Sensor_Name": sensor, "Month": month}
     if debug:
-        print(f"Filter params: {params}")
+        print(
+            f"Filter params: {params}, start: {start}, end: {end},"
+            f" weekday: {weekday}, hour: {hour}"
+        )
+    if index is not None:
+        positions = index.lookup(
+            year=filter_values(year),
+            month=filter_values(month),
+            sensor=filter_values(sensor),
+            start=as_timestamp(start),
+            end=as_timestamp(end),
+            weekday=weekday_numbers(weekday),
+            hour=filter_values(hour),
+        )
+        if positions is None:
+            return df
+        if isinstance(positions, slice):
+            return df.iloc[positions]
+        return df.take(positions)
+    if start is not None or end is not None:
+        df = df.iloc[date_range_positions(df["Date_Time"], start, end)]
     for param, param_val in params.items():
+        param_val = filter_values(param_val)
         if param_val is None:
             continue
-        elif is_value(param_val):
-            param_val = [param_val]
-        elif isinstance(param_val, collections.abc.Iterable):
-            param_val = list(param_val)
-        else:
-            raise Exception(
-                f"Invalid value {param_val}, params must be str, numeric, or"
-                " an iterable"
-            )
-        if len(param_val) == 0:
-            continue
         df = df[df[param].isin(set(param_val))]
+    # the stored day and hour of each row are used if there are columns of them
+    weekday = weekday_numbers(weekday)
+    if weekday is not None and "Day" in df.columns:
+        df = df[df["Day"].isin([DAYS[num] for num in weekday])]
+        weekday = None
+    hour = filter_values(hour)
+    if hour is not None and "Time" in df.columns:
+        df = df[df["Time"].isin(hour)]
+        hour = None
+    if weekday is not None or hour is not None:
+        # imported here as the index module depends on this one
+        from .index import TimeIndex
+
+        positions = TimeIndex(df["Date_Time"]).restrict(
+            None, weekday=weekday, hour=hour
+        )
+        df = df.take(positions)
     return df
 
 
+def date_range_positions(date_times, start=None, end=None, is_sorted=None):
+    """Positions of datetimes from `start` up to but not including `end`
+
+    `date_times` is a Series or array of datetimes. If it's sorted, which is
+    checked unless `is_sorted` is given, the positions are found by binary
+    search and returned as a slice, otherwise they're an array of positions.
+    """
+    start, end = as_timestamp(start), as_timestamp(end)
+    values = np.asarray(date_times)
+    if is_sorted is None:
+        is_sorted = bool(pd.Index(values).is_monotonic_increasing)
+    if not is_sorted:
+        mask = np.ones(len(values), dtype=bool)
+        if start is not None:
+            mask &= values >= start.to_datetime64()
+        if end is not None:
+            mask &= values < end.to_datetime64()
+        return np.flatnonzero(mask)
+    first = 0 if start is None else int(values.searchsorted(start.to_datetime64()))
+    stop = len(values) if end is None else int(values.searchsorted(end.to_datetime64()))
+    return slice(first, max(first, stop))
+
+
+def as_timestamp(value):
+    """Convert a datetime, or a string of one, to a Timestamp, keeping None"""
+    return None if value is None else pd.Timestamp(value)
+
+
+def weekday_numbers(param_val):
+    """Normalise a weekday filter to a list of numbers, with Monday as 0
+
+    Weekdays can be given by name or number. Returns None if the parameter does
+    not filter anything.
+    """
+    values = filter_values(param_val)
+    if values is None:
+        return None
+    return [DAY_NUMBERS[value] if isinstance(value, str) else value for value in values]
+
+
+def filter_values(param_val):
+    """Normalise a filter parameter to a list of values
+
+    Returns None if the parameter does not filter anything, ie if it's None or
+    an empty sequence.
+    """
+    if param_val is None:
+        return None
+    elif is_value(param_val):
+        param_val = [param_val]
+    elif isinstance(param_val, collections.abc.Iterable):
+        param_val = list(param_val)
+    else:
+        raise Exception(
+            f"Invalid value {param_val}, params must be str, numeric, or an iterable"
+        )
+    if len(param_val) == 0:
+        return None
+    return param_val
+
+
 def display_output(func):
     """Decorator for displaying the result of a function in Jupyter"""
 
@@ -70,8 +537,7 @@ def display_output(func):
 
 def sort_months(months):
     """Sort a sequence of months by their calendar order"""
-    month_ref = list(calendar.month_name)[1:]
-    return sorted(months, key=lambda month: month_ref.index(month))
+    return sorted(months, key=lambda month: MONTHS.index(month))
 
 
 def title_with_filters(title, filters=None):
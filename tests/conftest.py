@@ -0,0 +1,16 @@
+import pytest
+
+from melbviz.pedestrian import PedestrianDataset
+from melbviz.synthetic import write_synthetic_data
+
+
+@pytest.fixture(scope="session")
+def synthetic_csvs(tmp_path_factory):
+    """Paths of synthetic counts and sensor locations CSVs"""
+    return write_synthetic_data(tmp_path_factory.mktemp("data"), n_sensors=4)
+
+
+@pytest.fixture(scope="session")
+def synthetic_dataset(synthetic_csvs):
+    """A small dataset of synthetic counts, as loaded from the CSVs"""
+    return PedestrianDataset.load(*synthetic_csvs)
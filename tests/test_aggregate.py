@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from melbviz.aggregate import MAX_RANGE_CODES, sum_counts
+from melbviz.utils import compact_pedestrian_df
+
+
+GROUPINGS = [
+    "Sensor_Name",
+    ["Year", "Month"],
+    ["Year", "Month", "Sensor_Name"],
+    ["Sensor_ID", "Day"],
+    # too many possible groups to count them all
+    ["Date_Time", "datetime_flat_year"],
+]
+
+
+def groupby_sum(df, by, value="Hourly_Counts"):
+    return df.groupby(by, observed=True)[value].sum().reset_index()
+
+
+@pytest.fixture(scope="module")
+def df(synthetic_dataset):
+    return synthetic_dataset.df.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("by", GROUPINGS)
+def test_matches_groupby(df, by):
+    pd.testing.assert_frame_equal(sum_counts(df, by), groupby_sum(df, by))
+
+
+@pytest.mark.parametrize("by", GROUPINGS)
+def test_matches_groupby_of_compact_df(df, by):
+    df = compact_pedestrian_df(df.copy())
+    pd.testing.assert_frame_equal(
+        sum_counts(df, by), groupby_sum(df, by), check_dtype=False
+    )
+
+
+def test_unobserved_and_missing_values_left_out(df):
+    df = df.astype({"Sensor_Name": "category"})
+    df["Sensor_Name"] = df["Sensor_Name"].cat.add_categories(["Unused"])
+    df.loc[df.index[::5], "Sensor_Name"] = None
+    df.loc[df.index[::7], "Month"] = None
+    by = ["Month", "Sensor_Name"]
+    result = sum_counts(df, by)
+    pd.testing.assert_frame_equal(result, groupby_sum(df, by))
+    assert "Unused" not in result["Sensor_Name"].tolist()
+
+
+def test_wide_integer_range_and_float_values():
+    df = pd.DataFrame(
+        {
+            "key": [MAX_RANGE_CODES * 10, 0, -5, 0, MAX_RANGE_CODES * 10],
+            "value": [0.5, 1.25, 2.0, 3.0, 4.0],
+        }
+    )
+    pd.testing.assert_frame_equal(
+        sum_counts(df, "key", value="value"), groupby_sum(df, "key", "value")
+    )
+
+
+def test_empty_df(df):
+    result = sum_counts(df.iloc[:0], ["Year", "Sensor_Name"])
+    assert len(result) == 0
+    assert list(result.columns) == ["Year", "Sensor_Name", "Hourly_Counts"]
+    assert np.issubdtype(result["Hourly_Counts"].dtype, np.integer)
@@ -0,0 +1,137 @@
+from datetime import date
+import threading
+
+import pytest
+
+from melbviz import app as app_module
+from melbviz import metrics
+
+
+INPUT_OUTPUTS = [
+    ("month-input", "options"),
+    ("month-input", "value"),
+    ("sensor-input", "options"),
+    ("sensor-input", "value"),
+    ("date-input", "min_date_allowed"),
+    ("date-input", "max_date_allowed"),
+    ("date-input", "initial_visible_month"),
+    ("date-input", "start_date"),
+    ("date-input", "end_date"),
+]
+
+
+@pytest.fixture
+def client(monkeypatch, synthetic_csvs):
+    dataset = app_module.PedestrianDataset.load(*synthetic_csvs, aggregate=True)
+    monkeypatch.setattr(app_module, "_data", dataset)
+    return app_module.app.server.test_client()
+
+
+def update_inputs(client, year):
+    """Run the update_inputs callback as Dash's front end does"""
+    body = {
+        "output": "..{}..".format(
+            "...".join(f"{id_}.{prop}" for id_, prop in INPUT_OUTPUTS)
+        ),
+        "outputs": [{"id": id_, "property": prop} for id_, prop in INPUT_OUTPUTS],
+        "inputs": [{"id": "year-input", "property": "value", "value": year}],
+        "changedPropIds": ["year-input.value"],
+    }
+    return client.post("/_dash-update-component", json=body)
+
+
+def test_update_inputs_for_year(client):
+    response = update_inputs(client, 2022)
+    assert response.status_code == 200
+    date_input = response.get_json()["response"]["date-input"]
+    assert date_input["min_date_allowed"] == "2022-01-01"
+    assert date_input["max_date_allowed"] == "2022-12-31"
+
+
+def test_update_inputs_without_year(client):
+    response = update_inputs(client, None)
+    assert response.status_code == 200
+    outputs = response.get_json()["response"]
+    data = app_module.get_data()
+    assert [option["value"] for option in outputs["month-input"]["options"]] == (
+        data.months
+    )
+    assert [option["value"] for option in outputs["sensor-input"]["options"]] == (
+        data.sensors
+    )
+    first_day = data.df["Date_Time"].min().date().replace(day=1)
+    assert outputs["date-input"]["min_date_allowed"] == first_day.isoformat()
+    assert outputs["date-input"]["initial_visible_month"] == first_day.isoformat()
+    last_month = data.df["Date_Time"].max()
+    last_day = date(last_month.year, last_month.month, last_month.days_in_month)
+    assert outputs["date-input"]["max_date_allowed"] == last_day.isoformat()
+
+
+def test_ready_probe_starts_loading(monkeypatch, synthetic_dataset):
+    loaded = threading.Event()
+
+    def load_data():
+        loaded.wait(10)
+        return synthetic_dataset
+
+    monkeypatch.setattr(app_module, "_data", None)
+    monkeypatch.setattr(app_module, "_warm_up_thread", None)
+    monkeypatch.setattr(app_module, "load_data", load_data)
+    monkeypatch.setattr(app_module, "warm_caches", lambda: None)
+    client = app_module.app.server.test_client()
+    assert client.get("/ready").status_code == 503
+    thread = app_module._warm_up_thread
+    assert thread.is_alive()
+    # later probes don't start loading again
+    assert client.get("/ready").status_code == 503
+    assert app_module._warm_up_thread is thread
+    loaded.set()
+    thread.join(10)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.get_json()["version"] == synthetic_dataset.version
+
+
+def test_request_labels_are_bounded(client):
+    assert client.post("/page/1", json=[1, 2]).status_code != 500
+    assert client.get("/page/2").status_code == 200
+    update_inputs(client, 2022)
+    labels = [dict(key) for key in metrics.request_duration._series]
+    assert {"path": "/<path:path>", "output": ""} in labels
+    assert {"path": "other", "output": ""} in labels
+    assert {
+        "path": "/_dash-update-component",
+        "output": "..{}..".format(
+            "...".join(f"{id_}.{prop}" for id_, prop in INPUT_OUTPUTS)
+        ),
+    } in labels
+    assert not any(label["path"].startswith("/page") for label in labels)
+    # made-up outputs aren't used as labels
+    with app_module.app.server.test_request_context(
+        "/_dash-update-component", method="POST", json={"output": "made-up.figure"}
+    ):
+        assert app_module.request_labels() == {
+            "path": "/_dash-update-component",
+            "output": "",
+        }
+
+
+def test_warm_view_caches_year_cube(client, monkeypatch):
+    monkeypatch.setattr(app_module, "MELBVIZ_CLIENTSIDE", True)
+    traffic_views = []
+    monkeypatch.setattr(
+        app_module,
+        "update_sensor_traffic",
+        lambda year, month, *filters: traffic_views.append((year, month)),
+    )
+    data = app_module.get_data()
+    app_module.warm_view(2022)
+    app_module.warm_view(2022, "March")
+    assert traffic_views == [(2022, None), (2022, "March")]
+    cube = app_module._year_cubes[data][2022]
+    assert cube == app_module.clientside.year_cube(data, 2022)
+    assert app_module.update_year_cube(2022, None, None, None, [0, 23]) is cube
+    # cubes filtered by time aren't cached
+    weekends = app_module.update_year_cube(2022, None, None, [5, 6], None)
+    assert weekends["counts"] != cube["counts"]
+    assert list(app_module._year_cubes[data]) == [2022]
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from melbviz.backends import where_clause
+from melbviz.pedestrian import PedestrianDataset
+from melbviz.utils import PARTITION_COLUMNS
+
+
+# the DuckDB backend is optional
+pytest.importorskip("duckdb")
+
+
+FILTER_CHAINS = [
+    [{}],
+    [{"year": 2021}],
+    [{"month": ["March", "November"], "sensor": "Synthetic Sensor 003"}],
+    [{"weekday": ["Sunday", 0], "hour": [6, 18]}],
+    [{"start": "2021-11-15", "end": "2022-02-01", "hour": 12}],
+    [{"year": 2022}, {"month": "July"}, {"weekday": 4}],
+    [{"sensor": ["Synthetic Sensor 001", "No Such Sensor"]}, {"year": 2023}],
+]
+
+
+@pytest.fixture(scope="module", params=[None, PARTITION_COLUMNS])
+def datasets(request, synthetic_dataset, tmp_path_factory):
+    """The same data loaded with each backend, compact or not"""
+    path = tmp_path_factory.mktemp("backends") / "melbviz.parquet"
+    synthetic_dataset.to_parquet(path, partition_cols=request.param)
+    return {
+        (backend, compact): PedestrianDataset.from_parquet(
+            path, compact=compact, backend=backend
+        )
+        for backend in ("pandas", "duckdb")
+        for compact in (False, True)
+    }
+
+
+def chain_filter(dataset, filter_chain):
+    for filters in filter_chain:
+        dataset = dataset.filter(**filters)
+    return dataset
+
+
+def sorted_rows(dataset, columns):
+    return dataset.df[columns].sort_values(
+        ["Date_Time", "Sensor_Name"], ignore_index=True
+    )
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("filter_chain", FILTER_CHAINS)
+def test_duckdb_matches_pandas(datasets, compact, filter_chain):
+    pandas_data = chain_filter(datasets["pandas", compact], filter_chain)
+    duckdb_data = chain_filter(datasets["duckdb", compact], filter_chain)
+    columns = list(pandas_data.df.columns)
+    pd.testing.assert_frame_equal(
+        sorted_rows(duckdb_data, columns),
+        sorted_rows(pandas_data, columns),
+        check_dtype=False,
+        check_categorical=False,
+    )
+    for by in (["Sensor_Name"], ["Year", "Month"]):
+        pd.testing.assert_frame_equal(
+            duckdb_data.counts(by),
+            pandas_data.counts(by),
+            check_dtype=False,
+            check_categorical=False,
+        )
+
+
+def test_where_clause_parameters():
+    assert where_clause([{}, {"year": None, "month": []}]) == ("", [])
+    where, params = where_clause([{"sensor": "O'Brien St", "weekday": "Monday"}])
+    assert where == 'WHERE "Sensor_Name" IN (?) AND isodow("Date_Time") - 1 IN (?)'
+    assert params == ["O'Brien St", 0]
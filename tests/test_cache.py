@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from melbviz.cache import FilterCache, normalise_filters
+
+
+def test_lru_evicts_least_recently_used():
+    cache = FilterCache(max_bytes=3, sizeof=lambda value: 1)
+    for key in "abc":
+        cache.set(key, key)
+    cache.get("a")
+    cache.set("d", "d")
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.stats["evictions"] == 1
+
+
+def test_lfu_evicts_least_frequently_used():
+    cache = FilterCache(max_bytes=3, policy="lfu", sizeof=lambda value: 1)
+    for key in "abc":
+        cache.set(key, key)
+    for key in "aacc":
+        cache.get(key)
+    cache.set("d", "d")
+    assert "b" not in cache
+    # "d" has been used least, so is next, ahead of the older "a"
+    cache.set("e", "e")
+    assert "d" not in cache
+    assert all(key in cache for key in "ace")
+
+
+def test_size_bound():
+    cache = FilterCache(max_bytes=10, sizeof=len)
+    cache.set("a", "x" * 6)
+    cache.set("b", "x" * 6)
+    assert "a" not in cache
+    assert cache.stats["bytes"] == 6
+    # replacing an entry doesn't count its old size
+    cache.set("b", "x" * 10)
+    assert cache.stats["bytes"] == 10
+    cache.set("c", "x" * 11)
+    assert "c" not in cache
+    assert "b" in cache
+
+
+def test_dataframe_size():
+    cache = FilterCache(max_bytes=10_000)
+    df = pd.DataFrame({"Hourly_Counts": range(2000)}, dtype="int64")
+    cache.set("big", df)
+    assert "big" not in cache
+    cache.set("small", df[:1000])
+    assert cache.stats["bytes"] >= 8000
+
+
+def test_get_or_set_counts_hits_and_misses():
+    cache = FilterCache(sizeof=len)
+    calls = []
+    for _ in range(3):
+        cache.get_or_set("key", lambda: calls.append(1) or "value")
+    assert len(calls) == 1
+    assert (cache.stats["hits"], cache.stats["misses"]) == (2, 1)
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        FilterCache(policy="fifo")
+
+
+@pytest.mark.parametrize(
+    "filters, equivalent",
+    [
+        ({"year": 2022}, {"year": [2022]}),
+        ({"sensor": ["b", "a"]}, {"sensor": ("a", "b", "a")}),
+        ({"month": []}, {}),
+        ({"weekday": ["Monday", "Sunday"]}, {"weekday": [6, 0]}),
+        ({"start": "2022-01-01"}, {"start": pd.Timestamp(2022, 1, 1)}),
+        ({"hour": None, "year": None}, {}),
+    ],
+)
+def test_equivalent_filters_have_the_same_key(filters, equivalent):
+    assert normalise_filters(**filters) == normalise_filters(**equivalent)
+
+
+@pytest.mark.parametrize(
+    "filters, different",
+    [
+        ({"year": 2022}, {"year": 2021}),
+        ({"year": 2022}, {"month": 2022}),
+        ({"start": "2022-01-01"}, {"end": "2022-01-01"}),
+        ({"hour": [1]}, {"hour": [1, 2]}),
+    ],
+)
+def test_different_filters_have_different_keys(filters, different):
+    assert normalise_filters(**filters) != normalise_filters(**different)
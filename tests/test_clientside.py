@@ -0,0 +1,57 @@
+import json
+
+import pandas as pd
+import pytest
+
+from melbviz import clientside
+from melbviz.aggregate import sum_counts
+from melbviz.pedestrian import PedestrianDataset
+from melbviz.utils import MONTHS, filter_pedestrian_df
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["plain", "compact"])
+def dataset(request, synthetic_csvs, tmp_path_factory):
+    dataset = PedestrianDataset.load(*synthetic_csvs, aggregate=True)
+    if not request.param:
+        return dataset
+    path = tmp_path_factory.mktemp("clientside") / "melbviz.parquet"
+    dataset.to_parquet(path)
+    return PedestrianDataset.from_parquet(path, compact=True, aggregate=True)
+
+
+def cube_counts(cube):
+    """The counts of a year's cube as a DataFrame, as the browser reads them"""
+    return pd.DataFrame(
+        {
+            "Month": [cube["months"][code] for code in cube["month"]],
+            "Sensor_Name": [cube["sensors"][code] for code in cube["sensor"]],
+            "Hourly_Counts": cube["counts"],
+        }
+    )
+
+
+@pytest.mark.parametrize("filters", [{}, {"weekday": ["Saturday"], "hour": [8, 9]}])
+def test_year_cube_matches_rows(dataset, filters):
+    cube = json.loads(json.dumps(clientside.year_cube(dataset, 2022, **filters)))
+    assert cube["months"] == MONTHS
+    assert cube["sensors"] == sorted(cube["sensors"])
+    rows = filter_pedestrian_df(dataset.df, year=2022, **filters)
+    expected = sum_counts(rows, ["Month", "Sensor_Name"]).astype(
+        {"Month": str, "Sensor_Name": str, "Hourly_Counts": "int64"}
+    )
+    actual = cube_counts(cube)
+    pd.testing.assert_frame_equal(
+        actual.sort_values(["Month", "Sensor_Name"], ignore_index=True),
+        expected.sort_values(["Month", "Sensor_Name"], ignore_index=True),
+    )
+    locations = (
+        dataset.sensor_table.astype({"Sensor_Name": str})
+        .set_index("Sensor_Name")
+        .loc[cube["sensors"]]
+    )
+    assert cube["latitude"] == locations["Latitude"].tolist()
+
+
+def test_year_cube_of_missing_year(dataset):
+    cube = clientside.year_cube(dataset, 1999)
+    assert cube["months"] == cube["sensors"] == cube["counts"] == []
@@ -0,0 +1,116 @@
+import pandas as pd
+import pytest
+
+from melbviz.aggregate import sum_counts
+from melbviz.cube import CountCube
+from melbviz.pedestrian import PedestrianDataset
+from melbviz.utils import filter_pedestrian_df
+
+
+FILTERS = [
+    {},
+    {"year": 2021},
+    {"month": ["March", "January"]},
+    {"year": 2022, "sensor": ["Synthetic Sensor 001", "Synthetic Sensor 003"]},
+    {"sensor": "Synthetic Sensor 002", "month": "December"},
+]
+
+GROUPINGS = [
+    ["Sensor_Name"],
+    ["Year"],
+    ["Month", "Sensor_Name"],
+    ["Year", "Month"],
+]
+
+
+@pytest.fixture(scope="module")
+def df(synthetic_dataset):
+    return synthetic_dataset.df
+
+
+@pytest.fixture(scope="module")
+def cube(df):
+    return CountCube.from_df(df)
+
+
+@pytest.mark.parametrize(
+    "columns, level",
+    [
+        (["Sensor_Name"], "yearly"),
+        (["Year", "Sensor_Name"], "yearly"),
+        (["Month"], "monthly"),
+        (["Sensor_Name", "Hour"], "hourly"),
+        (["Day"], None),
+    ],
+)
+def test_coarsest_level_used(cube, columns, level):
+    assert cube.level_for(columns) == level
+
+
+def test_filtered_cube_only_uses_levels_with_filtered_columns(cube):
+    assert cube.filter(year=2021, sensor="Synthetic Sensor 001").levels == [
+        "yearly",
+        "monthly",
+        "hourly",
+    ]
+    by_month = cube.filter(month="March")
+    assert by_month.levels == ["monthly", "hourly"]
+    assert by_month.level_for(["Year"]) == "monthly"
+    with pytest.raises(ValueError):
+        by_month.table("yearly")
+    # empty filters don't filter anything
+    assert cube.filter(month=[]).levels == cube.levels
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("by", GROUPINGS)
+def test_filtered_counts_match_rows(df, cube, filters, by):
+    expected = sum_counts(filter_pedestrian_df(df, **filters), by)
+    pd.testing.assert_frame_equal(cube.filter(**filters).counts(by), expected)
+
+
+def test_filters_of_filtered_cube_combine(df, cube):
+    filtered = cube.filter(year=2022).filter(month="June")
+    expected = sum_counts(filter_pedestrian_df(df, year=2022, month="June"), "Year")
+    pd.testing.assert_frame_equal(filtered.counts("Year"), expected)
+
+
+def test_counts_cube_cannot_answer(cube):
+    with pytest.raises(ValueError):
+        cube.counts(["Day"])
+
+
+def test_dataset_counts_routed_to_cube(synthetic_csvs):
+    dataset = PedestrianDataset.load(*synthetic_csvs, aggregate=True)
+    filtered = dataset.filter(year=2022, month="May")
+    counts = filtered.counts(["Sensor_Name"])
+    # the filtered rows weren't needed
+    assert filtered._dataframe is None
+    expected = sum_counts(
+        filter_pedestrian_df(dataset.df, year=2022, month="May"), "Sensor_Name"
+    )
+    pd.testing.assert_frame_equal(counts, expected)
+    # the cube can't be filtered by time, so those datasets use their rows
+    by_hour = dataset.filter(year=2022, hour=[8])
+    assert by_hour.cube is None
+    expected = sum_counts(
+        filter_pedestrian_df(dataset.df, year=2022, hour=[8]), "Sensor_Name"
+    )
+    pd.testing.assert_frame_equal(by_hour.counts("Sensor_Name"), expected)
+
+
+def test_saved_levels_loaded_when_used(tmp_path, cube, monkeypatch):
+    path = tmp_path / "melbviz.parquet"
+    cube.to_parquet(path)
+    loaded = CountCube.from_parquet(path)
+    read = []
+    load = loaded._loader
+    monkeypatch.setattr(
+        loaded, "_loader", lambda level: read.append(level) or load(level)
+    )
+    pd.testing.assert_frame_equal(
+        loaded.filter(year=2021).counts("Sensor_Name"),
+        cube.filter(year=2021).counts("Sensor_Name"),
+    )
+    assert read == ["yearly"]
+    assert CountCube.from_parquet(tmp_path / "missing.parquet") is None
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from melbviz.downsample import (
+    downsample_series,
+    downsample_traffic,
+    lttb_indices,
+    minmax_indices,
+)
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    x = np.arange(10_000)
+    y = np.sin(x / 500) + rng.normal(0, 0.1, len(x))
+    y[1234] = 10
+    y[8765] = -10
+    return x, y
+
+
+@pytest.fixture
+def traffic():
+    times = pd.date_range("2022-01-01", "2022-12-31 23:00", freq="h")
+    return pd.DataFrame(
+        {
+            "Sensor_Name": np.repeat(["A", "B"], len(times)),
+            "Date_Time": np.tile(times, 2),
+            "Hourly_Counts": np.arange(2 * len(times)) % 24,
+        }
+    )
+
+
+def test_minmax_keeps_extremes(series):
+    _x, y = series
+    indices = minmax_indices(y, 100)
+    assert len(indices) <= 100
+    assert np.all(np.diff(indices) > 0)
+    assert {1234, 8765} <= set(indices)
+
+
+def test_lttb_keeps_ends_and_spikes(series):
+    x, y = series
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert {1234, 8765} <= set(indices)
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_short_series_unchanged(method):
+    df = pd.DataFrame({"x": range(10), "y": range(10)})
+    assert downsample_series(df, "x", "y", 10, method=method) is df
+
+
+def test_invalid_method():
+    df = pd.DataFrame({"x": range(10), "y": range(10)})
+    with pytest.raises(ValueError):
+        downsample_series(df, "x", "y", 5, method="mean")
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_traffic_keeps_hourly_counts_by_default(traffic, method):
+    df = downsample_traffic(
+        traffic, "Date_Time", "Hourly_Counts", "Sensor_Name", 1000, method=method
+    )
+    assert df.groupby("Sensor_Name").size().max() <= 500
+    # every point is one of the original hourly counts
+    assert len(df.merge(traffic)) == len(df)
+
+
+def test_traffic_resampled_when_asked(traffic):
+    df = downsample_traffic(
+        traffic, "Date_Time", "Hourly_Counts", "Sensor_Name", 1000, resample="D"
+    )
+    assert len(df) == 2 * 365
+    assert (df["Hourly_Counts"] == 11.5).all()
+    auto = downsample_traffic(
+        traffic, "Date_Time", "Hourly_Counts", "Sensor_Name", 1000, resample="auto"
+    )
+    pd.testing.assert_frame_equal(auto, df)
+
+
+def test_sensor_traffic_plots_hourly_counts(synthetic_dataset):
+    """The figure's title says it plots hourly counts, so it isn't resampled"""
+    figure = synthetic_dataset.filter(year=2022).get_fig(
+        "sensor_traffic", max_points=1000
+    )
+    assert figure.layout.title.text.startswith("Hourly")
+    for trace in figure.data:
+        assert 0 < len(trace.x) <= 250
+        assert pd.DatetimeIndex(trace.x).hour.nunique() > 1
+        assert np.all(np.mod(trace.y, 1) == 0)
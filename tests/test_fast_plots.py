@@ -0,0 +1,58 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from melbviz import fast_plots
+from melbviz.fast_plots import typed_array
+
+
+@pytest.fixture
+def typed_arrays(monkeypatch):
+    monkeypatch.setattr(fast_plots, "MELBVIZ_TYPED_ARRAYS", True)
+
+
+def decode(typed):
+    """Decode a typed array as plotly.js does"""
+    return np.frombuffer(base64.b64decode(typed["bdata"]), dtype=typed["dtype"])
+
+
+@pytest.mark.parametrize(
+    "values, dtype",
+    [
+        (np.array([1.5, -2.25, np.nan]), "f8"),
+        (np.array([1.5, -2.25], dtype="float32"), "f4"),
+        (np.array([0, 2**31 - 1, -(2**31)], dtype="int64"), "i4"),
+        (np.array([0, 2**31], dtype="int64"), "f8"),
+        (np.array([0, 2**32], dtype="uint64"), "f8"),
+        (np.array([-5, 120], dtype="int8"), "i1"),
+        (np.array([0, 60_000], dtype="uint16"), "u2"),
+        (np.array([], dtype="int64"), "i4"),
+        (pd.Series([1, 2, 3], dtype="int16"), "i2"),
+    ],
+)
+def test_smallest_dtype_that_fits(typed_arrays, values, dtype):
+    typed = typed_array(values)
+    assert typed["dtype"] == dtype
+    np.testing.assert_array_equal(decode(typed), np.asarray(values))
+
+
+def test_datetimes_as_milliseconds(typed_arrays):
+    values = np.array(["2022-01-01T08:00", "NaT", "1969-12-31"], dtype="datetime64[ns]")
+    typed = typed_array(values)
+    assert typed["dtype"] == "f8"
+    np.testing.assert_array_equal(decode(typed), [1641024000000.0, np.nan, -86400000.0])
+
+
+def test_other_types_unchanged(typed_arrays):
+    names = np.array(["a", "b"], dtype=object)
+    assert typed_array(names) is names
+    flags = typed_array(np.array([True, False]))
+    assert isinstance(flags, np.ndarray) and flags.dtype == bool
+
+
+def test_unchanged_when_disabled(monkeypatch):
+    monkeypatch.setattr(fast_plots, "MELBVIZ_TYPED_ARRAYS", False)
+    values = np.arange(3)
+    assert typed_array(values) is values
@@ -0,0 +1,84 @@
+import os
+import time
+
+from melbviz.figure_cache import DiskFigureCache, figure_cache_key
+
+
+def age(cache, key, seconds):
+    """Make an entry look as if it was written `seconds` ago"""
+    path = cache._path(key)
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_get_and_set(tmp_path):
+    cache = DiskFigureCache(tmp_path)
+    assert cache.get("key") is None
+    cache.set("key", '{"data": []}')
+    assert cache.get("key") == '{"data": []}'
+    assert (cache.stats["hits"], cache.stats["misses"]) == (1, 1)
+
+
+def test_entries_expire(tmp_path):
+    cache = DiskFigureCache(tmp_path, ttl=60)
+    cache.set("old", "{}")
+    cache.set("new", "{}")
+    age(cache, "old", 61)
+    assert cache.get("old") is None
+    assert cache.get("new") == "{}"
+    cache.evict()
+    assert not cache._path("old").exists()
+
+
+def test_oldest_entries_evicted_over_budget(tmp_path):
+    cache = DiskFigureCache(tmp_path, max_bytes=250)
+    for i, key in enumerate("abc"):
+        cache.set(key, "x" * 100)
+        age(cache, key, 10 - i)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+    assert cache.estimated_bytes == 200
+
+
+def test_directory_only_scanned_when_needed(tmp_path, monkeypatch):
+    cache = DiskFigureCache(tmp_path, max_bytes=1000, evict_every=5)
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or evict())
+    for i in range(6):
+        cache.set(f"key{i}", "x" * 10)
+    # once to find the size of the directory, then after five more writes
+    assert len(scans) == 2
+    cache.set("big", "x" * 1000)
+    assert len(scans) == 3
+
+
+def test_evicts_entries_of_other_processes(tmp_path):
+    cache = DiskFigureCache(tmp_path, max_bytes=250, evict_every=2)
+    other = DiskFigureCache(tmp_path)
+    cache.set("a", "x" * 100)
+    other.set("b", "x" * 100)
+    other.set("c", "x" * 100)
+    age(cache, "a", 10)
+    # this process doesn't know about the other's entries until it next scans
+    cache.set("d", "x" * 10)
+    assert cache.get("a") is not None
+    cache.set("e", "x" * 10)
+    assert cache.get("a") is None
+    assert all(cache.get(key) is not None for key in "bcde")
+
+
+def test_key_depends_on_figure_format():
+    filters = {"year": 2022, "sensor": ["b", "a"]}
+    key = figure_cache_key("sensor_traffic", filters, {}, version="1")
+    assert key == figure_cache_key(
+        "sensor_traffic", {"sensor": ["a", "b"], "year": [2022]}, {}, version="1"
+    )
+    assert key != figure_cache_key("sensor_traffic", filters, {}, version="2")
+    assert key != figure_cache_key(
+        "sensor_traffic",
+        filters,
+        {},
+        version="1",
+        figure_format={"typed_arrays": True},
+    )
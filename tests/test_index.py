@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from melbviz.index import FilterIndex, TimeIndex
+from melbviz.pedestrian import PedestrianDataset
+from melbviz.utils import (
+    compact_pedestrian_df,
+    filter_pedestrian_df,
+    filter_values,
+    index_path,
+    weekday_numbers,
+)
+
+
+FILTERS = [
+    {"year": 2021},
+    {"month": ["March", "January"]},
+    {"sensor": "Synthetic Sensor 002"},
+    {"year": [2022], "month": "February", "sensor": ["Synthetic Sensor 001"]},
+    {"year": 2021, "sensor": ["Synthetic Sensor 004", "Synthetic Sensor 001"]},
+    {"year": 2023},
+    {"sensor": ["No Such Sensor", "Synthetic Sensor 003"]},
+]
+
+
+@pytest.fixture(scope="module")
+def df(synthetic_dataset):
+    return synthetic_dataset.df.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_index_matches_scan(df, filters):
+    expected = filter_pedestrian_df(df, **filters)
+    actual = filter_pedestrian_df(df, index=FilterIndex(df), **filters)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_index_of_categoricals(df):
+    """Categorical columns are indexed by their codes, including missing values"""
+    df = df.astype({"Sensor_Name": "category", "Month": "category"})
+    df.loc[df.index[::7], "Sensor_Name"] = None
+    index = FilterIndex(df)
+    for filters in FILTERS:
+        expected = filter_pedestrian_df(df, **filters)
+        pd.testing.assert_frame_equal(
+            filter_pedestrian_df(df, index=index, **filters), expected
+        )
+
+
+def test_no_filters_returns_dataframe(df):
+    assert FilterIndex(df).lookup() is None
+    assert filter_pedestrian_df(df, index=FilterIndex(df)) is df
+
+
+def test_saved_index_is_memory_mapped(tmp_path, synthetic_dataset):
+    parquet_path = tmp_path / "melbviz.parquet"
+    path = tmp_path / "melbviz.arrow"
+    synthetic_dataset.to_parquet(parquet_path)
+    PedestrianDataset.from_parquet(parquet_path, compact=True).to_arrow(path)
+    dataset = PedestrianDataset.from_arrow(path)
+    index = dataset.filter_index
+    assert index_path(path).exists()
+    for array in (index.column_indexes["sensor"].order, index.time_index.hours):
+        assert not array.flags.owndata and not array.flags.writeable
+    time_filters = {"weekday": ["Saturday", 6], "hour": [7, 8], "start": "2022-03-01"}
+    for filters in [*FILTERS, time_filters, {"year": 2022, **time_filters}]:
+        expected = filter_pedestrian_df(dataset.df, **filters)
+        pd.testing.assert_frame_equal(
+            filter_pedestrian_df(dataset.df, index=index, **filters), expected
+        )
+    # an index saved for other data isn't used
+    assert FilterIndex.from_arrow(index_path(path), dataset.df, version="x") is None
+
+
+TIME_FILTERS = [
+    {"weekday": "Sunday"},
+    {"weekday": [0, "Friday"], "hour": [7, 8, 17]},
+    {"hour": 23, "start": "2021-06-01", "end": "2021-09-01"},
+    {"year": 2022, "sensor": "Synthetic Sensor 001", "weekday": [5, 6]},
+]
+
+
+def scan_times(df, weekday=None, hour=None, **filters):
+    """Filter by time using pandas' datetime accessors, for comparison"""
+    df = filter_pedestrian_df(df, **filters)
+    if weekday is not None:
+        weekdays = weekday_numbers(weekday)
+        df = df[df["Date_Time"].dt.weekday.isin(weekdays)]
+    if hour is not None:
+        df = df[df["Date_Time"].dt.hour.isin(filter_values(hour))]
+    return df
+
+
+@pytest.mark.parametrize("filters", TIME_FILTERS)
+def test_time_filters_match_datetimes(df, filters):
+    expected = scan_times(df, **filters)
+    assert len(expected) > 0
+    # with Day and Time columns, without them, and in the compact schema
+    for time_df in (df, df.drop(columns=["Day", "Time"]), compact_pedestrian_df(df)):
+        pd.testing.assert_frame_equal(
+            filter_pedestrian_df(time_df, **filters),
+            scan_times(time_df, **filters),
+        )
+        pd.testing.assert_frame_equal(
+            filter_pedestrian_df(time_df, index=FilterIndex(time_df), **filters),
+            scan_times(time_df, **filters),
+        )
+
+
+def test_time_index_of_unsorted_datetimes(df):
+    shuffled = df.sample(frac=1, random_state=0)
+    time_index = TimeIndex(shuffled["Date_Time"])
+    assert not time_index.is_sorted
+    date_times = shuffled["Date_Time"]
+    positions = time_index.restrict(
+        None, start=pd.Timestamp("2021-03-01"), weekday=[2], hour=[12]
+    )
+    expected = np.flatnonzero(
+        (date_times >= "2021-03-01")
+        & (date_times.dt.weekday == 2)
+        & (date_times.dt.hour == 12)
+    )
+    np.testing.assert_array_equal(positions, expected)
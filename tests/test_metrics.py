@@ -0,0 +1,17 @@
+from melbviz import metrics
+
+
+PLOTS = ["sensor_counts", "month_counts", "sensor_traffic"]
+
+
+def test_trace_includes_figures_made_in_pool(synthetic_dataset):
+    dataset = synthetic_dataset.filter(year=2022)
+    metrics.start_trace()
+    figures = dataset.get_figs(PLOTS, max_workers=3, executor="thread")
+    stages = metrics.end_trace()
+    assert all(figure is not None for figure in figures)
+    plotted = {labels["plot"] for stage, labels, _ in stages if stage == "plot"}
+    assert plotted == set(PLOTS)
+    made = {labels["plot"] for stage, labels, _ in stages if stage == "figure"}
+    assert made == set(PLOTS)
+
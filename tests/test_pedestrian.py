@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from melbviz.aggregate import CUBE_LEVELS, sum_counts
+from melbviz.pedestrian import PedestrianDataset
+
+
+def test_parquet_and_arrow_side_by_side(tmp_path, synthetic_dataset):
+    """Each format keeps its own sensor table and cube in the same directory"""
+    parquet_path = tmp_path / "melbviz.parquet"
+    arrow_path = tmp_path / "melbviz.arrow"
+    synthetic_dataset.to_parquet(parquet_path)
+    # as make_parquet.py --arrow does, after writing the Parquet file
+    PedestrianDataset.from_parquet(parquet_path, compact=True).to_arrow(arrow_path)
+
+    parquet_dataset = PedestrianDataset.from_parquet(parquet_path)
+    arrow_dataset = PedestrianDataset.from_arrow(arrow_path)
+    for dataset in (parquet_dataset, arrow_dataset):
+        assert dataset.cube is not None
+        assert dataset.sensor_table is not None
+        for level, columns in CUBE_LEVELS.items():
+            table = dataset.cube.table(level)
+            assert table["Hourly_Counts"].sum() == dataset.df["Hourly_Counts"].sum()
+            if "Hour" not in columns:
+                expected = sum_counts(dataset.df, columns)
+                pd.testing.assert_frame_equal(
+                    dataset.cube.counts(columns), expected, check_dtype=False
+                )
+
+    # the Parquet dataset's cube wasn't replaced by the compact one
+    monthly = parquet_dataset.cube.table("monthly")
+    assert monthly["Year"].dtype == parquet_dataset.df["Year"].dtype
+    assert monthly["Month"].dtype == parquet_dataset.df["Month"].dtype
+    assert isinstance(
+        arrow_dataset.cube.table("monthly")["Month"].dtype, pd.CategoricalDtype
+    )
+    assert parquet_dataset.sensor_table["Latitude"].dtype == "float64"
+
+
+@pytest.mark.parametrize("fast_figures", [False, True])
+def test_sensor_map_joins_locations_on_id(synthetic_dataset, fast_figures):
+    """Sensors sharing a name are still placed at their own locations"""
+    df = synthetic_dataset.df.copy()
+    df["Sensor_Name"] = df["Sensor_Name"].replace(
+        "Synthetic Sensor 002", "Synthetic Sensor 001"
+    )
+    sensor_table = synthetic_dataset.sensor_table.copy()
+    sensor_table["Sensor_Name"] = sensor_table["Sensor_Name"].replace(
+        "Synthetic Sensor 002", "Synthetic Sensor 001"
+    )
+    dataset = PedestrianDataset(
+        df, sensor_table=sensor_table, aggregate=True, fast_figures=fast_figures
+    )
+    figure = dataset.filter(year=2022).get_fig("sensor_map")
+    totals = sum_counts(df[df["Year"] == 2022], "Sensor_ID")["Hourly_Counts"]
+    (trace,) = figure.data
+    assert list(trace.lat) == sensor_table["Latitude"].tolist()
+    assert list(trace.marker.size) == totals.tolist()
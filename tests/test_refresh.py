@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from melbviz.aggregate import CUBE_LEVELS
+from melbviz.pedestrian import PedestrianDataset
+from melbviz.refresh import refresh_partitioned_parquet
+from melbviz.synthetic import make_pedestrian_counts, make_sensor_locations
+from melbviz.utils import PARTITION_COLUMNS, stream_pedestrian_data_to_parquet
+
+
+# small enough that every partition is spread over several chunks
+CHUNKSIZE = 5_000
+
+
+@pytest.fixture
+def csv_paths(tmp_path):
+    counts = make_pedestrian_counts(n_sensors=3, years=(2021, 2022))
+    sensor_csv_path = tmp_path / "sensors.csv"
+    make_sensor_locations(n_sensors=3).to_csv(sensor_csv_path, index=False)
+    return counts, tmp_path / "counts.csv", sensor_csv_path
+
+
+def load(path):
+    dataset = PedestrianDataset.from_parquet(path)
+    df = dataset.df.sort_values(["Date_Time", "Sensor_ID"], ignore_index=True)
+    return dataset, df
+
+
+def test_refresh_matches_rebuild(tmp_path, csv_paths):
+    counts, counts_csv_path, sensor_csv_path = csv_paths
+    path = tmp_path / "partitioned"
+
+    counts[counts["Year"] == 2021].to_csv(counts_csv_path, index=False)
+    partitions = refresh_partitioned_parquet(
+        counts_csv_path, path, sensor_csv_path, chunksize=CHUNKSIZE
+    )
+    assert len(partitions) == 12
+    # nothing has changed
+    partitions = refresh_partitioned_parquet(
+        counts_csv_path, path, sensor_csv_path, chunksize=CHUNKSIZE
+    )
+    assert partitions == []
+
+    # a month is added, one is removed and one sensor's counts change in another
+    updated = counts[
+        ((counts["Year"] == 2021) & (counts["Month"] != "December"))
+        | ((counts["Year"] == 2022) & (counts["Month"] == "January"))
+    ].copy()
+    changed = (updated["Month"] == "March") & (updated["Sensor_ID"] == 2)
+    updated.loc[changed, "Hourly_Counts"] += 1
+    updated.to_csv(counts_csv_path, index=False)
+    partitions = refresh_partitioned_parquet(
+        counts_csv_path, path, sensor_csv_path, chunksize=CHUNKSIZE
+    )
+    assert partitions == [(2021, "December"), (2021, "March"), (2022, "January")]
+
+    rebuilt_path = tmp_path / "rebuilt"
+    stream_pedestrian_data_to_parquet(
+        counts_csv_path,
+        rebuilt_path,
+        sensor_csv_path,
+        chunksize=CHUNKSIZE,
+        partition_cols=PARTITION_COLUMNS,
+    )
+    refreshed, refreshed_df = load(path)
+    rebuilt, rebuilt_df = load(rebuilt_path)
+    assert len(refreshed_df) == len(updated)
+    pd.testing.assert_frame_equal(refreshed_df, rebuilt_df)
+    pd.testing.assert_frame_equal(refreshed.sensor_table, rebuilt.sensor_table)
+    for level in CUBE_LEVELS:
+        pd.testing.assert_frame_equal(
+            refreshed.cube.table(level), rebuilt.cube.table(level)
+        )
+
+
+def test_changed_sensor_locations_rebuild(tmp_path, csv_paths):
+    counts, counts_csv_path, sensor_csv_path = csv_paths
+    path = tmp_path / "partitioned"
+    counts.to_csv(counts_csv_path, index=False)
+    refresh_partitioned_parquet(counts_csv_path, path, sensor_csv_path)
+
+    locations = pd.read_csv(sensor_csv_path)
+    locations["Latitude"] += 0.001
+    locations.to_csv(sensor_csv_path, index=False)
+    partitions = refresh_partitioned_parquet(counts_csv_path, path, sensor_csv_path)
+    assert len(partitions) == 24
+    dataset, _df = load(path)
+    assert dataset.sensor_table["Latitude"].tolist() == locations["Latitude"].tolist()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+import argparse
+
+from melbviz.config import (
+    MELBVIZ_ARROW_DATA_PATH,
+    MELBVIZ_COUNTS_CSV_PATH,
+    MELBVIZ_PARTITIONED_DATA_PATH,
+    MELBVIZ_SENSOR_CSV_PATH,
+)
+from melbviz.refresh import refresh_partitioned_parquet
+from melbviz.utils import DEFAULT_CHUNKSIZE
+
+
+parser = argparse.ArgumentParser(
+    description=(
+        "Update the partitioned Parquet dataset that the Dash app loads with only"
+        " the year/month partitions of the pedestrian counts CSV that have"
+        " changed. The dataset is made from scratch the first time. Any Arrow"
+        " file the app memory-maps is rewritten to match."
+    )
+)
+parser.add_argument(
+    "--chunksize",
+    type=int,
+    default=DEFAULT_CHUNKSIZE,
+    help="Number of CSV rows to read and clean at a time.",
+)
+parser.add_argument(
+    "--arrow",
+    action="store_true",
+    help=(
+        "Also write the compact dataset as an Arrow file that the Dash app will"
+        " memory-map. An existing Arrow file is always kept up to date. Note"
+        " this loads the whole dataset into memory."
+    ),
+)
+args = parser.parse_args()
+
+partitions = refresh_partitioned_parquet(
+    MELBVIZ_COUNTS_CSV_PATH,
+    MELBVIZ_PARTITIONED_DATA_PATH,
+    sensor_csv_path=MELBVIZ_SENSOR_CSV_PATH,
+    chunksize=args.chunksize,
+)
+print(f"Updated {len(partitions)} partitions:")
+for year, month in partitions:
+    print(f"  {year} {month}")
+
+# the app memory-maps the Arrow file in preference to the Parquet dataset, so an
+# existing one is kept up to date
+arrow_path = MELBVIZ_ARROW_DATA_PATH
+if (args.arrow or arrow_path.exists()) and (
+    len(partitions) > 0 or not arrow_path.exists()
+):
+    # only imported when needed, as it's slow to import
+    from melbviz.pedestrian import PedestrianDataset
+
+    print(f"Writing {arrow_path}...")
+    dataset = PedestrianDataset.from_parquet(
+        MELBVIZ_PARTITIONED_DATA_PATH, compact=True
+    )
+    dataset.to_arrow(arrow_path)